@@ -11,21 +11,28 @@ root_folder : str
 """
 
 import os
+import stat
+import threading
+import time
 
-from shutil import ignore_patterns
-
-from .python_utils import cmd_utils
 from .python_utils import exceptions
 from .python_utils import file_utils
+from .python_utils import ignore_utils
 
 root_folder = os.path.realpath(os.path.abspath(os.path.join(
     os.path.normpath(os.getcwd()))))
 
 _paths_map = {
     "tasks": os.path.join(root_folder, "UserData", "tasks"),
-    "settings": os.path.join(root_folder, "UserData", "settings")
+    "settings": os.path.join(root_folder, "UserData", "settings"),
+    "indexes": os.path.join(root_folder, "UserData", "indexes"),
+    "snapshots": os.path.join(root_folder, "UserData", "snapshots"),
+    "metrics": os.path.join(root_folder, "UserData", "metrics"),
+    "cache": os.path.join(root_folder, "UserData", "cache")
 }
 
+_hash_cache_lock = threading.Lock()
+
 REPORT_TEMPLATE = """Backup task finished
 
 Task Name: {task_name}
@@ -66,6 +73,8 @@ def play_sound(soundfile, logger=None):
     logger : object
         See <class :any:`LogSystem`>.
     """
+    from .python_utils import cmd_utils
+
     try:
         cmd_utils.popen(["play", "-V0", "--no-show-progress", "--type=.wav", soundfile],
                         cwd=root_folder, logger=logger)
@@ -96,6 +105,8 @@ def notify_send(title, body, urgency="normal", icon="dialog-info", logger=None):
     logger : object
         See <class :any:`LogSystem`>.
     """
+    from .python_utils import cmd_utils
+
     try:
         cmd_utils.popen(["notify-send", "--urgency=%s" % urgency, "--category=transfer",
                          "--icon=%s" % icon, "--hint=int:resident:1", title, body],
@@ -107,102 +118,218 @@ def notify_send(title, body, urgency="normal", icon="dialog-info", logger=None):
             pass
 
 
-def print_config_files_list(file_type):
-    """Print config files list.
+def get_user_data_path(data_type, *args):
+    """Get the path to a location inside the UserData folder.
 
-    Used to print to standard output the list of configuration files (either "tasks" or "settings"
-    configuration files). The output is used only by the Bash completions script.
+    Parameters
+    ----------
+    data_type : str
+        One of the keys of ``_paths_map`` (e.g., "tasks", "settings" or "snapshots").
+    *args
+        Path components to join to the folder of ``data_type``.
+
+    Returns
+    -------
+    str
+        The path.
+    """
+    return os.path.join(_paths_map[data_type], *args)
+
+
+def get_task_storage_name(task):
+    """Get a name to identify a task when storing its persistent data.
+
+    The name is built with the slugified task name and a short hash of the task name, type and
+    destination. So, tasks with the same name but a different type or destination don't share
+    their persistent data.
 
     Parameters
     ----------
-    file_type : str
-        One of "tasks" or "settings".
+    task : dict
+        A task as defined in a tasks file.
+
+    Returns
+    -------
+    str
+        A name that can be safely used as a file name.
     """
-    # FUTURE:
-    # Use context manager with os.scandir().
-    list_of_files = sorted([entry.name for entry in os.scandir(_paths_map[file_type]) if
-                            all((entry.is_file(follow_symlinks=False),
-                                 (entry.name.endswith(".yaml") or
-                                entry.name.endswith(".yml"))
-                                 ))])
+    import hashlib
+
+    from .python_utils import string_utils
+
+    key = "\0".join(str(task.get(k, "")) for k in ("name", "type", "destination"))
 
-    for f in list_of_files:
-        name, ext = os.path.splitext(f)
-        print(name)
+    return "%s-%s" % (string_utils.slugify(task.get("name", "")) or "task",
+                      hashlib.sha1(key.encode("utf-8")).hexdigest()[:10])
+
+
+def enable_hash_cache(max_entries=1000000):
+    """Enable the persistent hash cache.
+
+    The cache is stored in ``UserData/cache`` and, once enabled, it's shared by all the tasks
+    executed by the current process. See :any:`hash_utils.HashCache`.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        See :any:`hash_utils.HashCache`.
+
+    Returns
+    -------
+    hash_utils.HashCache
+        The cache.
+    """
+    from .python_utils import hash_utils
+
+    with _hash_cache_lock:
+        if hash_utils.get_cache() is None:
+            hash_utils.set_cache(hash_utils.HashCache(
+                get_user_data_path("cache", "hashes.sqlite3"), max_entries=max_entries))
+
+        return hash_utils.get_cache()
 
 
 class FilteredFilesList():
     """Create a files list.
 
     Create a comprehensive list of files and folders based on passed "base list" and filter the
-    list using shutil.ignore_patterns.
+    list using an :any:`ignore_utils.IgnoreMatcher`.
 
     This list of files is used to be passed to `tar` as an argument for its `--files-from` option. I
     deemed this infinitely more simple and less prone to errors than using `tar` inside a loop and
     using `tar`'s arguments to filter the files.
+
+    The list is generated lazily. Use :any:`FilteredFilesList.iter_files` to consume the paths as
+    the file system is walked (e.g., to pipe them directly into `tar`'s standard input) without
+    ever holding the whole list in memory.
     """
 
-    def __init__(self, paths_list, ignored_patterns):
+    def __init__(self, paths_list, ignored_patterns, paths_stats=None):
         """Initialize.
 
         Parameters
         ----------
         paths_list : list
             The list of files/folders already validated by :any:`tasks.BaseTask._validate_task`
-        ignored_patterns : list
-            A list of file patters to not include into _full_list_of_files.
+        ignored_patterns : list, ignore_utils.IgnoreMatcher
+            A list of file patters to not include into the list of files or an already compiled
+            :any:`ignore_utils.IgnoreMatcher`. Anchored patterns are relative to each of the
+            folders in ``paths_list``.
+        paths_stats : dict, None, optional
+            The results of ``lstat`` for the paths in ``paths_list`` (as stored by
+            :any:`tasks.BaseTask._validate_task`), so they aren't ``stat``-ed again.
         """
         self._paths_list = paths_list
-        self._ignored_patterns = ignored_patterns
-        self._full_list_of_files = []
-
-        self._populate_list()
+        self._paths_stats = paths_stats or {}
+        self._ignore_matcher = ignore_utils.get_matcher(ignored_patterns)
+        self._errors = []
+        self._stats = {}
 
-    def _populate_list(self):
-        """Populate _full_list_of_files.
+    def iter_files(self):
+        """Iterate over the filtered files.
 
-        If an item in "_paths_list" is the path to a file or a symlink, append it to
-        "_full_list_of_files". If it's a folder, recursively process the folder.
+        If an item in "_paths_list" is the path to a file or a symlink, yield it. If it's a folder,
+        walk the folder.
 
+        Yields
+        ------
+        str
+            The path to a file that should be included into the list of files.
         """
         for item in self._paths_list:
-            if file_utils.is_real_dir(item):
-                self._process_directory(item)
+            st = self._paths_stats.get(item)
+
+            if stat.S_ISDIR(st.st_mode) if st is not None else file_utils.is_real_dir(item):
+                yield from self._walk_directory(item)
             else:
-                self._full_list_of_files.append(item)
+                self._stats[item] = {"files_scanned": 1, "files_ignored": 0, "walk_time": 0.0}
+                yield item
+
+    def _walk_directory(self, directory):
+        """Walk a directory tree.
 
-    def _process_directory(self, directory):
-        """Process directory.
+        The tree is walked using an explicit stack instead of recursion, so there is no limit on
+        the depth of the tree. The file type information provided by :any:`os.scandir` is reused,
+        so no extra ``stat`` system calls are needed to tell folders apart from files on file
+        systems that report file types (the vast majority).
 
         Parameters
         ----------
         directory : str
             The directory to process.
+
+        Yields
+        ------
+        str
+            The path to a file inside ``directory``.
         """
-        names = os.listdir(directory)
+        # Tuples with a folder path and its path relative to ``directory``.
+        stack = [(directory, "")]
+        matcher = self._ignore_matcher if self._ignore_matcher else None
+        stats = self._stats[directory] = {"files_scanned": 0, "files_ignored": 0,
+                                          "walk_time": 0.0}
+
+        while stack:
+            # Only the time spent walking is measured, not the time spent by the consumer of the
+            # paths. So the paths of each folder are yielded after the folder was processed.
+            start = time.perf_counter()
+            current_dir, rel_dir = stack.pop()
 
-        if self._ignored_patterns is not None:
-            ignored_names = ignore_patterns(*self._ignored_patterns)(directory, names)
-        else:
-            ignored_names = set()
+            try:
+                with os.scandir(current_dir) as it:
+                    entries = list(it)
+            except OSError as why:
+                self._errors.append((current_dir, str(why)))
+                stats["walk_time"] += time.perf_counter() - start
+                continue
 
-        errors = []
+            sub_dirs = []
+            files = []
 
-        for name in names:
-            if name in ignored_names:
-                continue
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
 
-            srcname = os.path.join(directory, name)
+                if matcher is not None and matcher.match(entry.name, rel_dir, is_dir):
+                    stats["files_ignored"] += 1
+                    continue
 
-            try:
-                if file_utils.is_real_dir(srcname):
-                    self._process_directory(srcname)
+                if is_dir:
+                    sub_dirs.append((entry.path,
+                                     rel_dir + "/" + entry.name if rel_dir else entry.name))
                 else:
-                    self._full_list_of_files.append(srcname)
-            except exceptions.Error as err:
-                errors.extend(err.args[0])
-            except OSError as why:
-                errors.append((srcname, str(why)))
+                    files.append(entry.path)
+
+            # Reversed so sub-folders are popped from the stack in the order they were listed.
+            stack.extend(reversed(sub_dirs))
+            stats["files_scanned"] += len(files)
+            stats["walk_time"] += time.perf_counter() - start
+
+            yield from files
+
+    def get_errors(self):
+        """Get the errors found while walking the file system.
+
+        Returns
+        -------
+        list
+            A list of tuples with the path that couldn't be read and the reason why.
+        """
+        return self._errors
+
+    def get_stats(self):
+        """Get the statistics of the walk.
+
+        Returns
+        -------
+        dict
+            The walked items as keys and dictionaries with the amount of files found
+            (``files_scanned``), the amount of ignored files and folders (``files_ignored``) and
+            the time spent walking (``walk_time``, in seconds) as values.
+        """
+        return self._stats
 
     def get_full_list_of_files(self):
         """
@@ -210,8 +337,13 @@ class FilteredFilesList():
         -------
         list
             The full list of files filtered.
+
+        Note
+        ----
+        This builds the whole list in memory. Prefer :any:`FilteredFilesList.iter_files` when
+        dealing with big file trees.
         """
-        return self._full_list_of_files
+        return list(self.iter_files())
 
 
 if __name__ == "__main__":
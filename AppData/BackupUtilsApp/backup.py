@@ -4,6 +4,7 @@
 import os
 
 from . import app_utils
+from . import profiling
 from .python_utils import misc_utils
 from .tasks import factory as tasks
 
@@ -17,7 +18,7 @@ class Backup():
         See <class :any:`LogSystem`>.
     """
 
-    def __init__(self, task={}, settings={}, dry_run=False, logger=None):
+    def __init__(self, task={}, settings={}, dry_run=False, logger=None, capture_output=False):
         """Initialize.
 
         Parameters
@@ -30,11 +31,14 @@ class Backup():
             See :any:`BaseTask` > dry_run.
         logger : object
             See <class :any:`LogSystem`>.
+        capture_output : bool, optional
+            See :any:`BaseTask` > capture_output.
         """
         self._task = task
         self._settings = settings
         self._dry_run = dry_run
         self.logger = logger
+        self._capture_output = capture_output
 
         self._errors_count = 0
         self._warnings_count = 0
@@ -57,7 +61,8 @@ class Backup():
             task=self._task,
             settings=self._settings,
             dry_run=self._dry_run,
-            logger=self.logger
+            logger=self.logger,
+            capture_output=self._capture_output
         )
         errors_count, warnings_count = task.start()
 
@@ -67,6 +72,11 @@ class Backup():
     def run(self):
         """Start backup.
 
+        Returns
+        -------
+        int
+            The amount of errors found while running the task.
+
         Raises
         ------
         SystemExit
@@ -82,6 +92,8 @@ class Backup():
 
         self.notify()
 
+        return self._errors_count
+
     def notify(self):
         """Notify that the backup task ended.
         """
@@ -108,6 +120,17 @@ class Backup():
         self.logger.info("**Log file at:**")
         self.logger.info(self.logger.get_log_file(), date=False)
 
+        with profiling.phase("Notifications"):
+            self._send_notifications(message)
+
+    def _send_notifications(self, message):
+        """Send the sound, desktop and mail notifications enabled in the settings.
+
+        Parameters
+        ----------
+        message : str
+            The report of the task.
+        """
         if self._settings.get("sound_notification", True):
             app_utils.play_sound(os.path.join(
                 app_utils.root_folder, "AppData", "data", "sounds", "ding.wav"))
@@ -0,0 +1,533 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks used to measure the performance of critical parts of the application.
+
+They are run with the ``app.py benchmark`` command and are meant to be executed on the machine
+(and the file systems) in which the backups are performed.
+"""
+import os
+import subprocess
+import sys
+import time
+
+from contextlib import contextmanager
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from . import app_utils
+from .python_utils import file_utils
+from .python_utils import hash_utils
+from .python_utils import shell_utils
+from .python_utils import yaml
+from .python_utils import yaml_utils
+
+_counted_os_funcs = ["stat", "lstat", "listdir", "scandir"]
+
+
+@contextmanager
+def count_os_calls(func_names=_counted_os_funcs):
+    """Count calls to functions of the :any:`os` module.
+
+    Every function is temporarily replaced by a wrapper that counts its calls. Functions of
+    :any:`os.path` (e.g. :any:`os.path.isdir` or :any:`os.path.islink`) are implemented on top of
+    :any:`os.stat`/:any:`os.lstat`, so their system calls are also counted.
+
+    Parameters
+    ----------
+    func_names : list, optional
+        The names of the functions to count.
+
+    Yields
+    ------
+    dict
+        The calls count of each function. Updated while the context is active.
+    """
+    counts = {name: 0 for name in func_names}
+    originals = {name: getattr(os, name) for name in func_names}
+
+    def make_wrapper(name, func):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    for name, func in originals.items():
+        setattr(os, name, make_wrapper(name, func))
+
+    try:
+        yield counts
+    finally:
+        for name, func in originals.items():
+            setattr(os, name, func)
+
+
+def make_synthetic_tree(root, files_count, files_per_dir=1000, dirs_per_dir=10):
+    """Create a synthetic file tree.
+
+    Parameters
+    ----------
+    root : str
+        Path to the folder in which to create the tree.
+    files_count : int
+        Amount of (empty) files to create.
+    files_per_dir : int, optional
+        Amount of files per folder.
+    dirs_per_dir : int, optional
+        Amount of sub-folders per folder.
+    """
+    created = 0
+    pending = [root]
+
+    while created < files_count:
+        current_dir = pending.pop(0)
+        os.makedirs(current_dir, exist_ok=True)
+
+        for i in range(min(files_per_dir, files_count - created)):
+            with open(os.path.join(current_dir, "file_%d.txt" % i), "w"):
+                pass
+
+        created += files_per_dir
+        pending.extend(os.path.join(current_dir, "dir_%d" % i) for i in range(dirs_per_dir))
+
+
+def _legacy_walk(directory):
+    """The file system walker used by :any:`app_utils.FilteredFilesList` before it was rewritten
+    to use :any:`os.scandir`. Kept only to compare against it.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to walk.
+
+    Yields
+    ------
+    str
+        The path to a file inside ``directory``.
+    """
+    for name in os.listdir(directory):
+        srcname = os.path.join(directory, name)
+
+        if file_utils.is_real_dir(srcname):
+            yield from _legacy_walk(srcname)
+        else:
+            yield srcname
+
+
+def _scandir_walk(directory):
+    """Walk a directory with :any:`app_utils.FilteredFilesList`.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to walk.
+
+    Returns
+    -------
+    generator
+        The files generator.
+    """
+    return app_utils.FilteredFilesList([directory], []).iter_files()
+
+
+def benchmark_walk(files_count=1000000, storage_dir=None, logger=None):
+    """Benchmark the file system walkers.
+
+    A synthetic tree is created, walked by the legacy walker and the current one, and then
+    removed. For each walker, the amount of ``stat``-like calls per file and the walk time are
+    reported.
+
+    Parameters
+    ----------
+    files_count : int, optional
+        Amount of files of the synthetic tree.
+    storage_dir : str, optional
+        Folder in which to create the synthetic tree. The system's temporary folder is used if
+        not specified. Use a folder in the file system that is going to be backed up for results
+        closer to reality.
+    logger : LogSystem
+        The logger.
+    """
+    tree_root = mkdtemp(prefix="backup-utils-bench-", dir=storage_dir)
+
+    try:
+        logger.info("**Creating synthetic tree with %d files at:** %s" % (files_count, tree_root))
+        make_synthetic_tree(tree_root, files_count)
+
+        results = {}
+
+        for walker_name, walker in (("listdir (legacy)", _legacy_walk),
+                                    ("scandir", _scandir_walk)):
+            with count_os_calls() as counts:
+                walked_count = sum(1 for f in walker(tree_root))
+
+            start = time.perf_counter()
+            sum(1 for f in walker(tree_root))
+            elapsed = time.perf_counter() - start
+
+            results[walker_name] = elapsed
+            logger.info(shell_utils.get_cli_separator("-"), date=False)
+            logger.info("**Walker:** %s" % walker_name, date=False)
+            logger.info("**Files walked:** %d" % walked_count, date=False)
+            logger.info("**Calls per file:** %s" % ", ".join(
+                "%s=%.3f" % (name, count / max(walked_count, 1))
+                for name, count in counts.items()), date=False)
+            logger.info("**Walk time:** %.3f sec/s" % elapsed, date=False)
+
+        logger.info(shell_utils.get_cli_separator("-"), date=False)
+        logger.success("**Speed-up:** %.2fx" % (results["listdir (legacy)"] /
+                                                max(results["scandir"], 1e-9)), date=False)
+    finally:
+        rmtree(tree_root, ignore_errors=True)
+
+
+def make_synthetic_data(root, size_mib, file_size_mib=16):
+    """Create files with random content.
+
+    Parameters
+    ----------
+    root : str
+        Path to the folder in which to create the files.
+    size_mib : int
+        Total amount of data in MiB.
+    file_size_mib : int, optional
+        Size of each file in MiB.
+    """
+    os.makedirs(root, exist_ok=True)
+    chunk = os.urandom(1024 * 1024)
+    remaining = size_mib
+    index = 0
+
+    while remaining > 0:
+        with open(os.path.join(root, "data_%d.bin" % index), "wb") as data_file:
+            for i in range(min(file_size_mib, remaining)):
+                # Make each MiB different, so nothing can take advantage of repeated data.
+                data_file.write(chunk[:-8] + os.urandom(8))
+
+        remaining -= file_size_mib
+        index += 1
+
+
+def benchmark_hash(size_mib=1024, max_workers=None, storage_dir=None, logger=None):
+    """Benchmark how hashing throughput scales with the amount of workers.
+
+    Synthetic data is created and hashed with :any:`hash_utils.dir_hash_and_manifest` using
+    1, 2, 4... up to ``max_workers`` workers. The data is hashed once before measuring, so
+    it is served from the page cache and the benchmark measures the hashing itself and not the
+    storage speed.
+
+    Parameters
+    ----------
+    size_mib : int, optional
+        Amount of data to hash in MiB.
+    max_workers : int, None, optional
+        Maximum amount of workers. Defaults to the amount of CPU cores.
+    storage_dir : str, optional
+        See :any:`benchmark_walk`.
+    logger : LogSystem
+        The logger.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    workers_counts = []
+    workers = 1
+
+    while workers < max_workers:
+        workers_counts.append(workers)
+        workers *= 2
+
+    workers_counts.append(max_workers)
+    data_root = mkdtemp(prefix="backup-utils-bench-", dir=storage_dir)
+
+    try:
+        logger.info("**Creating %d MiB of synthetic data at:** %s" % (size_mib, data_root))
+        make_synthetic_data(data_root, size_mib)
+        expected_hash = hash_utils.dir_hash(data_root)
+        base_elapsed = None
+
+        for workers in workers_counts:
+            start = time.perf_counter()
+            digest, manifest = hash_utils.dir_hash_and_manifest(data_root, workers=workers)
+            elapsed = max(time.perf_counter() - start, 1e-9)
+            base_elapsed = base_elapsed or elapsed
+
+            logger.info(shell_utils.get_cli_separator("-"), date=False)
+            logger.info("**Workers:** %d" % workers, date=False)
+            logger.info("**Files hashed:** %d" % len(manifest), date=False)
+            logger.info("**Hash time:** %.3f sec/s" % elapsed, date=False)
+            logger.info("**Throughput:** %.2f MiB/s" % (size_mib / elapsed), date=False)
+            logger.info("**Speed-up:** %.2fx" % (base_elapsed / elapsed), date=False)
+
+            if digest != expected_hash:
+                logger.error("**Hash mismatch!**", date=False)
+
+        logger.info(shell_utils.get_cli_separator("-"), date=False)
+    finally:
+        rmtree(data_root, ignore_errors=True)
+
+
+def benchmark_hashfuncs(size_mib=1024, logger=None):
+    """Benchmark the speed of the available hash functions.
+
+    Data is hashed from memory, so the results are the maximum speed at which each hash
+    function can process data in one CPU core, regardless of the storage speed.
+
+    Parameters
+    ----------
+    size_mib : int, optional
+        Amount of data to hash with each hash function in MiB.
+    logger : LogSystem
+        The logger.
+    """
+    block = os.urandom(1024 * 1024)
+    results = []
+
+    for name in sorted(set(hash_utils.HASH_FUNCS) | set(hash_utils.HASH_FUNCS_FALLBACKS)):
+        if name not in hash_utils.HASH_FUNCS:
+            logger.warning("**Not available (module not installed):** %s (falls back to %s)" %
+                           (name, hash_utils.HASH_FUNCS_FALLBACKS[name]), date=False)
+            continue
+
+        h = hash_utils.HASH_FUNCS[name]()
+        start = time.perf_counter()
+
+        for i in range(size_mib):
+            h.update(block)
+
+        h.hexdigest()
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        results.append((size_mib * 1.048576 / elapsed, name))
+
+    logger.info(shell_utils.get_cli_separator("-"), date=False)
+
+    for speed, name in sorted(results, reverse=True):
+        logger.info("**%s:** %.2f MB/s" % (name, speed), date=False)
+
+    logger.info(shell_utils.get_cli_separator("-"), date=False)
+
+
+def make_synthetic_tasks(items_count, items_per_task=1000):
+    """Create the data of a big tasks file.
+
+    Parameters
+    ----------
+    items_count : int
+        Total amount of items of all tasks. There is also one ignored pattern for every ten
+        items.
+    items_per_task : int, optional
+        Amount of items of each task.
+
+    Returns
+    -------
+    dict
+        The data of a tasks file.
+    """
+    tasks = []
+
+    for i in range(0, items_count, items_per_task):
+        tasks.append({
+            "name": "Task %d" % len(tasks),
+            "type": "tar_local",
+            "destination": "/media/backups/task_%d" % len(tasks),
+            "items": ["/home/user/Documents/folder_%d/sub_folder_%d" % (i // 100, j)
+                      for j in range(i, min(i + items_per_task, items_count))]
+        })
+
+    return {
+        "settings": {
+            "ignored_patterns": ["*.cache_%d" % i for i in range(items_count // 10)]
+        },
+        "tasks": tasks
+    }
+
+
+def benchmark_yaml(items_count=100000, storage_dir=None, logger=None):
+    """Benchmark the YAML loaders and dumpers.
+
+    A big tasks file is created and then loaded and dumped with the pure Python implementation
+    of the vendored ``yaml`` package and with the LibYAML bindings of the system's PyYAML package
+    (if available). See :any:`yaml_utils`.
+
+    Parameters
+    ----------
+    items_count : int, optional
+        Amount of items of the tasks file. See :any:`make_synthetic_tasks`.
+    storage_dir : str, optional
+        Folder in which to create the tasks file. The system's temporary folder is used if not
+        specified.
+    logger : LogSystem
+        The logger.
+    """
+    data = make_synthetic_tasks(items_count)
+    tasks_root = mkdtemp(prefix="backup-utils-bench-", dir=storage_dir)
+    tasks_path = os.path.join(tasks_root, "tasks.yaml")
+
+    try:
+        with open(tasks_path, "w") as tasks_file:
+            yaml_utils.dump(data, tasks_file, default_flow_style=False)
+
+        size_mb = os.path.getsize(tasks_path) / 1000000
+        logger.info("**Tasks file with %d items (%.2f MB) created at:** %s" %
+                    (items_count, size_mb, tasks_path))
+
+        implementations = [("Pure Python", yaml.load, yaml.SafeLoader, yaml.dump, yaml.SafeDumper)]
+
+        if yaml_utils.LIBYAML_AVAILABLE:
+            implementations.append(("LibYAML", yaml_utils._yaml.load, yaml_utils._SafeLoader,
+                                    yaml_utils._yaml.dump, yaml_utils._SafeDumper))
+        else:
+            logger.warning("**Not available (module not installed):** LibYAML bindings of the "
+                           "system's PyYAML package", date=False)
+
+        results = {}
+
+        for name, load, loader, dump, dumper in implementations:
+            start = time.perf_counter()
+
+            with open(tasks_path, "r") as tasks_file:
+                loaded = load(tasks_file, Loader=loader)
+
+            load_time = max(time.perf_counter() - start, 1e-9)
+            start = time.perf_counter()
+            dump(loaded, Dumper=dumper, default_flow_style=False)
+            dump_time = max(time.perf_counter() - start, 1e-9)
+
+            results[name] = (load_time, dump_time)
+            logger.info(shell_utils.get_cli_separator("-"), date=False)
+            logger.info("**Implementation:** %s" % name, date=False)
+            logger.info("**Data loaded correctly:** %s" % (loaded == data), date=False)
+            logger.info("**Load time:** %.3f sec/s (%.2f MB/s)" %
+                        (load_time, size_mb / load_time), date=False)
+            logger.info("**Dump time:** %.3f sec/s (%.2f MB/s)" %
+                        (dump_time, size_mb / dump_time), date=False)
+
+        logger.info(shell_utils.get_cli_separator("-"), date=False)
+
+        if len(results) > 1:
+            logger.success("**Speed-up (load):** %.2fx" %
+                           (results["Pure Python"][0] / results["LibYAML"][0]), date=False)
+            logger.success("**Speed-up (dump):** %.2fx" %
+                           (results["Pure Python"][1] / results["LibYAML"][1]), date=False)
+    finally:
+        rmtree(tasks_root, ignore_errors=True)
+
+
+def _measure_command(cmd, runs):
+    """Measure the time that takes a command to run.
+
+    Parameters
+    ----------
+    cmd : list
+        The command.
+    runs : int
+        Amount of times to run the command.
+
+    Returns
+    -------
+    float
+        The shortest time (in milliseconds) of all runs. The shortest one is the least
+        affected by other processes running at the same time.
+    """
+    times = []
+
+    for i in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=app_utils.root_folder, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+
+    return min(times)
+
+
+def _get_import_times(cmd):
+    """Get the time spent importing each module by a command.
+
+    Parameters
+    ----------
+    cmd : list
+        The command. It must be a Python interpreter followed by its arguments.
+
+    Returns
+    -------
+    list
+        Tuples with the time (in milliseconds) spent importing a module (excluding the modules
+        imported by it) and the name of the module. As reported by ``python -X importtime``.
+    """
+    result = subprocess.run(cmd[:1] + ["-X", "importtime"] + cmd[1:], cwd=app_utils.root_folder,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    import_times = []
+
+    for line in result.stderr.decode("UTF-8", errors="replace").splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        self_time, cumulative_time, name = line[len("import time:"):].split("|", 2)
+
+        try:
+            import_times.append((int(self_time) / 1000, name.strip()))
+        except ValueError:
+            # The header.
+            continue
+
+    return import_times
+
+
+def benchmark_startup(budget_ms=30, runs=10, logger=None):
+    """Benchmark the startup time of the commands used by the Bash completions script.
+
+    Each command is run several times and its shortest time is compared against a time budget.
+    The modules imported by the command and the time spent importing them are obtained with
+    ``python -X importtime``.
+
+    Parameters
+    ----------
+    budget_ms : int, optional
+        Maximum time (in milliseconds) that each command should take, including the startup of
+        the Python interpreter.
+    runs : int, optional
+        Amount of times to run each command.
+    logger : LogSystem
+        The logger.
+
+    Returns
+    -------
+    bool
+        Whether all commands took less time than the budget.
+    """
+    interpreter_time = _measure_command([sys.executable, "-c", "pass"], runs)
+    interpreter_imports = {name for import_time, name in
+                           _get_import_times([sys.executable, "-c", "pass"])}
+    within_budget = True
+
+    logger.info(shell_utils.get_cli_separator("-"), date=False)
+    logger.info("**Python interpreter startup:** %.1f ms" % interpreter_time, date=False)
+
+    for command in ("print_tasks", "print_settings"):
+        cmd = [sys.executable, "app.py", command]
+        command_time = _measure_command(cmd, runs)
+        import_times = [(import_time, name) for import_time, name in _get_import_times(cmd)
+                        if name not in interpreter_imports]
+
+        logger.info(shell_utils.get_cli_separator("-"), date=False)
+        logger.info("**Command:** app.py %s" % command, date=False)
+        logger.info("**Time:** %.1f ms (budget: %d ms)" % (command_time, budget_ms), date=False)
+        logger.info("**Imported modules:** %d (%.1f ms)" % (
+            len(import_times), sum(import_time for import_time, name in import_times)),
+            date=False)
+        logger.info("**Slowest imports:**\n%s" % "\n".join(
+            "%.2f ms %s" % import_data for import_data in sorted(import_times, reverse=True)[:5]),
+            date=False)
+
+        if command_time > budget_ms:
+            within_budget = False
+
+    logger.info(shell_utils.get_cli_separator("-"), date=False)
+
+    if within_budget:
+        logger.success("**All commands started within the budget.**", date=False)
+    else:
+        logger.error("**Some commands exceeded the budget!**", date=False)
+
+    return within_budget
+
+
+if __name__ == "__main__":
+    pass
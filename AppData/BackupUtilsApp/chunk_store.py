@@ -0,0 +1,838 @@
+# -*- coding: utf-8 -*-
+"""Content addressable store of deduplicated chunks of files.
+
+Files are split into variable sized chunks using content defined chunking (a gear rolling
+hash), so inserting or removing data in a file only changes the chunks around the modification.
+Each chunk is identified by the SHA-256 hash of its content and is stored only once, compressed,
+no matter how many files or snapshots reference it.
+
+Store layout:
+
+- ``config.json``: The chunking parameters. They are fixed when the store is created, since \
+changing them would prevent deduplication against the existing chunks.
+- ``packs/<xx>/<pack id>.pack``: Chunks are appended to pack files of up to ``pack_size`` \
+bytes, so the store doesn't end up with millions of tiny files.
+- ``packs/<xx>/<pack id>.idx``: The index of each pack file. Records with the chunk ID, its \
+offset and length inside the pack, its uncompressed length and its compression. The index of \
+a pack is written after all its data is on disk, so packs without index (e.g., left by an \
+interrupted backup) are ignored.
+- ``snapshots/<group>/<name>.jsonl.gz``: One manifest per snapshot. A header line with the \
+snapshot metadata followed by one line per file with its metadata and the list of its chunks.
+
+Chunking is done with ``numpy`` if it's installed (about 80 MiB/s). Otherwise, the rolling hash
+is computed byte by byte in Python, which only reaches about 5 MiB/s (more than half a day for
+the first snapshot of 200 GiB). Both find exactly the same cut points, so a store can be used
+with and without ``numpy``.
+"""
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import stat
+import struct
+import zlib
+
+from collections import OrderedDict
+from importlib.util import find_spec
+
+# Importing numpy is slow, so it's only imported when a Chunker is created.
+NUMPY_INSTALLED = find_spec("numpy") is not None
+
+_store_version = 1
+_snapshot_ext = ".jsonl.gz"
+
+# Gear table used by the rolling hash. Derived from SHA-256 so it's the same everywhere.
+_gear = tuple(int.from_bytes(hashlib.sha256(b"gear-%d" % i).digest()[:8], "little")
+              for i in range(256))
+_mask_64 = 0xFFFFFFFFFFFFFFFF
+# Amount of bytes hashed at once when chunking with numpy. Cut points are usually found soon
+# after the minimum chunk size, so hashing the data up to the maximum chunk size at once would
+# be mostly wasted.
+_scan_block_size = 64 * 1024
+
+# Chunk ID, offset inside the pack, stored length, uncompressed length and compression.
+_index_record = struct.Struct("<32sQIIB")
+
+_compressions = {
+    "none": 0,
+    "zlib": 1,
+    "lzma": 2
+}
+
+_decompressors = {
+    0: bytes,
+    1: zlib.decompress,
+    2: lzma.decompress
+}
+
+_default_config = {
+    "version": _store_version,
+    "min_chunk_size": 256 * 1024,
+    "avg_chunk_size": 1024 * 1024,
+    "max_chunk_size": 4 * 1024 * 1024
+}
+
+
+class Chunker():
+    """Split data into content defined chunks.
+
+    Uses the gear rolling hash with normalized chunking (as in FastCDC). The first
+    ``min_size`` bytes of each chunk are skipped without hashing. Until the chunk reaches
+    ``avg_size``, a cut point requires more hash bits to be zero than after it. This keeps
+    chunk sizes close to ``avg_size``.
+
+    If ``numpy`` is installed, the hash is computed for blocks of data at once. Otherwise, it's
+    computed byte by byte (see the module documentation).
+    """
+
+    def __init__(self, min_size, avg_size, max_size):
+        """Initialize.
+
+        Parameters
+        ----------
+        min_size : int
+            Minimum chunk size.
+        avg_size : int
+            Average chunk size. Must be a power of 2.
+        max_size : int
+            Maximum chunk size.
+        """
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+
+        bits = avg_size.bit_length() - 1
+        # The highest bits of the hash are used because they depend on the last 64 bytes,
+        # while the lowest ones only depend on the last few bytes.
+        self._mask_s = ((1 << (bits + 2)) - 1) << (64 - bits - 2)
+        self._mask_l = ((1 << (bits - 2)) - 1) << (64 - bits + 2)
+        self._gear_array = None
+
+        if NUMPY_INSTALLED:
+            import numpy
+
+            self._gear_array = numpy.array(_gear, dtype=numpy.uint64)
+
+    def cut_point(self, data):
+        """Find the end of the first chunk in a block of data.
+
+        Parameters
+        ----------
+        data : bytes, memoryview
+            The data.
+
+        Returns
+        -------
+        int
+            The size of the first chunk.
+        """
+        length = len(data)
+
+        if length <= self.min_size:
+            return length
+
+        length = min(length, self.max_size)
+        normal_size = min(self.avg_size, length)
+
+        if self._gear_array is not None:
+            return self._cut_point_numpy(data, length, normal_size)
+
+        gear = _gear
+        mask_s = self._mask_s
+        h = 0
+
+        for i, byte in enumerate(data[self.min_size:normal_size], self.min_size):
+            h = ((h << 1) + gear[byte]) & _mask_64
+
+            if not h & mask_s:
+                return i + 1
+
+        mask_l = self._mask_l
+
+        for i, byte in enumerate(data[normal_size:length], normal_size):
+            h = ((h << 1) + gear[byte]) & _mask_64
+
+            if not h & mask_l:
+                return i + 1
+
+        return length
+
+    def _cut_point_numpy(self, data, length, normal_size):
+        """Find the end of the first chunk in a block of data using ``numpy``.
+
+        The hash after byte ``i`` is the sum of ``gear[data[i - k]] << k`` for the last 64 bytes
+        (the older ones are shifted out of the 64 bits), starting from the minimum chunk size.
+        It is computed for a whole block of bytes with 6 shifted additions, doubling the amount
+        of bytes added to each hash every time.
+
+        Parameters
+        ----------
+        data : bytes, memoryview
+            The data.
+        length : int
+            The maximum chunk size for ``data``.
+        normal_size : int
+            The chunk size until which the small mask is used.
+
+        Returns
+        -------
+        int
+            The size of the first chunk.
+        """
+        import numpy
+
+        buffer = numpy.frombuffer(data, dtype=numpy.uint8, count=length)
+        mask_s = numpy.uint64(self._mask_s)
+        mask_l = numpy.uint64(self._mask_l)
+        position = self.min_size
+
+        while position < length:
+            end = min(position + _scan_block_size, length)
+            # The last 63 bytes before the block are needed to compute the hashes of its first
+            # bytes.
+            context_start = max(position - 63, self.min_size)
+            hashes = self._gear_array[buffer[context_start:end]]
+
+            for shift in (1, 2, 4, 8, 16, 32):
+                hashes[shift:] += hashes[:-shift] << numpy.uint64(shift)
+
+            hashes = hashes[position - context_start:]
+            split = min(max(normal_size - position, 0), len(hashes))
+            cuts = numpy.flatnonzero((hashes[:split] & mask_s) == 0)
+
+            if not len(cuts):
+                cuts = numpy.flatnonzero((hashes[split:] & mask_l) == 0) + split
+
+            if len(cuts):
+                return position + int(cuts[0]) + 1
+
+            position = end
+
+        return length
+
+    def iter_chunks(self, file_obj):
+        """Split the content of a file into chunks.
+
+        Parameters
+        ----------
+        file_obj : object
+            A file object opened in binary mode.
+
+        Yields
+        ------
+        bytes
+            A chunk.
+        """
+        read_size = self.max_size * 4
+        data = b""
+        offset = 0
+        eof = False
+
+        while True:
+            if not eof and len(data) - offset < self.max_size:
+                block = file_obj.read(read_size)
+                eof = not block
+                data = data[offset:] + block
+                offset = 0
+
+            if offset == len(data):
+                break
+
+            if not eof and len(data) - offset < self.max_size:
+                continue
+
+            # The remaining data is passed without copying it.
+            with memoryview(data) as view:
+                cut = self.cut_point(view[offset:])
+
+            yield data[offset:offset + cut]
+
+            offset += cut
+
+
+class ChunkStore():
+    """A content addressable store of deduplicated and compressed chunks.
+
+    See the module documentation for details about its layout.
+
+    Attributes
+    ----------
+    root : str
+        Path to the store folder.
+    stats : dict
+        Statistics of the chunks added since the store was opened: new chunks
+        (``new_chunks``), their size before (``new_bytes``) and after compression
+        (``stored_bytes``), and chunks already stored (``dedup_chunks`` and ``dedup_bytes``).
+    """
+
+    def __init__(self, root, compression="zlib", pack_size=64 * 1024 * 1024):
+        """Initialize.
+
+        Parameters
+        ----------
+        root : str
+            Path to the store folder. It is created if it doesn't exist.
+        compression : str, optional
+            Compression used for new chunks: ``none``, ``zlib`` or ``lzma``.
+        pack_size : int, optional
+            Size after which a pack file is closed and a new one is started.
+        """
+        self.root = root
+        self._packs_dir = os.path.join(root, "packs")
+        self._snapshots_dir = os.path.join(root, "snapshots")
+        self._compression = _compressions[compression]
+        self._pack_size = pack_size
+        self._index = None
+        self._pack = None
+        self._read_handles = OrderedDict()
+        self.stats = {
+            "new_chunks": 0,
+            "new_bytes": 0,
+            "stored_bytes": 0,
+            "dedup_chunks": 0,
+            "dedup_bytes": 0
+        }
+
+        config_path = os.path.join(root, "config.json")
+
+        try:
+            with open(config_path, "r", encoding="UTF-8") as config_file:
+                self.config = json.load(config_file)
+        except FileNotFoundError:
+            os.makedirs(root, exist_ok=True)
+            self.config = dict(_default_config)
+
+            with open(config_path, "w", encoding="UTF-8") as config_file:
+                json.dump(self.config, config_file, indent=4)
+
+        self.chunker = Chunker(self.config["min_chunk_size"], self.config["avg_chunk_size"],
+                               self.config["max_chunk_size"])
+
+    def _get_index(self):
+        """Get the index of all the chunks in the store.
+
+        The index is loaded the first time it's needed.
+
+        Returns
+        -------
+        dict
+            Chunk IDs as keys and tuples with the pack ID, offset, stored length, uncompressed
+            length and compression of the chunks as values.
+        """
+        if self._index is not None:
+            return self._index
+
+        self._index = {}
+
+        if not os.path.isdir(self._packs_dir):
+            return self._index
+
+        for sub_dir in os.scandir(self._packs_dir):
+            if not sub_dir.is_dir():
+                continue
+
+            for entry in os.scandir(sub_dir.path):
+                if not entry.name.endswith(".idx"):
+                    continue
+
+                pack_id = entry.name[:-4]
+
+                with open(entry.path, "rb") as idx_file:
+                    data = idx_file.read()
+
+                for chunk_id, offset, length, raw_length, compression in \
+                        _index_record.iter_unpack(data):
+                    self._index[chunk_id] = (pack_id, offset, length, raw_length, compression)
+
+        return self._index
+
+    def _get_pack_path(self, pack_id, ext):
+        """Get the path to a pack file or its index.
+
+        Parameters
+        ----------
+        pack_id : str
+            The pack ID.
+        ext : str
+            ``.pack`` or ``.idx``.
+
+        Returns
+        -------
+        str
+            The path.
+        """
+        return os.path.join(self._packs_dir, pack_id[:2], pack_id + ext)
+
+    def has_chunk(self, chunk_id):
+        """Check if a chunk is stored.
+
+        Parameters
+        ----------
+        chunk_id : bytes
+            The chunk ID.
+
+        Returns
+        -------
+        bool
+            Whether the chunk is stored.
+        """
+        return chunk_id in self._get_index() or \
+            (self._pack is not None and chunk_id in self._pack["ids"])
+
+    def add_chunk(self, data):
+        """Store a chunk if it isn't already stored.
+
+        Parameters
+        ----------
+        data : bytes
+            The chunk content.
+
+        Returns
+        -------
+        bytes
+            The chunk ID.
+        """
+        chunk_id = hashlib.sha256(data).digest()
+
+        if self.has_chunk(chunk_id):
+            self.stats["dedup_chunks"] += 1
+            self.stats["dedup_bytes"] += len(data)
+            return chunk_id
+
+        if self._compression == 1:
+            stored = zlib.compress(data, 6)
+        elif self._compression == 2:
+            stored = lzma.compress(data)
+        else:
+            stored = data
+
+        compression = self._compression
+
+        if len(stored) >= len(data):
+            # Incompressible data (e.g., already compressed files).
+            stored = data
+            compression = 0
+
+        if self._pack is None:
+            pack_id = os.urandom(16).hex()
+            os.makedirs(os.path.dirname(self._get_pack_path(pack_id, ".pack")), exist_ok=True)
+            self._pack = {
+                "id": pack_id,
+                "file": open(self._get_pack_path(pack_id, ".pack"), "wb"),
+                "records": [],
+                "ids": set(),
+                "size": 0
+            }
+
+        pack = self._pack
+        pack["file"].write(stored)
+        pack["records"].append(_index_record.pack(chunk_id, pack["size"], len(stored),
+                                                  len(data), compression))
+        pack["ids"].add(chunk_id)
+        pack["size"] += len(stored)
+
+        self.stats["new_chunks"] += 1
+        self.stats["new_bytes"] += len(data)
+        self.stats["stored_bytes"] += len(stored)
+
+        if pack["size"] >= self._pack_size:
+            self.flush()
+
+        return chunk_id
+
+    def read_chunk(self, chunk_id):
+        """Read a chunk.
+
+        Parameters
+        ----------
+        chunk_id : bytes
+            The chunk ID.
+
+        Returns
+        -------
+        bytes
+            The chunk content.
+
+        Raises
+        ------
+        KeyError
+            If the chunk isn't stored.
+        """
+        if self._pack is not None and chunk_id in self._pack["ids"]:
+            self.flush()
+
+        pack_id, offset, length, raw_length, compression = self._get_index()[chunk_id]
+        handle = self._read_handles.pop(pack_id, None)
+
+        if handle is None:
+            handle = open(self._get_pack_path(pack_id, ".pack"), "rb")
+
+            if len(self._read_handles) >= 16:
+                self._read_handles.popitem(last=False)[1].close()
+
+        self._read_handles[pack_id] = handle
+        handle.seek(offset)
+
+        return _decompressors[compression](handle.read(length))
+
+    def flush(self):
+        """Close the current pack file and write its index.
+        """
+        pack = self._pack
+
+        if pack is None:
+            return
+
+        self._pack = None
+        pack["file"].flush()
+        os.fsync(pack["file"].fileno())
+        pack["file"].close()
+
+        idx_path = self._get_pack_path(pack["id"], ".idx")
+
+        with open(idx_path + ".tmp", "wb") as idx_file:
+            idx_file.write(b"".join(pack["records"]))
+            idx_file.flush()
+            os.fsync(idx_file.fileno())
+
+        os.replace(idx_path + ".tmp", idx_path)
+
+        index = self._get_index()
+
+        for record in pack["records"]:
+            chunk_id, offset, length, raw_length, compression = _index_record.unpack(record)
+            index[chunk_id] = (pack["id"], offset, length, raw_length, compression)
+
+    def close(self):
+        """Flush pending data and close all files.
+        """
+        self.flush()
+
+        for handle in self._read_handles.values():
+            handle.close()
+
+        self._read_handles.clear()
+
+    def list_snapshots(self, group):
+        """List the snapshots of a group.
+
+        Parameters
+        ----------
+        group : str
+            The group name (e.g., the task that created the snapshots).
+
+        Returns
+        -------
+        list
+            The paths to the snapshots, sorted from the oldest to the newest.
+        """
+        group_dir = os.path.join(self._snapshots_dir, group)
+
+        if not os.path.isdir(group_dir):
+            return []
+
+        return sorted(entry.path for entry in os.scandir(group_dir)
+                      if entry.name.endswith(_snapshot_ext))
+
+    def create_snapshot(self, paths, group, name, metadata=None, previous=None, on_error=None):
+        """Store files and create a snapshot referencing them.
+
+        Files whose inode, size and modification time didn't change since the ``previous``
+        snapshot aren't read again. Their chunks are reused.
+
+        Parameters
+        ----------
+        paths : iterable
+            Paths to the files to store. Regular files and symbolic links are stored. Other
+            file types are ignored.
+        group : str
+            See :any:`ChunkStore.list_snapshots`.
+        name : str
+            The snapshot name.
+        metadata : dict, optional
+            Extra data to store in the snapshot header.
+        previous : str, None, optional
+            Path to a previous snapshot.
+        on_error : method, optional
+            Function called with a path and an exception when a file can't be read. By
+            default, the exception is raised.
+
+        Returns
+        -------
+        tuple
+            The path to the created snapshot and a dictionary with the amount of files stored
+            (``files``), the amount of unchanged files (``reused_files``) and their size
+            (``reused_bytes``), and the total size of the files (``total_bytes``).
+        """
+        previous_files = {}
+
+        if previous is not None:
+            for entry in self.iter_snapshot(previous)[1]:
+                previous_files[entry["path"]] = entry
+
+        index = self._get_index()
+        stats = {
+            "files": 0,
+            "reused_files": 0,
+            "reused_bytes": 0,
+            "total_bytes": 0
+        }
+        group_dir = os.path.join(self._snapshots_dir, group)
+        snapshot_path = os.path.join(group_dir, name + _snapshot_ext)
+        os.makedirs(group_dir, exist_ok=True)
+
+        with gzip.open(snapshot_path + ".tmp", "wt", encoding="UTF-8") as snapshot:
+            header = dict(metadata or {})
+            header.update({"version": _store_version, "name": name})
+            snapshot.write(json.dumps(header) + "\n")
+
+            for path in paths:
+                try:
+                    entry = self._store_file(path, previous_files.get(path), index, stats)
+                except OSError as err:
+                    if on_error is None:
+                        raise
+
+                    on_error(path, err)
+                    continue
+
+                if entry is not None:
+                    stats["files"] += 1
+                    snapshot.write(json.dumps(entry) + "\n")
+
+        # The snapshot must never reference chunks that aren't safely stored.
+        self.flush()
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+
+        return snapshot_path, stats
+
+    def _store_file(self, path, previous_entry, index, stats):
+        """Store a file.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file.
+        previous_entry : dict, None
+            The entry of the file in the previous snapshot.
+        index : dict
+            See :any:`ChunkStore._get_index`.
+        stats : dict
+            See :any:`ChunkStore.create_snapshot`.
+
+        Returns
+        -------
+        dict, None
+            The snapshot entry of the file. None if the file type isn't supported.
+        """
+        st = os.lstat(path)
+        entry = {
+            "path": path,
+            "mode": stat.S_IMODE(st.st_mode),
+            "uid": st.st_uid,
+            "gid": st.st_gid,
+            "mtime_ns": st.st_mtime_ns
+        }
+
+        if stat.S_ISLNK(st.st_mode):
+            entry["type"] = "symlink"
+            entry["target"] = os.readlink(path)
+            return entry
+
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        entry.update({
+            "type": "file",
+            "size": st.st_size,
+            "ino": st.st_ino
+        })
+        stats["total_bytes"] += st.st_size
+
+        if previous_entry is not None and previous_entry.get("type") == "file" and \
+                (previous_entry["ino"], previous_entry["size"], previous_entry["mtime_ns"]) == \
+                (st.st_ino, st.st_size, st.st_mtime_ns) and \
+                all(bytes.fromhex(c) in index for c in previous_entry["chunks"]):
+            entry["chunks"] = previous_entry["chunks"]
+            stats["reused_files"] += 1
+            stats["reused_bytes"] += st.st_size
+            return entry
+
+        with open(path, "rb") as file_obj:
+            entry["chunks"] = [self.add_chunk(chunk).hex()
+                               for chunk in self.chunker.iter_chunks(file_obj)]
+
+        return entry
+
+    def iter_snapshot(self, snapshot_path):
+        """Read a snapshot.
+
+        Parameters
+        ----------
+        snapshot_path : str
+            Path to the snapshot.
+
+        Returns
+        -------
+        tuple
+            The snapshot header and a generator of its file entries.
+        """
+        snapshot = gzip.open(snapshot_path, "rt", encoding="UTF-8")
+        header = json.loads(snapshot.readline())
+
+        def iter_entries():
+            with snapshot:
+                for line in snapshot:
+                    yield json.loads(line)
+
+        return header, iter_entries()
+
+    def iter_file_data(self, entry):
+        """Read the content of a file stored in a snapshot.
+
+        Parameters
+        ----------
+        entry : dict
+            A file entry of a snapshot.
+
+        Yields
+        ------
+        bytes
+            The chunks of the file, in order.
+        """
+        for chunk_id in entry.get("chunks", []):
+            yield self.read_chunk(bytes.fromhex(chunk_id))
+
+    def restore_snapshot(self, snapshot_path, target_dir, on_error=None):
+        """Restore the files of a snapshot.
+
+        Parameters
+        ----------
+        snapshot_path : str
+            Path to the snapshot.
+        target_dir : str
+            Folder in which to restore the files. The absolute paths of the files are
+            recreated inside it.
+        on_error : method, optional
+            Function called with a path and an exception when a file can't be restored. By
+            default, the exception is raised.
+
+        Returns
+        -------
+        int
+            The amount of restored files.
+        """
+        restored = 0
+
+        for entry in self.iter_snapshot(snapshot_path)[1]:
+            destination = os.path.join(target_dir, entry["path"].lstrip(os.sep))
+
+            try:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+                if entry["type"] == "symlink":
+                    if os.path.lexists(destination):
+                        os.remove(destination)
+
+                    os.symlink(entry["target"], destination)
+                    os.utime(destination, ns=(entry["mtime_ns"], entry["mtime_ns"]),
+                             follow_symlinks=False)
+                else:
+                    with open(destination, "wb") as file_obj:
+                        for data in self.iter_file_data(entry):
+                            file_obj.write(data)
+
+                    os.chmod(destination, entry["mode"])
+                    os.utime(destination, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+            except (OSError, KeyError) as err:
+                if on_error is None:
+                    raise
+
+                on_error(entry["path"], err)
+                continue
+
+            restored += 1
+
+        return restored
+
+    def check_snapshot(self, snapshot_path, hashfunc="sha256"):
+        """Check the integrity of all the files of a snapshot.
+
+        Every chunk referenced by the snapshot is read and its content is checked against its
+        ID (the hash of its content).
+
+        Parameters
+        ----------
+        snapshot_path : str
+            Path to the snapshot.
+        hashfunc : str, optional
+            The hash function used to compute the hashes of the files. See
+            :any:`hash_utils.HASH_FUNCS`.
+
+        Returns
+        -------
+        dict
+            See :any:`verification.verify_archive`.
+        """
+        from .python_utils import hash_utils
+
+        hash_func = hash_utils.HASH_FUNCS[hash_utils.resolve_hashfunc(hashfunc)]
+        result = {
+            "checked": 0,
+            "mismatches": [],
+            "hashes": {}
+        }
+        checked_chunks = set()
+
+        for entry in self.iter_snapshot(snapshot_path)[1]:
+            if entry["type"] != "file":
+                continue
+
+            h = hash_func()
+            size = 0
+
+            try:
+                for chunk_id in entry["chunks"]:
+                    data = self.read_chunk(bytes.fromhex(chunk_id))
+
+                    if chunk_id not in checked_chunks:
+                        if hashlib.sha256(data).hexdigest() != chunk_id:
+                            raise ValueError("Corrupted chunk: %s" % chunk_id)
+
+                        checked_chunks.add(chunk_id)
+
+                    h.update(data)
+                    size += len(data)
+            except (OSError, KeyError, ValueError, zlib.error, lzma.LZMAError) as err:
+                result["mismatches"].append((entry["path"], "Unreadable: %r" % err))
+                continue
+
+            result["checked"] += 1
+            result["hashes"][entry["path"].lstrip(os.sep)] = h.hexdigest()
+
+            if size != entry["size"]:
+                result["mismatches"].append((entry["path"], "Size mismatch: %d != %d" %
+                                             (size, entry["size"])))
+
+        return result
+
+
+def get_store_root(snapshot_path):
+    """Get the root folder of the store that contains a snapshot.
+
+    Parameters
+    ----------
+    snapshot_path : str
+        Path to a snapshot.
+
+    Returns
+    -------
+    str
+        The store root folder.
+    """
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(snapshot_path))))
+
+
+if __name__ == "__main__":
+    pass
@@ -11,20 +11,15 @@ root_folder : str
 """
 
 import os
+import sys
 
-from collections import OrderedDict
-
-from . import app_utils
+# NOTE: Only the modules needed to define the command line interface are imported here. The rest
+# are imported by the methods that need them, so each command only imports what it uses.
 from .__init__ import __appdescription__
 from .__init__ import __appname__
 from .__init__ import __status__
 from .__init__ import __version__
-from .backup import Backup
 from .python_utils import cli_utils
-from .python_utils import exceptions
-from .python_utils import misc_utils
-from .python_utils import shell_utils
-from .python_utils import yaml_utils
 
 root_folder = os.path.realpath(os.path.abspath(os.path.join(
     os.path.normpath(os.getcwd()))))
@@ -38,9 +33,17 @@ Usage:
     app.py backup (-t <name> | --task=<name>)
                   [-t <name>... | --task=<name>...]
                   [-g <name> | --global=<name>]
+                  [-j <n> | --jobs=<n>]
                   [-d | --dry-run]
+                  [--profile]
     app.py (print_tasks | print_settings)
     app.py generate system_executable
+    app.py benchmark walk [--files=<n>] [--path=<path>]
+    app.py benchmark hash [--size=<mib>] [--workers=<n>] [--path=<path>]
+    app.py benchmark hashfuncs [--size=<mib>]
+    app.py benchmark yaml [--items=<n>] [--path=<path>]
+    app.py benchmark startup [--budget=<ms>]
+    app.py restore <snapshot> <target>
 
 Options:
 
@@ -62,12 +65,57 @@ Options:
     will use. Should be the name of a file stored in
     UserData/settings/<name>.yaml. Extension omitted.
 
+-j <n>, --jobs=<n>
+    Maximum amount of backup tasks to run in parallel. Tasks whose
+    destinations are in the same device, tasks that declare the "depends_on"
+    key and tasks that declare the "exclusive" key are still run one after
+    the other. [default: 1]
+
 -d, --dry-run
     Do not perform file system changes. Only display messages informing of the
     actions that will be performed or commands that will be executed.
     WARNING! Some file system changes will be performed (e.g., temporary files
     creation).
 
+--profile
+    Profile the execution of the backup tasks. The profile is stored next to
+    the log file (same name with the .pstats extension) and the time spent in
+    each phase of the execution (files loading and validation, files lists
+    creation, execution of commands, hooks and notifications) is logged.
+
+<snapshot>
+    Path to a snapshot created by a dedup_local task (stored inside the
+    chunk store at snapshots/<task>/<name>.jsonl.gz).
+
+<target>
+    Folder in which to restore the files of a snapshot. The absolute paths of
+    the files are recreated inside it.
+
+--files=<n>
+    Amount of files of the synthetic tree created by the benchmarks that
+    need one. [default: 1000000]
+
+--path=<path>
+    Folder in which to create the data used by the benchmarks. The system's
+    temporary folder is used if not specified.
+
+--size=<mib>
+    Amount of data (in MiB) created by the benchmarks that need data to
+    process. [default: 1024]
+
+--items=<n>
+    Amount of items of the tasks file created by the benchmarks that need
+    one. [default: 100000]
+
+--budget=<ms>
+    Maximum time (in milliseconds) that the commands used by the Bash
+    completions script should take to run. [default: 30]
+
+--workers=<n>
+    Maximum amount of workers used by the benchmarks that measure how
+    performance scales with the amount of workers. Defaults to the amount of
+    CPU cores.
+
 """.format(appname=__appname__,
            appdescription=__appdescription__,
            version=__version__,
@@ -87,11 +135,14 @@ class CommandLineInterface(cli_utils.CommandLineInterfaceSuper):
         Set the method that will be executed when calling CommandLineTool.run().
     global_settings : dict
         Global settings that will be merged with task specific settings.
+    profiler : profiling.Profiler, None
+        The profiler used when the ``--profile`` option is used.
     tasks : list
         Backup tasks to perform.
     """
     action = None
     global_settings = {}
+    profiler = None
     tasks = []
 
     def __init__(self, docopt_args):
@@ -113,7 +164,7 @@ class CommandLineInterface(cli_utils.CommandLineInterfaceSuper):
             self.a["print_settings"]
         ]
 
-        super().__init__(__appname__)
+        super().__init__(__appname__, queued_logging=True)
 
         if self.a["--manual"]:
             self.action = self.display_manual_page
@@ -125,9 +176,21 @@ class CommandLineInterface(cli_utils.CommandLineInterfaceSuper):
             if self.a["system_executable"]:
                 self.logger.info("**System executable generation...**")
                 self.action = self.system_executable_generation
+        elif self.a["benchmark"]:
+            self.action = self.run_benchmark
+        elif self.a["restore"]:
+            self.action = self.restore_snapshot
         elif self.a["backup"] and (self.a["--task"]):
             # NOTE: All data should be validated BEFORE attempting to execute tasks.
+            from collections import OrderedDict
+            from copy import deepcopy
+
+            from . import app_utils
+            from . import profiling
+            from .config_cache import ConfigCache
             from .python_utils import json_schema_utils
+            from .python_utils import misc_utils
+            from .python_utils import yaml_utils
             settings_schema = os.path.join(root_folder,
                                            "AppData",
                                            "data",
@@ -141,6 +204,15 @@ class CommandLineInterface(cli_utils.CommandLineInterfaceSuper):
 
             self.action = self.run_tasks
 
+            if self.a["--profile"]:
+                self.profiler = profiling.Profiler(
+                    os.path.splitext(self.logger.get_log_file())[0] + ".pstats")
+                self.profiler.start()
+
+            # Files that didn't change since they were last validated aren't parsed again.
+            config_cache = ConfigCache(app_utils.get_user_data_path("cache", "config.pickle"),
+                                       schemas=(settings_schema, tasks_schema))
+            global_settings_file = None
             validation_errors_count = 0
 
             try:
@@ -150,18 +222,33 @@ class CommandLineInterface(cli_utils.CommandLineInterfaceSuper):
                                                         "settings",
                                                         "%s.yaml" % self.a["--global"])
                     print(global_settings_file)
-                    with open(global_settings_file, "r") as yaml_file:
-                        self.global_settings = yaml_utils.load(yaml_file)
-
-                    if json_schema_utils.JSONSCHEMA_INSTALLED:
-                        validation_errors_count += json_schema_utils.validate(
-                            self.global_settings, settings_schema,
-                            raise_error=False,
-                            error_message_extra_info="\n".join([
-                                "**File:** %s" % global_settings_file,
-                                "**Data key:** settings"
-                            ]),
-                            logger=self.logger)
+                    global_settings = config_cache.get(global_settings_file)
+
+                    if global_settings is None:
+                        with profiling.phase("YAML load"), \
+                                open(global_settings_file, "r") as yaml_file:
+                            global_settings = yaml_utils.load(yaml_file)
+
+                        file_errors_count = 0
+
+                        if json_schema_utils.JSONSCHEMA_INSTALLED:
+                            with profiling.phase("Schema validation"):
+                                file_errors_count += json_schema_utils.validate(
+                                    global_settings, settings_schema,
+                                    raise_error=False,
+                                    error_message_extra_info="\n".join([
+                                        "**File:** %s" % global_settings_file,
+                                        "**Data key:** settings"
+                                    ]),
+                                    copy_instance=False,
+                                    logger=self.logger)
+
+                        if file_errors_count == 0:
+                            config_cache.set(global_settings_file, global_settings)
+
+                        validation_errors_count += file_errors_count
+
+                    self.global_settings = global_settings
             except Exception as err:
                 self.logger.error("**Failure reading global settings file!**")
                 self.logger.error(err)
@@ -173,32 +260,49 @@ class CommandLineInterface(cli_utils.CommandLineInterfaceSuper):
                 tasks_data = None
 
                 try:
-                    with open(tasks_file_path, "r") as yaml_file:
-                        tasks_data = yaml_utils.load(yaml_file)
+                    # The validation of the settings of a tasks file depends on the global
+                    # settings they are merged with.
+                    tasks_data = config_cache.get(tasks_file_path, (global_settings_file,))
+                    cached = tasks_data is not None
+
+                    if not cached:
+                        with profiling.phase("YAML load"), open(tasks_file_path, "r") as yaml_file:
+                            tasks_data = yaml_utils.load(yaml_file)
 
                     if tasks_data:
-                        task_settings = misc_utils.merge_dict(self.global_settings,
+                        # The global settings are shared by all tasks files, so each file's
+                        # settings are merged into a copy of them.
+                        task_settings = misc_utils.merge_dict(deepcopy(self.global_settings),
                                                               tasks_data.get("settings", {}),
                                                               logger=self.logger)
-
-                        if json_schema_utils.JSONSCHEMA_INSTALLED:
-                            validation_errors_count += json_schema_utils.validate(
-                                tasks_data.get("tasks", []), tasks_schema,
-                                raise_error=False,
-                                error_message_extra_info="\n".join([
-                                    "**File:** %s" % tasks_file_path,
-                                    "**Data key:** tasks"
-                                ]),
-                                logger=self.logger)
-
-                            validation_errors_count += json_schema_utils.validate(
-                                task_settings, settings_schema,
-                                raise_error=False,
-                                error_message_extra_info="\n".join([
-                                    "**File:** %s" % tasks_file_path,
-                                    "**Data key:** settings"
-                                ]),
-                                logger=self.logger)
+                        file_errors_count = 0
+
+                        if not cached and json_schema_utils.JSONSCHEMA_INSTALLED:
+                            with profiling.phase("Schema validation"):
+                                file_errors_count += json_schema_utils.validate(
+                                    tasks_data.get("tasks", []), tasks_schema,
+                                    raise_error=False,
+                                    error_message_extra_info="\n".join([
+                                        "**File:** %s" % tasks_file_path,
+                                        "**Data key:** tasks"
+                                    ]),
+                                    copy_instance=False,
+                                    logger=self.logger)
+
+                                file_errors_count += json_schema_utils.validate(
+                                    task_settings, settings_schema,
+                                    raise_error=False,
+                                    error_message_extra_info="\n".join([
+                                        "**File:** %s" % tasks_file_path,
+                                        "**Data key:** settings"
+                                    ]),
+                                    copy_instance=False,
+                                    logger=self.logger)
+
+                        if not cached and file_errors_count == 0:
+                            config_cache.set(tasks_file_path, tasks_data, (global_settings_file,))
+
+                        validation_errors_count += file_errors_count
 
                         for task in tasks_data.get("tasks", []):
                             self.tasks.append((task, task_settings))
@@ -206,6 +310,11 @@ class CommandLineInterface(cli_utils.CommandLineInterfaceSuper):
                     self.logger.error(tasks_file_path)
                     self.logger.error(err)
 
+            try:
+                config_cache.save()
+            except OSError as err:
+                self.logger.warning("**Configuration cache couldn't be written:** %s" % err)
+
             if validation_errors_count > 0:
                 raise SystemExit(1)
 
@@ -217,31 +326,156 @@ class CommandLineInterface(cli_utils.CommandLineInterfaceSuper):
         exceptions.KeyboardInterruption
             See :any:`exceptions.KeyboardInterruption`.
         """
+        from .python_utils import exceptions
+
         try:
-            if self.tasks:
+            jobs = int(self.a["--jobs"] or 1)
+
+            if self.tasks and jobs > 1:
+                from .scheduler import TasksScheduler
+
+                failed = TasksScheduler(self.tasks, self._run_buffered_task,
+                                        jobs=jobs, logger=self.logger).run()
+
+                if failed:
+                    self.logger.error("**Failed or skipped tasks:** %d" % len(failed))
+                    raise SystemExit(1)
+            elif self.tasks:
                 for task, settings in self.tasks:
-                    self.logger.info("**%s**" % shell_utils.get_cli_separator(), date=False)
-                    self.logger.info("**Running task:** %s" % task.get("name", ""))
-                    self.logger.info("**Task type:** %s" % task.get("type", ""))
-
-                    try:
-                        backup_task = Backup(task=task,
-                                             settings=settings,
-                                             dry_run=self.a["--dry-run"],
-                                             logger=self.logger)
-                    except Exception as err:
-                        self.logger.err(err)
-                        continue
-                    else:
-                        backup_task.run()
+                    self._run_task(task, settings, self.logger)
         except KeyboardInterrupt:
             raise exceptions.KeyboardInterruption()
 
+    def _run_task(self, task, settings, logger, capture_output=False):
+        """Run a task.
+
+        Parameters
+        ----------
+        task : dict
+            The backup task to perform.
+        settings : dict
+            The settings used by the task.
+        logger : object
+            See <class :any:`LogSystem`>.
+        capture_output : bool, optional
+            See :any:`BaseTask` > capture_output.
+
+        Returns
+        -------
+        int
+            The amount of errors found while running the task. A task that couldn't be created
+            counts as one error.
+        """
+        from .backup import Backup
+        from .python_utils import shell_utils
+
+        logger.info("**%s**" % shell_utils.get_cli_separator(), date=False)
+        logger.info("**Running task:** %s" % task.get("name", ""))
+        logger.info("**Task type:** %s" % task.get("type", ""))
+
+        try:
+            backup_task = Backup(task=task,
+                                 settings=settings,
+                                 dry_run=self.a["--dry-run"],
+                                 logger=logger,
+                                 capture_output=capture_output)
+        except Exception as err:
+            logger.error(err)
+
+            return 1
+
+        return backup_task.run()
+
+    def _run_buffered_task(self, task, settings):
+        """Run a task logging all its messages at once when it finishes.
+
+        Parameters
+        ----------
+        task : dict
+            The backup task to perform.
+        settings : dict
+            The settings used by the task.
+
+        Returns
+        -------
+        int
+            See :any:`CommandLineInterface._run_task`.
+        """
+        from .python_utils import log_system
+
+        logger = log_system.BufferedLogger(self.logger)
+
+        try:
+            return self._run_task(task, settings, logger, capture_output=True)
+        finally:
+            logger.flush()
+
     def run(self):
         """Execute the assigned action stored in self.action if any.
+
+        If the ``--profile`` option is used, the profile is stored and reported even if the
+        action fails.
         """
-        if self.action is not None:
+        if self.action is None:
+            return
+
+        if self.profiler is None:
             self.action()
+            return
+
+        try:
+            self.action()
+        finally:
+            self.profiler.report(self.profiler.stop(), self.logger)
+
+    def run_benchmark(self):
+        """See :any:`BackupUtilsApp.benchmarks`.
+        """
+        from . import benchmarks
+
+        if self.a["walk"]:
+            benchmarks.benchmark_walk(files_count=int(self.a["--files"]),
+                                      storage_dir=self.a["--path"],
+                                      logger=self.logger)
+        elif self.a["hashfuncs"]:
+            benchmarks.benchmark_hashfuncs(size_mib=int(self.a["--size"]), logger=self.logger)
+        elif self.a["yaml"]:
+            benchmarks.benchmark_yaml(items_count=int(self.a["--items"]),
+                                      storage_dir=self.a["--path"],
+                                      logger=self.logger)
+        elif self.a["startup"]:
+            if not benchmarks.benchmark_startup(budget_ms=int(self.a["--budget"]),
+                                                logger=self.logger):
+                raise SystemExit(1)
+        elif self.a["hash"]:
+            benchmarks.benchmark_hash(size_mib=int(self.a["--size"]),
+                                      max_workers=int(self.a["--workers"] or 0) or None,
+                                      storage_dir=self.a["--path"],
+                                      logger=self.logger)
+
+    def restore_snapshot(self):
+        """See :any:`BackupUtilsApp.chunk_store.ChunkStore.restore_snapshot`.
+        """
+        from . import chunk_store
+
+        snapshot_path = os.path.abspath(os.path.expanduser(self.a["<snapshot>"]))
+        target_dir = os.path.abspath(os.path.expanduser(self.a["<target>"]))
+        errors = []
+        store = chunk_store.ChunkStore(chunk_store.get_store_root(snapshot_path))
+
+        self.logger.info("**Restoring snapshot:** %s" % snapshot_path)
+
+        try:
+            restored = store.restore_snapshot(snapshot_path, target_dir,
+                                              on_error=lambda path, err: errors.append((path, err)))
+        finally:
+            store.close()
+
+        self.logger.info("**Files restored:** %d" % restored, date=False)
+
+        if errors:
+            self.logger.error("**Files that couldn't be restored:**\n%s" %
+                              "\n".join("%s: %r" % err for err in errors))
 
     def system_executable_generation(self):
         """See :any:`cli_utils.CommandLineInterfaceSuper._system_executable_generation`.
@@ -262,19 +496,98 @@ class CommandLineInterface(cli_utils.CommandLineInterfaceSuper):
         self._display_manual_page(os.path.join(root_folder, "AppData", "data", "man", "app.py.1"))
 
     def print_tasks(self):
-        """See :any:`BackupUtilsApp.app_utils.print_config_files_list`.
+        """See :any:`print_config_files_list`.
         """
-        app_utils.print_config_files_list("tasks")
+        print_config_files_list("tasks")
 
     def print_settings(self):
-        """See :any:`BackupUtilsApp.app_utils.print_config_files_list`.
+        """See :any:`print_config_files_list`.
         """
-        app_utils.print_config_files_list("settings")
+        print_config_files_list("settings")
+
+
+def _get_config_files_names(config_dir):
+    """Get the names of the configuration files stored in a folder.
+
+    Parameters
+    ----------
+    config_dir : str
+        Path to the folder.
+
+    Returns
+    -------
+    list
+        The sorted file names without extension.
+    """
+    with os.scandir(config_dir) as entries:
+        list_of_files = sorted(entry.name for entry in entries
+                               if entry.is_file(follow_symlinks=False) and
+                               entry.name.endswith((".yaml", ".yml")))
+
+    return [os.path.splitext(f)[0] for f in list_of_files]
+
+
+def print_config_files_list(file_type):
+    """Print config files list.
+
+    Used to print to standard output the list of configuration files (either "tasks" or "settings"
+    configuration files). The output is used only by the Bash completions script, so only modules
+    that are already imported by this module are used.
+
+    The list is stored in ``UserData/cache/<file_type>.completions``, which is only valid while
+    it's newer than the folder containing the configuration files (files added, removed or
+    renamed update the modification time of the folder). The Bash completions script reads this
+    file directly when it's valid, without running this application.
+
+    Parameters
+    ----------
+    file_type : str
+        One of "tasks" or "settings".
+    """
+    config_dir = os.path.join(root_folder, "UserData", file_type)
+    cache_path = os.path.join(root_folder, "UserData", "cache", "%s.completions" % file_type)
+    config_dir_mtime = os.stat(config_dir).st_mtime_ns
+
+    try:
+        if os.stat(cache_path).st_mtime_ns > config_dir_mtime:
+            with open(cache_path, "r", encoding="UTF-8") as cache_file:
+                print(cache_file.read(), end="")
+
+            return
+    except OSError:
+        pass
+
+    names_list = "".join(name + "\n" for name in _get_config_files_names(config_dir))
+    print(names_list, end="")
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        with open(cache_path + ".tmp", "w", encoding="UTF-8") as cache_file:
+            cache_file.write(names_list)
+
+        os.replace(cache_path + ".tmp", cache_path)
+
+        # The folder changed while it was being read. Leave the cache outdated.
+        if os.stat(config_dir).st_mtime_ns != config_dir_mtime:
+            os.remove(cache_path)
+    except OSError:
+        # Completions still work without a cache.
+        pass
 
 
 def main():
     """Initialize command line interface.
+
+    The commands used by the Bash completions script (``print_tasks`` and ``print_settings``)
+    are run on every press of the TAB key. They are handled before parsing the arguments and
+    without creating the command line interface (nor its log file).
     """
+    if sys.argv[1:] in (["print_tasks"], ["print_settings"]) and \
+            os.path.exists(".backup-utils.flag"):
+        print_config_files_list(sys.argv[1][len("print_"):])
+        return
+
     cli_utils.run_cli(flag_file=".backup-utils.flag",
                       docopt_doc=docopt_doc,
                       app_name=__appname__,
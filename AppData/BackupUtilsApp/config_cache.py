@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Cache of the parsed and validated configuration files.
+
+Parsing the YAML files of tasks and settings and validating them is the most expensive part of
+starting the ``backup`` command. The data of the files that passed validation is stored in a
+pickle file, so it's only parsed and validated again after a file changes.
+
+An entry is only used if the path, modification time and size of the file (and of the files
+it depends on) are the same as when it was stored. The whole cache is discarded when the
+version of the application, the availability of the ``jsonschema`` module or any of the
+schemas change.
+"""
+import os
+import pickle
+
+from copy import deepcopy
+
+from .__init__ import __version__
+from .python_utils import json_schema_utils
+
+
+def _get_stamp(path):
+    """Get the data used to detect changes in a file.
+
+    Parameters
+    ----------
+    path : str
+        Path to a file.
+
+    Returns
+    -------
+    tuple, None
+        The absolute path, modification time and size of the file. None if it doesn't exist or
+        it can't be read.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+class ConfigCache():
+    """Cache of configuration files.
+
+    Attributes
+    ----------
+    cache_path : str
+        Path to the file in which the cache is stored.
+    """
+
+    def __init__(self, cache_path, schemas=()):
+        """Initialize.
+
+        Parameters
+        ----------
+        cache_path : str
+            See :any:`ConfigCache` > cache_path.
+        schemas : iterable, optional
+            Paths to the schemas used to validate the configuration files.
+        """
+        self.cache_path = cache_path
+        self._key = (__version__, json_schema_utils.JSONSCHEMA_INSTALLED,
+                     tuple(_get_stamp(schema) for schema in schemas))
+        self._entries = {}
+        self._modified = False
+
+        try:
+            with open(self.cache_path, "rb") as cache_file:
+                key, entries = pickle.load(cache_file)
+
+            if key == self._key:
+                self._entries = entries
+        except Exception:
+            # A missing, corrupted or outdated cache is simply rebuilt.
+            pass
+
+    def _get_entry_key(self, path, dependencies):
+        """Get the key of an entry.
+
+        Parameters
+        ----------
+        path : str
+            Path to a configuration file.
+        dependencies : iterable
+            Paths to other files whose changes invalidate the entry. ``None`` values are
+            ignored.
+
+        Returns
+        -------
+        tuple
+            The stamps of the file and of its dependencies.
+        """
+        return (_get_stamp(path),) + tuple(_get_stamp(dependency) for dependency in dependencies
+                                           if dependency is not None)
+
+    def get(self, path, dependencies=()):
+        """Get the data of a configuration file.
+
+        Parameters
+        ----------
+        path : str
+            Path to a configuration file.
+        dependencies : iterable, optional
+            See :any:`ConfigCache._get_entry_key`.
+
+        Returns
+        -------
+        object, None
+            The data stored for the file. None if there is no entry for it or if the file or its
+            dependencies changed.
+        """
+        entry = self._entries.get(os.path.abspath(path))
+
+        if entry is None or entry[0] != self._get_entry_key(path, dependencies):
+            return None
+
+        return entry[1]
+
+    def set(self, path, data, dependencies=()):
+        """Store the data of a configuration file that passed validation.
+
+        Parameters
+        ----------
+        path : str
+            Path to a configuration file.
+        data : object
+            The parsed data of the file. A copy of it is stored, so the data can be modified
+            after storing it without affecting the cache.
+        dependencies : iterable, optional
+            See :any:`ConfigCache._get_entry_key`.
+        """
+        self._entries[os.path.abspath(path)] = (self._get_entry_key(path, dependencies),
+                                                deepcopy(data))
+        self._modified = True
+
+    def save(self):
+        """Store the cache if it was modified.
+
+        Raises
+        ------
+        OSError
+            If the cache couldn't be written.
+        """
+        if not self._modified:
+            return
+
+        # Forget the files that were removed.
+        self._entries = {path: entry for path, entry in self._entries.items()
+                         if os.path.exists(path)}
+
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+
+        with open(tmp_path, "wb") as cache_file:
+            pickle.dump((self._key, self._entries), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_path, self.cache_path)
+        self._modified = False
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Persistent index of the state of backed up files.
+"""
+import os
+import sqlite3
+import stat
+
+from .python_utils import hash_utils
+
+_schema = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    inode INTEGER,
+    size INTEGER,
+    mtime_ns INTEGER,
+    hash TEXT,
+    run_id INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class FileStateIndex():
+    """Persistent index of the state of the files backed up by a task.
+
+    The index is stored in an SQLite database and records the path, inode, size, modification
+    time (in nanoseconds) and, optionally, the content hash of each file as they were in the last
+    successful run of a task. This allows to know which files changed since the last run with one
+    single pass over the source tree and one ``lstat`` per file, without reading any content.
+
+    Usage:
+
+    - Pass the paths of all files through :any:`FileStateIndex.scan` (or \
+    :any:`FileStateIndex.track`), which reports the state of each file and updates the index.
+    - Call :any:`FileStateIndex.commit` after the backup succeeded to make the new state the \
+    reference for the next run (files not seen in this run are considered deleted and are \
+    removed from the index), or :any:`FileStateIndex.rollback` to discard it.
+
+    Attributes
+    ----------
+    counts : dict
+        Amount of new, modified and unchanged files scanned during the current run. The amount
+        of deleted files is only available after calling :any:`FileStateIndex.commit` or
+        :any:`FileStateIndex.rollback`.
+    """
+
+    def __init__(self, db_path, hashfunc=None):
+        """Initialize.
+
+        Parameters
+        ----------
+        db_path : str
+            Path to the database file. It is created if it doesn't exist.
+        hashfunc : str, None, optional
+            The name of a hash function (see :any:`hash_utils.HASH_FUNCS`). If specified, the
+            content hash of new and modified files is computed and stored in the index.
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._db_path = db_path
+        self._hashfunc = hashfunc
+        self._conn = sqlite3.connect(db_path)
+        # The index can always be rebuilt from scratch, so durability can be traded for speed.
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._conn.execute("PRAGMA journal_mode = MEMORY")
+        self._conn.executescript(_schema)
+
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'run_id'").fetchone()
+        self._last_run_id = int(row[0]) if row else 0
+        self._run_id = self._last_run_id + 1
+        self.counts = {
+            "new": 0,
+            "modified": 0,
+            "unchanged": 0,
+            "deleted": 0
+        }
+
+    def is_empty(self):
+        """Check if the index has no recorded runs.
+
+        Returns
+        -------
+        bool
+            Whether this is the first run recorded by the index.
+        """
+        return self._last_run_id == 0
+
+    def scan(self, paths):
+        """Scan files and update the index with their current state.
+
+        Parameters
+        ----------
+        paths : iterable
+            Paths to files. Each file is checked with one ``lstat`` call.
+
+        Yields
+        ------
+        tuple
+            The path to a file, its ``os.stat_result`` and its state (``new``, ``modified`` or
+            ``unchanged``). Files that can't be ``lstat``-ed are skipped.
+        """
+        select = "SELECT inode, size, mtime_ns, hash FROM files WHERE path = ?"
+        touch = "UPDATE files SET run_id = ? WHERE path = ?"
+        upsert = "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)"
+        execute = self._conn.execute
+
+        for path in paths:
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+
+            row = execute(select, (path,)).fetchone()
+
+            if row is not None and row[0] == st.st_ino and row[1] == st.st_size and \
+                    row[2] == st.st_mtime_ns:
+                execute(touch, (self._run_id, path))
+                state = "unchanged"
+            else:
+                file_hash = None
+
+                if self._hashfunc and stat.S_ISREG(st.st_mode):
+                    try:
+                        file_hash = hash_utils.file_hash(path, hashfunc=self._hashfunc)
+                    except OSError:
+                        pass
+
+                execute(upsert, (path, st.st_ino, st.st_size, st.st_mtime_ns,
+                                 file_hash, self._run_id))
+                state = "new" if row is None else "modified"
+
+            self.counts[state] += 1
+
+            yield path, st, state
+
+    def track(self, paths):
+        """Scan files and pass their paths through.
+
+        Useful to update the index while the paths are consumed by something else (e.g., while
+        they are piped into ``tar``), so the source tree is walked only once.
+
+        Parameters
+        ----------
+        paths : iterable
+            See :any:`FileStateIndex.scan`.
+
+        Yields
+        ------
+        str
+            The path to a file.
+        """
+        for path, st, state in self.scan(paths):
+            yield path
+
+    def changed_since_last_run(self, paths):
+        """Get the files that changed since the last run.
+
+        Parameters
+        ----------
+        paths : iterable
+            See :any:`FileStateIndex.scan`.
+
+        Yields
+        ------
+        tuple
+            The path to a new or modified file and its state.
+        """
+        for path, st, state in self.scan(paths):
+            if state != "unchanged":
+                yield path, state
+
+    def deleted_since_last_run(self):
+        """Get the files that were recorded in the last run but not seen in the current one.
+
+        Only meaningful after all files were scanned and before calling
+        :any:`FileStateIndex.commit`.
+
+        Returns
+        -------
+        list
+            The paths of the deleted files.
+        """
+        return [row[0] for row in self._conn.execute(
+            "SELECT path FROM files WHERE run_id != ?", (self._run_id,))]
+
+    def get_hash(self, path):
+        """Get the hash recorded for a file.
+
+        Parameters
+        ----------
+        path : str
+            Path to a file.
+
+        Returns
+        -------
+        str, None
+            The recorded hash or None if the file isn't in the index or its hash wasn't recorded.
+        """
+        row = self._conn.execute("SELECT hash FROM files WHERE path = ?", (path,)).fetchone()
+
+        return row[0] if row else None
+
+    def commit(self):
+        """Make the state of the current run the reference for the next one.
+
+        Returns
+        -------
+        dict
+            See :any:`FileStateIndex` > counts.
+        """
+        self.counts["deleted"] = self._conn.execute(
+            "DELETE FROM files WHERE run_id != ?", (self._run_id,)).rowcount
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('run_id', ?)",
+                           (str(self._run_id),))
+        self._conn.commit()
+        self._last_run_id = self._run_id
+        self._run_id += 1
+
+        return self.counts
+
+    def rollback(self):
+        """Discard the state of the current run.
+
+        Returns
+        -------
+        dict
+            See :any:`FileStateIndex` > counts.
+        """
+        self.counts["deleted"] = self._conn.execute(
+            "SELECT COUNT(*) FROM files WHERE run_id != ?", (self._run_id,)).fetchone()[0]
+        self._conn.rollback()
+
+        return self.counts
+
+    def close(self):
+        """Close the database connection. Uncommitted changes are discarded.
+        """
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""Performance metrics of task runs.
+
+The metrics of each run are appended to a JSON lines file. One record per processed item
+(``"record": "item"``) followed by one record for the whole run (``"record": "task"``), all of
+them sharing the same ``run_id``.
+"""
+import json
+import os
+import stat
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+
+def get_peak_rss():
+    """Get the peak resident set size of the current process.
+
+    The peak of the children (e.g., ``tar`` or ``rsync``) isn't reported. On Linux, it includes
+    the memory they inherit from this process when they are forked, so it's usually the same as
+    the peak of this process.
+
+    Returns
+    -------
+    int, None
+        The peak resident set size in bytes. None if it can't be obtained in this platform.
+    """
+    if not RESOURCE_AVAILABLE:
+        return None
+
+    # ru_maxrss is in bytes on macOS and in kibibytes everywhere else.
+    factor = 1 if sys.platform == "darwin" else 1024
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * factor
+
+
+class TaskMetrics():
+    """Collect the metrics of a task run.
+
+    Counters are added with :any:`TaskMetrics.add` (for the whole run) and
+    :any:`TaskMetrics.add_item` (for one of the items of the task). The walks of the file system
+    performed by the task are tracked with :any:`TaskMetrics.track_files_list`.
+
+    Attributes
+    ----------
+    compressed : bool
+        Whether the task compresses the data it reads. If True, the compression ratio is
+        computed from the ``bytes_read`` and ``bytes_written`` counters.
+    enabled : bool
+        Whether the metrics are going to be written. Collecting the metrics that need extra
+        work (e.g., :any:`TaskMetrics.count_input`) is skipped when disabled.
+    """
+
+    def __init__(self, enabled=False):
+        """Initialize.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+            See :any:`TaskMetrics` > enabled.
+        """
+        self.enabled = enabled
+        self.compressed = False
+        self._values = {}
+        self._items = OrderedDict()
+        self._files_lists = []
+        self._lock = threading.Lock()
+        self._start_time = time.perf_counter()
+
+    def add(self, **values):
+        """Add values to the counters of the run.
+
+        Parameters
+        ----------
+        **values
+            Counter names and the amounts to add to them.
+        """
+        with self._lock:
+            for key, value in values.items():
+                if value is not None:
+                    self._values[key] = self._values.get(key, 0) + value
+
+    def add_item(self, item, **values):
+        """Add values to the counters of an item.
+
+        Parameters
+        ----------
+        item : str
+            The item (e.g., a folder of the ``items`` option of a task).
+        **values
+            Counter names and the amounts to add to them.
+        """
+        with self._lock:
+            item_values = self._items.setdefault(item, {})
+
+            for key, value in values.items():
+                if value is not None:
+                    item_values[key] = item_values.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, key, item=None):
+        """Measure the time spent inside a ``with`` block.
+
+        Parameters
+        ----------
+        key : str
+            The counter in which to accumulate the elapsed time (in seconds).
+        item : str, None, optional
+            If specified, the time is also added to the counters of this item.
+        """
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add(**{key: elapsed})
+
+            if item is not None:
+                self.add_item(item, **{key: elapsed})
+
+    def track_files_list(self, files_list):
+        """Collect the statistics of a walk of the file system.
+
+        Parameters
+        ----------
+        files_list : app_utils.FilteredFilesList
+            The files list. Its statistics are read when the records are created, so it can be
+            registered before it's consumed.
+
+        Returns
+        -------
+        app_utils.FilteredFilesList
+            The same files list.
+        """
+        self._files_lists.append(files_list)
+
+        return files_list
+
+    def get_walk_time(self):
+        """Get the time spent walking the file system.
+
+        Returns
+        -------
+        tuple
+            The time (in seconds) spent by all the tracked files lists walking the file system
+            and the amount of walked items.
+        """
+        walk_times = [walk_stats.get("walk_time", 0.0)
+                      for files_list in self._files_lists
+                      for walk_stats in files_list.get_stats().values()]
+
+        return sum(walk_times), len(walk_times)
+
+    def count_input(self, paths):
+        """Add the size of the regular files to the ``bytes_read`` counter.
+
+        Used by tasks whose files are read by an external program. Each file is ``lstat``-ed,
+        so paths are passed through untouched when the metrics are disabled.
+
+        Parameters
+        ----------
+        paths : iterable
+            Paths to files.
+
+        Returns
+        -------
+        iterable
+            The same paths.
+        """
+        if not self.enabled:
+            return paths
+
+        def count(paths):
+            total = 0
+
+            try:
+                for path in paths:
+                    try:
+                        st = os.lstat(path)
+
+                        if stat.S_ISREG(st.st_mode):
+                            total += st.st_size
+                    except OSError:
+                        pass
+
+                    yield path
+            finally:
+                self.add(bytes_read=total)
+
+        return count(paths)
+
+    def get_records(self, task, errors_count, warnings_count, dry_run=False):
+        """Create the records of the run.
+
+        Parameters
+        ----------
+        task : dict
+            The task.
+        errors_count : int
+            Amount of errors of the run.
+        warnings_count : int
+            Amount of warnings of the run.
+        dry_run : bool, optional
+            Whether it was a dry run.
+
+        Returns
+        -------
+        list
+            The records of the items followed by the record of the run.
+        """
+        elapsed_time = time.perf_counter() - self._start_time
+        items = OrderedDict((item, dict(values)) for item, values in self._items.items())
+        values = dict(self._values)
+
+        for files_list in self._files_lists:
+            for item, walk_stats in files_list.get_stats().items():
+                items.setdefault(item, {})
+
+                for key, value in walk_stats.items():
+                    items[item][key] = items[item].get(key, 0) + value
+                    values[key] = values.get(key, 0) + value
+
+        now = datetime.now()
+        run_id = "%s-%s" % (now.strftime("%Y%m%d%H%M%S%f"), os.getpid())
+        common = OrderedDict([
+            ("run_id", run_id),
+            ("timestamp", now.isoformat()),
+            ("task_name", task.get("name")),
+            ("task_type", task.get("type"))
+        ])
+        records = []
+
+        for item, item_values in items.items():
+            record = OrderedDict(common)
+            record["record"] = "item"
+            record["item"] = item
+            record.update(sorted(item_values.items()))
+            records.append(record)
+
+        record = OrderedDict(common)
+        record["record"] = "task"
+        record.update([
+            ("dry_run", dry_run),
+            ("errors", errors_count),
+            ("warnings", warnings_count),
+            ("elapsed_time", elapsed_time),
+            ("peak_rss", get_peak_rss())
+        ])
+        record.update(sorted(values.items()))
+
+        bytes_read = values.get("bytes_read")
+        bytes_written = values.get("bytes_written")
+
+        if bytes_read is not None:
+            record["throughput"] = bytes_read / max(elapsed_time, 1e-9)
+
+        if self.compressed and bytes_read and bytes_written:
+            record["compression_ratio"] = bytes_read / bytes_written
+
+        records.append(record)
+
+        return records
+
+    def write(self, metrics_path, records):
+        """Append records to a metrics file.
+
+        Parameters
+        ----------
+        metrics_path : str
+            Path to the metrics file. It is created if it doesn't exist.
+        records : list
+            The records to write.
+        """
+        os.makedirs(os.path.dirname(metrics_path), exist_ok=True)
+
+        with open(metrics_path, "a", encoding="UTF-8") as metrics_file:
+            metrics_file.write("".join(json.dumps(record) + "\n" for record in records))
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Profiling of the ``backup`` command (``app.py backup --profile``).
+
+While a :any:`Profiler` is running, the time spent in the main phases of a run (reading the
+YAML files, validating them, validating tasks, building the files lists, running external
+commands, running hooks and sending notifications) is accumulated with :any:`phase` and
+:any:`add_time`. When no profiler is running, both of them do nothing.
+
+Attributes
+----------
+PHASES : tuple
+    The names of the phases in the order in which they are reported.
+"""
+import io
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+PHASES = (
+    "YAML load",
+    "Schema validation",
+    "Task validation",
+    "File list build",
+    "Subprocess run",
+    "Hooks",
+    "Notifications"
+)
+
+# The phases timer of the running profiler (if any).
+_phases_timer = None
+
+
+class PhasesTimer():
+    """Accumulate the time spent in the phases of a run.
+
+    Phases can be timed from more than one thread (e.g., when tasks run in parallel), so the
+    time of a phase is the sum of the time spent in it by all threads.
+    """
+
+    def __init__(self):
+        """Initialize.
+        """
+        self._times = OrderedDict((name, [0.0, 0]) for name in PHASES)
+        self._lock = threading.Lock()
+
+    def add_time(self, name, elapsed, calls=1):
+        """Add time to a phase.
+
+        Parameters
+        ----------
+        name : str
+            The phase name.
+        elapsed : float
+            Time in seconds.
+        calls : int, optional
+            Amount of times the phase was entered.
+        """
+        with self._lock:
+            phase_time = self._times.setdefault(name, [0.0, 0])
+            phase_time[0] += elapsed
+            phase_time[1] += calls
+
+    def get_times(self):
+        """Get the accumulated times.
+
+        Returns
+        -------
+        list
+            Tuples with the name of a phase, its time in seconds and the amount of times it was
+            entered. Only phases that were entered at least once.
+        """
+        with self._lock:
+            return [(name, elapsed, calls) for name, (elapsed, calls) in self._times.items()
+                    if calls]
+
+
+@contextmanager
+def phase(name):
+    """Measure the time spent inside a ``with`` block as part of a phase.
+
+    Parameters
+    ----------
+    name : str
+        The phase name. See :any:`PHASES`.
+    """
+    timer = _phases_timer
+
+    if timer is None:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        timer.add_time(name, time.perf_counter() - start)
+
+
+def add_time(name, elapsed, calls=1):
+    """Add time measured elsewhere to a phase.
+
+    Parameters
+    ----------
+    name : str
+        The phase name. See :any:`PHASES`.
+    elapsed : float
+        Time in seconds.
+    calls : int, optional
+        Amount of times the phase was entered.
+    """
+    timer = _phases_timer
+
+    if timer is not None:
+        timer.add_time(name, elapsed, calls)
+
+
+class Profiler():
+    """Profile a run with :any:`cProfile` and time its phases.
+
+    Only the thread that starts the profiler is profiled by :any:`cProfile`, so a complete
+    profile of the tasks requires running them one after the other (``--jobs=1``). The phases
+    are timed in all threads.
+
+    Attributes
+    ----------
+    stats_path : str
+        Path to the file in which the profile is stored. It can be read with :any:`pstats` and
+        with the usual tools that create call graphs and flame graphs from ``.pstats`` files
+        (e.g., ``snakeviz``, ``flameprof`` or ``gprof2dot``).
+    """
+
+    def __init__(self, stats_path):
+        """Initialize.
+
+        Parameters
+        ----------
+        stats_path : str
+            See :any:`Profiler` > stats_path.
+        """
+        import cProfile
+
+        self.stats_path = stats_path
+        self._profile = cProfile.Profile()
+        self._start_time = None
+        self._elapsed_time = 0.0
+
+    def start(self):
+        """Start profiling and timing phases.
+        """
+        global _phases_timer
+
+        _phases_timer = PhasesTimer()
+        self._start_time = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self):
+        """Stop profiling and store the profile.
+
+        Returns
+        -------
+        list
+            See :any:`PhasesTimer.get_times`.
+        """
+        global _phases_timer
+
+        self._profile.disable()
+        self._elapsed_time = time.perf_counter() - self._start_time
+        phases_times = _phases_timer.get_times()
+        _phases_timer = None
+        self._profile.dump_stats(self.stats_path)
+
+        return phases_times
+
+    def report(self, phases_times, logger, top=20):
+        """Log the phases times and the functions with the highest cumulative times.
+
+        Parameters
+        ----------
+        phases_times : list
+            See :any:`Profiler.stop`.
+        logger : object
+            See <class :any:`LogSystem`>.
+        top : int, optional
+            Amount of functions to log.
+        """
+        import pstats
+
+        lines = ["%-20s %12s %8s %7s" % ("Phase", "Time (s)", "Calls", "%")]
+
+        for name, elapsed, calls in phases_times:
+            lines.append("%-20s %12.3f %8d %6.1f%%" % (
+                name, elapsed, calls, elapsed * 100 / max(self._elapsed_time, 1e-9)))
+
+        lines.append("%-20s %12.3f" % ("Total", self._elapsed_time))
+
+        stream = io.StringIO()
+        pstats.Stats(self.stats_path, stream=stream).sort_stats(
+            pstats.SortKey.CUMULATIVE).print_stats(top)
+
+        logger.info("**Phases times:**")
+        logger.info("\n".join(lines), date=False)
+        logger.info("**Functions with the highest cumulative times:**")
+        logger.info(stream.getvalue().strip(), date=False)
+        logger.info("**Profile stored at:**")
+        logger.info(self.stats_path, date=False)
+
+
+if __name__ == "__main__":
+    pass
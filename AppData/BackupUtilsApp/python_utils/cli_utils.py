@@ -4,13 +4,12 @@
 import os
 import sys
 
-from . import exceptions
-from . import file_utils
-from . import log_system
-from . import shell_utils
-from .docopt import docopt
-
+# NOTE: Only the modules needed to define the command line interface are imported here, so the
+# commands that need a fast startup (e.g., the ones used by the Bash completions) don't pay for
+# the rest. They are imported by the methods that need them.
 if sys.version_info < (3, 5):
+    from . import exceptions
+
     raise exceptions.WrongPythonVersion()
 
 
@@ -28,7 +27,7 @@ class CommandLineInterfaceSuper():
     _print_log_blacklist = []
     _inhibit_logger_list = []
 
-    def __init__(self, app_name, logs_storage_dir="UserData/logs"):
+    def __init__(self, app_name, logs_storage_dir="UserData/logs", queued_logging=False):
         """Initialization.
 
         Parameters
@@ -37,15 +36,21 @@ class CommandLineInterfaceSuper():
             Application name.
         logs_storage_dir : str
             Log files storage location.
+        queued_logging : bool, optional
+            See :any:`LogSystem` > ``queued``.
         """
         self._app_name = app_name
         self.logger = None
 
         if not self._inhibit_logger_list or not any(self._inhibit_logger_list):
+            from . import file_utils
+            from . import log_system
+
             log_file = log_system.generate_log_path(storage_dir=logs_storage_dir,
                                                     prefix="CLI")
             file_utils.remove_surplus_files(logs_storage_dir, "CLI*")
-            self.logger = log_system.LogSystem(log_file, verbose=True)
+            self.logger = log_system.LogSystem(log_file, verbose=True,
+                                               queued=queued_logging)
 
         self._display_cli_header()
 
@@ -53,6 +58,8 @@ class CommandLineInterfaceSuper():
         """Display CLI header.
         """
         if self.logger and (not self._cli_header_blacklist or not any(self._cli_header_blacklist)):
+            from . import shell_utils
+
             self.logger.info("**%s**" % shell_utils.get_cli_header(self._app_name),
                              date=False, to_file=False)
             print("")
@@ -61,6 +68,8 @@ class CommandLineInterfaceSuper():
         """Print the path to the log file used by the current logger.
         """
         if self.logger and (not self._print_log_blacklist or not any(self._print_log_blacklist)):
+            from . import shell_utils
+
             print()
             self.logger.info(shell_utils.get_cli_separator("-"), date=False, to_file=False)
             self.logger.warning("**Log file location:**", date=False, to_file=False)
@@ -75,6 +84,8 @@ class CommandLineInterfaceSuper():
         exceptions.MethodNotImplemented
             See :any:`exceptions.MethodNotImplemented`
         """
+        from . import exceptions
+
         raise exceptions.MethodNotImplemented("run")
 
     def _system_executable_generation(self, **kwargs):
@@ -127,6 +138,9 @@ def run_cli(flag_file="", docopt_doc="", app_name="",
         Do not allow to run any command if the *flag* file isn't found where it should be.
         See :any:`exceptions.BadExecutionLocation`.
     """
+    from . import exceptions
+    from .docopt import docopt
+
     if not os.path.exists(flag_file):
         raise exceptions.BadExecutionLocation()
 
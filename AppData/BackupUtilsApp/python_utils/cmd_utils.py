@@ -13,6 +13,7 @@ STREAM_STDOUT : int
 import os
 import platform
 import subprocess
+import threading
 
 
 STREAM_STDOUT = 1
@@ -263,6 +264,97 @@ def run_cmd(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=True, **kwa
     return subprocess.run(cmd, stdout=stdout, stderr=stderr, env=env, **kwargs)
 
 
+def run_cmd_with_input(cmd, input_items, separator=b"\n", stdout=subprocess.PIPE,
+                       stderr=subprocess.PIPE, env=True, check=False, **kwargs):
+    """Run a command feeding its standard input from an iterable.
+
+    Each item is written to the command's standard input as soon as it is produced, so
+    ``input_items`` can be a generator of an arbitrary length without ever holding all its
+    items in memory.
+
+    Parameters
+    ----------
+    cmd : list|str
+        See :any:`subprocess.run`.
+    input_items : iterable
+        An iterable of strings or bytes to feed to the command's standard input.
+    separator : bytes, optional
+        The separator written after each item.
+    stdout : None|int|file object, optional
+        See :any:`subprocess.run`.
+    stderr : None|int|file object, optional
+        See :any:`subprocess.run`.
+    env : object, optional
+        See :any:`subprocess.run`.
+    check : bool, optional
+        See :any:`subprocess.run`.
+    **kwargs
+        See :any:`subprocess.Popen`.
+
+    Returns
+    -------
+    subprocess.CompletedProcess
+        A ``subprocess.CompletedProcess`` instance.
+
+    Raises
+    ------
+    subprocess.CalledProcessError
+        If ``check`` is True and the command exits with a non-zero status.
+    """
+    if env is True:
+        env = get_environment()
+
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=stdout,
+                            stderr=stderr, env=env, **kwargs)
+    output = {}
+    readers = []
+
+    def read_stream(stream_name, stream):
+        output[stream_name] = stream.read()
+
+    # Piped output streams have to be drained while the input is being fed. Otherwise, the
+    # command could block writing to a full pipe while we are blocked writing to its input.
+    for stream_name in ("stdout", "stderr"):
+        stream = getattr(proc, stream_name)
+
+        if stream is not None:
+            reader = threading.Thread(target=read_stream, args=(stream_name, stream), daemon=True)
+            reader.start()
+            readers.append(reader)
+
+    try:
+        try:
+            for item in input_items:
+                proc.stdin.write((item if isinstance(item, bytes) else os.fsencode(item)) +
+                                 separator)
+        except BrokenPipeError:
+            # The command exited before reading all its input. Its exit status will tell why.
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+        for reader in readers:
+            reader.join()
+
+        returncode = proc.wait()
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+
+    if check and returncode:
+        raise subprocess.CalledProcessError(returncode, cmd,
+                                            output=output.get("stdout"),
+                                            stderr=output.get("stderr"))
+
+    return subprocess.CompletedProcess(cmd, returncode,
+                                       stdout=output.get("stdout"),
+                                       stderr=output.get("stderr"))
+
+
 def launch_default_for_file(filepath):
     """Launch file with default application.
 
@@ -1,16 +1,50 @@
 # -*- coding: utf-8 -*-
 """Common utilities to perform file operations.
+
+Attributes
+----------
+NETWORK_FILE_SYSTEMS : set
+    Types of file systems (as reported by ``/proc/mounts``) whose metadata operations are
+    round trips to a server. Operations on many of their files are faster if performed in
+    parallel.
 """
 import os
+import re
+import stat
 
+from fnmatch import fnmatch
 from glob import glob
 from shutil import copy2
+from shutil import copyfileobj
 from shutil import copystat
-from shutil import ignore_patterns
 from shutil import rmtree
 from stat import ST_MTIME
 
 from . import exceptions
+from .ignore_utils import get_matcher
+
+NETWORK_FILE_SYSTEMS = {
+    "9p",
+    "afs",
+    "ceph",
+    "cifs",
+    "davfs",
+    "fuse.glusterfs",
+    "fuse.rclone",
+    "fuse.s3fs",
+    "fuse.sshfs",
+    "glusterfs",
+    "lustre",
+    "ncpfs",
+    "nfs",
+    "nfs4",
+    "smb3",
+    "smbfs",
+    "sshfs"
+}
+
+# Characters escaped in the paths of /proc/mounts (e.g., spaces as \040).
+_mounts_escape_re = re.compile(r"\\([0-7]{3})")
 
 
 def expand_path(path):
@@ -79,6 +113,92 @@ def is_exec(fpath):
     return os.path.isfile(fpath) and os.access(fpath, os.X_OK)
 
 
+def get_device_id(path):
+    """Get the ID of the device in which a path is (or would be) stored.
+
+    Parameters
+    ----------
+    path : str
+        Path to a file or folder. If it doesn't exist, the device of its closest existent parent
+        folder is returned.
+
+    Returns
+    -------
+    int, None
+        The device ID or None if no existent parent folder was found.
+    """
+    path = os.path.abspath(expand_path(path))
+
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+
+            if parent == path:
+                return None
+
+            path = parent
+
+
+def get_mount_points(mounts_file="/proc/mounts"):
+    """Get the mount points of the system and the types of their file systems.
+
+    Parameters
+    ----------
+    mounts_file : str, optional
+        Path to a file with the format of ``/proc/mounts``.
+
+    Returns
+    -------
+    list
+        Tuples with a mount point and the type of its file system, sorted from the longest
+        mount point to the shortest. Empty if the mount points can't be read (e.g., on systems
+        other than Linux).
+    """
+    mount_points = []
+
+    try:
+        with open(mounts_file, "r", encoding="UTF-8", errors="replace") as mounts:
+            for line in mounts:
+                fields = line.split()
+
+                if len(fields) >= 3:
+                    mount_points.append((
+                        _mounts_escape_re.sub(lambda m: chr(int(m.group(1), 8)), fields[1]),
+                        fields[2]
+                    ))
+    except OSError:
+        return []
+
+    return sorted(mount_points, key=lambda mount_point: len(mount_point[0]), reverse=True)
+
+
+def get_file_system_type(path, mount_points):
+    """Get the type of the file system in which a path is stored.
+
+    Only the path is used (no file system calls are performed), so symbolic links in the path
+    that point to other file systems aren't taken into account.
+
+    Parameters
+    ----------
+    path : str
+        An absolute path.
+    mount_points : list
+        Mount points as returned by :any:`get_mount_points`.
+
+    Returns
+    -------
+    str, None
+        The type of the file system. None if it couldn't be determined.
+    """
+    for mount_point, fs_type in mount_points:
+        if path == mount_point or path.startswith(mount_point.rstrip("/") + "/"):
+            return fs_type
+
+    return None
+
+
 def custom_copytree2(source, destination):
     """Custom copytree.
 
@@ -171,6 +291,45 @@ def remove_surplus_files(folder, file_pattern, max_files_to_keep=20):
             os.remove(f)
 
 
+def remove_surplus_folders(folder, folder_pattern, max_folders_to_keep=20, dry_run=False):
+    """Remove surplus folders from folder.
+
+    Like :any:`remove_surplus_files`, but only the direct children of ``folder`` are checked and
+    the matching folders are removed with all their content. Folders are sorted by name, so
+    their names should sort in creation order (e.g., they should contain a timestamp).
+
+    Parameters
+    ----------
+    folder : str
+        Path to a folder were to search for folders.
+    folder_pattern : str
+        The folder name pattern to search for.
+    max_folders_to_keep : int, optional
+        Maximum amount of folders to keep inside the folder.
+    dry_run : bool, optional
+        Do not remove anything. Only return the folders that would be removed.
+
+    Returns
+    -------
+    list
+        The paths to the removed folders.
+    """
+    try:
+        all_folders = sorted(entry.path for entry in os.scandir(folder)
+                             if fnmatch(entry.name, folder_pattern) and
+                             entry.is_dir(follow_symlinks=False))
+    except FileNotFoundError:
+        return []
+
+    folders_to_delete = all_folders[:max(len(all_folders) - max_folders_to_keep, 0)]
+
+    if not dry_run:
+        for f in folders_to_delete:
+            rmtree(f)
+
+    return folders_to_delete
+
+
 def newer(source, target):
     """Check if "source" is newer than "target".
 
@@ -244,7 +403,7 @@ def custom_copy2(source, destination, logger=None, log_copied_file=False, relati
             if log_copied_file:
                 path_to_log = os.path.relpath(destination, relative_path) \
                     if relative_path else destination
-                logger.info("**File copied:** %s" % path_to_log, date=False)
+                logger.info("**File copied:** %s" % path_to_log, date=False, rate_limited=True)
     except Exception as err:
         logger.error(err)
 
@@ -296,7 +455,8 @@ def copy_create_symlink(source, destination, source_is_symlink=False,
 
 
 def custom_copytree(src, dst, symlinks=True, ignored_patterns=None, ignore_dangling_symlinks=True,
-                    logger=None, log_copied_file=False, relative_path="", overwrite=False):
+                    logger=None, log_copied_file=False, relative_path="", overwrite=False,
+                    ignore_rel_dir=""):
     """Recursively copy a directory tree.
 
     This function is basically the same as :any:`shutil.copytree`, but with the following
@@ -306,7 +466,8 @@ def custom_copytree(src, dst, symlinks=True, ignored_patterns=None, ignore_dangl
     - It uses a custom function to copy symlinks (:any:`copy_create_symlink`), it not just uses \
     :any:`os.symlink` directly.
     - Switched the *ignore* parameter (originally a method) into *ignored_patterns* (now a list \
-    of file patterns). Just for the kick of it, not really needed.
+    of file patterns or an :any:`ignore_utils.IgnoreMatcher`). The patterns are compiled only \
+    once and the same matcher is reused by all the recursive calls.
 
     Parameters
     ----------
@@ -316,8 +477,9 @@ def custom_copytree(src, dst, symlinks=True, ignored_patterns=None, ignore_dangl
         Destination directory.
     symlinks : bool, optional
         Handle symlinks.
-    ignored_patterns : None, optional
-         A list of file name patterns to be ignored by the copy functions.
+    ignored_patterns : None, list, IgnoreMatcher, optional
+         A list of file name patterns to be ignored by the copy functions or an already compiled
+         :any:`ignore_utils.IgnoreMatcher`. Anchored patterns are relative to ``src``.
     ignore_dangling_symlinks : bool, optional
         Whether to ignore dangling symlinks.
     logger : LogSystem
@@ -328,6 +490,9 @@ def custom_copytree(src, dst, symlinks=True, ignored_patterns=None, ignore_dangl
         A relative path to exctract from the path that's going to be logged.
     overwrite : bool, optional
         Overwrite existent files without doing any checks.
+    ignore_rel_dir : str, optional
+        The path of ``src`` relative to the root folder of the copy. Only used internally by the
+        recursive calls to match anchored patterns.
 
     Returns
     -------
@@ -343,7 +508,8 @@ def custom_copytree(src, dst, symlinks=True, ignored_patterns=None, ignore_dangl
 
     try:
         if ignored_patterns is not None:
-            ignored_names = ignore_patterns(*ignored_patterns)(src, names)
+            ignored_patterns = get_matcher(ignored_patterns)
+            ignored_names = ignored_patterns.ignored_names(src, names, rel_dir=ignore_rel_dir)
         else:
             ignored_names = set()
 
@@ -386,7 +552,8 @@ def custom_copytree(src, dst, symlinks=True, ignored_patterns=None, ignore_dangl
                                         ignored_patterns=ignored_patterns,
                                         logger=logger,
                                         log_copied_file=log_copied_file,
-                                        relative_path=relative_path)
+                                        relative_path=relative_path,
+                                        ignore_rel_dir=os.path.join(ignore_rel_dir, name))
                     else:
                         custom_copy2(srcname, dstname,
                                      logger=logger,
@@ -400,7 +567,8 @@ def custom_copytree(src, dst, symlinks=True, ignored_patterns=None, ignore_dangl
                                 logger=logger,
                                 log_copied_file=log_copied_file,
                                 relative_path=relative_path,
-                                overwrite=overwrite)
+                                overwrite=overwrite,
+                                ignore_rel_dir=os.path.join(ignore_rel_dir, name))
             else:
                 # Will raise a SpecialFileError for unsupported file types
                 custom_copy2(srcname, dstname,
@@ -428,6 +596,347 @@ def custom_copytree(src, dst, symlinks=True, ignored_patterns=None, ignore_dangl
     return dst
 
 
+def copy_file_data(source, destination, size_hint=0):
+    """Copy the content of a file using in-kernel copies whenever possible.
+
+    The data is copied with :any:`os.copy_file_range` if available (which can even avoid copying
+    the data at all on file systems that support reflinks). If not available or not supported
+    by the file systems involved, :any:`os.sendfile` is used. As a last resort, the data is
+    copied with :any:`shutil.copyfileobj`.
+
+    Parameters
+    ----------
+    source : str
+        Source file path.
+    destination : str
+        Target file path. It will be created or truncated.
+    size_hint : int, optional
+        The expected size of the source file. Used to decide how much data to copy per call.
+
+    Returns
+    -------
+    int
+        The amount of bytes copied.
+    """
+    chunk_size = max(size_hint, 8 * 1024 * 1024)
+
+    with open(source, "rb") as fsrc, open(destination, "wb") as fdst:
+        infd = fsrc.fileno()
+        outfd = fdst.fileno()
+        copied = 0
+
+        for copy_func in (_copy_file_range, _sendfile):
+            if copy_func is None:
+                continue
+
+            try:
+                while True:
+                    sent = copy_func(infd, outfd, copied, chunk_size)
+
+                    if sent == 0:
+                        break
+
+                    copied += sent
+            except OSError:
+                # Only fall back to the next method if nothing was copied yet. Otherwise, the
+                # error is a real one (e.g., no space left on device).
+                if copied:
+                    raise
+
+                continue
+
+            # Some file systems (e.g., procfs and some network and FUSE ones) report the end of
+            # the file on the first call even if it isn't empty. The next method is tried in that
+            # case, so an empty file only costs a few extra calls.
+            if copied:
+                return copied
+
+        copyfileobj(fsrc, fdst, 1024 * 1024)
+
+        return fdst.tell()
+
+
+def _copy_file_range_func(infd, outfd, offset, count):
+    """See :any:`os.copy_file_range`.
+
+    Parameters
+    ----------
+    infd : int
+        Source file descriptor.
+    outfd : int
+        Destination file descriptor.
+    offset : int
+        Offset from which to read the source and write the destination.
+    count : int
+        Maximum amount of bytes to copy.
+
+    Returns
+    -------
+    int
+        The amount of bytes copied.
+    """
+    return os.copy_file_range(infd, outfd, count, offset, offset)
+
+
+def _sendfile_func(infd, outfd, offset, count):
+    """See :any:`os.sendfile`.
+
+    Parameters
+    ----------
+    infd : int
+        Source file descriptor.
+    outfd : int
+        Destination file descriptor.
+    offset : int
+        Offset from which to read the source and write the destination.
+    count : int
+        Maximum amount of bytes to copy.
+
+    Returns
+    -------
+    int
+        The amount of bytes copied.
+    """
+    os.lseek(outfd, offset, os.SEEK_SET)
+    return os.sendfile(outfd, infd, offset, count)
+
+
+_copy_file_range = _copy_file_range_func if hasattr(os, "copy_file_range") else None
+_sendfile = _sendfile_func if hasattr(os, "sendfile") else None
+
+
+def _remove_path(path, is_dir):
+    """Remove a file, a symlink or a folder tree.
+
+    Parameters
+    ----------
+    path : str
+        Path to remove.
+    is_dir : bool
+        Whether ``path`` is a real folder (not a symlink to a folder).
+    """
+    if is_dir:
+        rmtree(path)
+    else:
+        os.unlink(path)
+
+
+def mirror_tree(src, dst, ignored_patterns=None, delete=False, dry_run=False,
+                logger=None, log_copied_file=False):
+    """Incrementally mirror a folder tree.
+
+    A file is copied only if it doesn't exist in the destination or if its size or its
+    modification time (in nanoseconds) differ from the source ones. Compared to
+    :any:`custom_copytree`, which uses :any:`newer`:
+
+    - Both trees are listed with :any:`os.scandir` and exactly one ``lstat`` is made for each \
+    source file and one for its destination counterpart (if it exists).
+    - When a destination folder doesn't exist, it's created once and its whole sub-tree is \
+    known to be missing, so no destination look ups are made for its content at all.
+    - The data is copied with :any:`copy_file_data`.
+    - Permissions and modification times of files, symlinks and folders are preserved so the \
+    next run can skip unchanged files.
+
+    Parameters
+    ----------
+    src : str
+        Source folder.
+    dst : str
+        Destination folder.
+    ignored_patterns : None, list, IgnoreMatcher, optional
+        See :any:`custom_copytree`.
+    delete : bool, optional
+        Delete files and folders from the destination that don't exist in the source. Ignored
+        files and folders are never deleted.
+    dry_run : bool, optional
+        Do not perform file system changes. Only log what would be done.
+    logger : LogSystem
+        The logger.
+    log_copied_file : bool, optional
+        Log the path of each copied, linked or deleted file.
+
+    Returns
+    -------
+    dict
+        Mirroring statistics. The ``errors`` key contains a list of tuples with a path and the
+        reason why it couldn't be mirrored.
+    """
+    matcher = get_matcher(ignored_patterns)
+    matcher = matcher if matcher else None
+    stats = {
+        "scanned": 0,
+        "copied": 0,
+        "copied_bytes": 0,
+        "unchanged": 0,
+        "ignored": 0,
+        "deleted": 0,
+        "created_dirs": 0,
+        "errors": []
+    }
+    # The modification times of folders are restored after their content has been mirrored.
+    dirs_times = [(dst, os.stat(src))]
+    # Tuples with a folder path relative to ``src`` and the mode of its destination (None if it
+    # doesn't exist).
+    try:
+        dst_mode = os.stat(dst).st_mode
+    except OSError:
+        dst_mode = None
+
+    dst_mode = dst_mode if dst_mode is not None and stat.S_ISDIR(dst_mode) else None
+    stack = [("", dst_mode)]
+
+    if dst_mode is None:
+        if dry_run:
+            logger.log_dry_run("**Folder will be created:** %s" % dst)
+        else:
+            os.makedirs(dst)
+
+        stats["created_dirs"] += 1
+
+    while stack:
+        rel_dir, dst_dir_mode = stack.pop()
+        dst_dir_exists = dst_dir_mode is not None
+        src_dir = os.path.join(src, rel_dir) if rel_dir else src
+        dst_dir = os.path.join(dst, rel_dir) if rel_dir else dst
+
+        # The modes of the source folders are copied to the destination ones, so a read-only
+        # source folder (e.g., 0555) makes its destination read-only after the first run. The
+        # owner permissions are added before writing into it and the source mode is restored
+        # after all folders have been mirrored.
+        if dst_dir_exists and not dry_run and \
+                stat.S_IMODE(dst_dir_mode) & stat.S_IRWXU != stat.S_IRWXU:
+            try:
+                os.chmod(dst_dir, stat.S_IMODE(dst_dir_mode) | stat.S_IRWXU)
+            except OSError as why:
+                stats["errors"].append((dst_dir, str(why)))
+
+        try:
+            with os.scandir(src_dir) as it:
+                src_entries = list(it)
+
+            dst_entries = {}
+
+            if dst_dir_exists:
+                with os.scandir(dst_dir) as it:
+                    dst_entries = {entry.name: entry for entry in it}
+        except OSError as why:
+            stats["errors"].append((src_dir, str(why)))
+            continue
+
+        sub_dirs = []
+        ignored_names = set()
+
+        for entry in src_entries:
+            src_path = entry.path
+            dst_path = os.path.join(dst_dir, entry.name)
+
+            try:
+                src_st = entry.stat(follow_symlinks=False)
+                is_dir = stat.S_ISDIR(src_st.st_mode)
+
+                if matcher is not None and matcher.match(entry.name, rel_dir, is_dir):
+                    stats["ignored"] += 1
+                    ignored_names.add(entry.name)
+                    continue
+
+                stats["scanned"] += 1
+                dst_entry = dst_entries.get(entry.name)
+                dst_st = dst_entry.stat(follow_symlinks=False) if dst_entry is not None else None
+
+                if is_dir:
+                    sub_dir_exists = dst_st is not None and stat.S_ISDIR(dst_st.st_mode)
+
+                    if not sub_dir_exists:
+                        if dry_run:
+                            logger.log_dry_run("**Folder will be created:** %s" % dst_path)
+                        else:
+                            if dst_st is not None:
+                                _remove_path(dst_path, False)
+
+                            os.mkdir(dst_path)
+
+                        stats["created_dirs"] += 1
+
+                    sub_dirs.append((os.path.join(rel_dir, entry.name) if rel_dir else entry.name,
+                                     dst_st.st_mode if sub_dir_exists else None))
+                    dirs_times.append((dst_path, src_st))
+                    continue
+
+                if dst_st is not None and \
+                        stat.S_IFMT(dst_st.st_mode) == stat.S_IFMT(src_st.st_mode) and \
+                        dst_st.st_size == src_st.st_size and \
+                        dst_st.st_mtime_ns == src_st.st_mtime_ns:
+                    stats["unchanged"] += 1
+                    continue
+
+                if not (stat.S_ISREG(src_st.st_mode) or stat.S_ISLNK(src_st.st_mode)):
+                    stats["errors"].append((src_path, "Unsupported file type"))
+                    continue
+
+                if dry_run:
+                    if log_copied_file:
+                        logger.log_dry_run("**File will be copied:** %s" % src_path)
+                else:
+                    # Always remove the existent destination instead of overwriting it. It could
+                    # be a hard link shared with other files (e.g., in a previous snapshot).
+                    if dst_st is not None:
+                        _remove_path(dst_path, stat.S_ISDIR(dst_st.st_mode))
+
+                    if stat.S_ISLNK(src_st.st_mode):
+                        os.symlink(os.readlink(src_path), dst_path)
+                    else:
+                        stats["copied_bytes"] += copy_file_data(src_path, dst_path,
+                                                                src_st.st_size)
+                        os.chmod(dst_path, stat.S_IMODE(src_st.st_mode))
+
+                    os.utime(dst_path, ns=(src_st.st_atime_ns, src_st.st_mtime_ns),
+                             follow_symlinks=False)
+
+                    if log_copied_file:
+                        logger.info("**File copied:** %s" % dst_path, date=False, rate_limited=True)
+
+                stats["copied"] += 1
+            except OSError as why:
+                stats["errors"].append((src_path, str(why)))
+
+        if delete and dst_entries:
+            src_names = {entry.name for entry in src_entries}
+
+            for name, dst_entry in dst_entries.items():
+                if name in src_names or name in ignored_names or \
+                        (matcher is not None and
+                         matcher.match(name, rel_dir, dst_entry.is_dir(follow_symlinks=False))):
+                    continue
+
+                if dry_run:
+                    logger.log_dry_run("**Will be deleted:** %s" % dst_entry.path)
+                else:
+                    try:
+                        _remove_path(dst_entry.path, dst_entry.is_dir(follow_symlinks=False))
+
+                        if log_copied_file:
+                            logger.info("**Deleted:** %s" % dst_entry.path, date=False,
+                                        rate_limited=True)
+                    except OSError as why:
+                        stats["errors"].append((dst_entry.path, str(why)))
+                        continue
+
+                stats["deleted"] += 1
+
+        # Reversed so sub-folders are popped from the stack in the order they were listed.
+        stack.extend(reversed(sub_dirs))
+
+    if not dry_run:
+        for dst_path, src_st in reversed(dirs_times):
+            try:
+                os.chmod(dst_path, stat.S_IMODE(src_st.st_mode))
+                os.utime(dst_path, ns=(src_st.st_atime_ns, src_st.st_mtime_ns))
+            except OSError as why:
+                stats["errors"].append((dst_path, str(why)))
+
+    return stats
+
+
 def get_folder_size(dir_path):
     """Get folder size
 
@@ -4,23 +4,305 @@
 Attributes
 ----------
 HASH_FUNCS : dict
-    Hash functions.
+    Hash functions. ``xxh3`` and ``blake3`` are only available if the ``xxhash`` and ``blake3``
+    modules are installed.
+HASH_FUNCS_FALLBACKS : dict
+    Hash functions provided by optional modules and the hash function used instead when their
+    modules aren't installed.
 """
 
 import hashlib
+import mmap
 import os
+import sqlite3
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import xxhash
+    XXHASH_INSTALLED = True
+except ImportError:
+    XXHASH_INSTALLED = False
+
+try:
+    import blake3
+    BLAKE3_INSTALLED = True
+except ImportError:
+    BLAKE3_INSTALLED = False
 
 HASH_FUNCS = {
     "md5": hashlib.md5,
     "sha1": hashlib.sha1,
     "sha256": hashlib.sha256,
-    "sha512": hashlib.sha512
+    "sha512": hashlib.sha512,
+    "blake2b": hashlib.blake2b,
+    "blake2s": hashlib.blake2s
 }
 
-__blocksize = 128 * 1024
+if XXHASH_INSTALLED:
+    HASH_FUNCS["xxh3"] = xxhash.xxh3_128
+
+if BLAKE3_INSTALLED:
+    HASH_FUNCS["blake3"] = blake3.blake3
+
+HASH_FUNCS_FALLBACKS = {
+    "xxh3": "blake2b",
+    "blake3": "blake2b"
+}
+
+__blocksize = 1024 * 1024
+# Files at least this big are hashed through mmap instead of being read into a buffer.
+__mmap_threshold = 64 * 1024 * 1024
+# Each thread reuses its own read buffer.
+__thread_data = threading.local()
+# The HashCache consulted by file_hash. See set_cache.
+__cache = None
+
+
+class HashCache():
+    """Persistent cache of file hashes.
+
+    Hashes are stored in an SQLite database keyed by the device and inode of the files and
+    the hash function used. They are only reused if the size and modification time (in
+    nanoseconds) of the file didn't change since they were computed, so unchanged files don't
+    need to be read again.
+
+    The cache is bounded. When it holds more than ``max_entries`` hashes, the least recently
+    used ones are evicted.
+
+    Instances can be shared by several threads. Changes are written to disk in batches, so
+    :any:`HashCache.flush` or :any:`HashCache.close` should be called when done.
+    """
+
+    def __init__(self, db_path, max_entries=1000000, batch_size=1000):
+        """Initialize.
+
+        Parameters
+        ----------
+        db_path : str
+            Path to the database file. It is created if it doesn't exist.
+        max_entries : int, optional
+            Maximum amount of hashes to keep.
+        batch_size : int, optional
+            Amount of changes after which they are written to disk.
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._max_entries = max_entries
+        self._batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending_sets = {}
+        self._pending_touches = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # The cache can always be rebuilt, so durability can be traded for speed.
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._conn.executescript("""
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER,
+    ino INTEGER,
+    algo TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    hash TEXT,
+    used INTEGER,
+    PRIMARY KEY (dev, ino, algo)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS hashes_used ON hashes (used);
+""")
+
+    def get(self, st, algo):
+        """Get the cached hash of a file.
+
+        Parameters
+        ----------
+        st : os.stat_result
+            The current status of the file.
+        algo : str
+            The name of the hash function.
+
+        Returns
+        -------
+        str, None
+            The hash or None if it isn't cached or the file changed since it was cached.
+        """
+        key = (st.st_dev, st.st_ino, algo)
+
+        with self._lock:
+            row = self._pending_sets.get(key)
+
+            if row is None:
+                row = self._conn.execute(
+                    "SELECT size, mtime_ns, hash FROM hashes WHERE dev = ? AND ino = ? AND "
+                    "algo = ?", key).fetchone()
+
+            if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+                return None
+
+            self._pending_touches[key] = time.time_ns()
+            self._flush_if_needed()
+
+            return row[2]
+
+    def set(self, st, algo, hashvalue):
+        """Store the hash of a file.
+
+        Parameters
+        ----------
+        st : os.stat_result
+            The status of the file when it was hashed.
+        algo : str
+            The name of the hash function.
+        hashvalue : str
+            The hash.
+        """
+        with self._lock:
+            self._pending_sets[(st.st_dev, st.st_ino, algo)] = (st.st_size, st.st_mtime_ns,
+                                                                hashvalue)
+            self._flush_if_needed()
+
+    def _flush_if_needed(self):
+        """Write the pending changes to disk if there are enough of them.
+
+        Must be called with the lock acquired.
+        """
+        if len(self._pending_sets) + len(self._pending_touches) >= self._batch_size:
+            self._flush()
+
+    def _flush(self):
+        """Write the pending changes to disk and evict the least recently used hashes.
+
+        Must be called with the lock acquired.
+        """
+        now = time.time_ns()
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key + value + (now,) for key, value in self._pending_sets.items()))
+        self._conn.executemany(
+            "UPDATE hashes SET used = ? WHERE dev = ? AND ino = ? AND algo = ?",
+            ((used,) + key for key, used in self._pending_touches.items()))
+        self._pending_sets.clear()
+        self._pending_touches.clear()
+
+        excess = self._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0] - \
+            self._max_entries
+
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM hashes WHERE (dev, ino, algo) IN "
+                "(SELECT dev, ino, algo FROM hashes ORDER BY used LIMIT ?)", (excess,))
+
+        self._conn.commit()
+
+    def flush(self):
+        """Write the pending changes to disk.
+        """
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Write the pending changes to disk and close the database.
+        """
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+
+def set_cache(cache):
+    """Set the hash cache consulted by :any:`file_hash`.
+
+    Parameters
+    ----------
+    cache : HashCache, None
+        The cache. None to stop using a cache.
+    """
+    global __cache
+    __cache = cache
+
+
+def get_cache():
+    """Get the hash cache consulted by :any:`file_hash`.
+
+    Returns
+    -------
+    HashCache, None
+        The cache.
+    """
+    return __cache
+
+
+def resolve_hashfunc(hashfunc):
+    """Get the name of the hash function that is actually used for a given name.
+
+    Parameters
+    ----------
+    hashfunc : str
+        The name of a hash function.
+
+    Returns
+    -------
+    str
+        The same name or, if the hash function is provided by a module that isn't installed, the
+        name of its fallback (see ``HASH_FUNCS_FALLBACKS``).
+    """
+    if hashfunc not in HASH_FUNCS and hashfunc in HASH_FUNCS_FALLBACKS:
+        return HASH_FUNCS_FALLBACKS[hashfunc]
+
+    return hashfunc
+
+
+def _get_hasher(hashfunc):
+    """Get a hash function by name.
+
+    Parameters
+    ----------
+    hashfunc : str
+        The name of a hash function. See :any:`resolve_hashfunc`.
+
+    Returns
+    -------
+    object
+        A hash function.
+
+    Raises
+    ------
+    NotImplementedError
+        If an invalid hash function is passed.
+    """
+    hash_func = HASH_FUNCS.get(resolve_hashfunc(hashfunc))
+
+    if not hash_func:
+        raise NotImplementedError("{} not implemented.".format(hashfunc))
+
+    return hash_func
+
+
+def _get_buffer(blocksize):
+    """Get the read buffer of the current thread.
 
+    Parameters
+    ----------
+    blocksize : int
+        The buffer size.
+
+    Returns
+    -------
+    memoryview
+        A writable buffer.
+    """
+    buf = getattr(__thread_data, "buffer", None)
 
-def dir_hash(dirname, hashfunc="sha256", followlinks=False):
+    if buf is None or len(buf) != blocksize:
+        buf = memoryview(bytearray(blocksize))
+        __thread_data.buffer = buf
+
+    return buf
+
+
+def dir_hash(dirname, hashfunc="sha256", followlinks=False, workers=None, blocksize=None):
     """Get directory hash.
 
     Parameters
@@ -31,6 +313,10 @@ def dir_hash(dirname, hashfunc="sha256", followlinks=False):
         Hash function to use.
     followlinks : bool, optional
         See :any:`os.walk`.
+    workers : int, None, optional
+        See :any:`hash_files`.
+    blocksize : int, None, optional
+        See :any:`file_hash`.
 
     Returns
     -------
@@ -42,24 +328,133 @@ def dir_hash(dirname, hashfunc="sha256", followlinks=False):
     NotImplementedError
         If an invalid hash function is passed.
     """
-    hash_func = HASH_FUNCS.get(hashfunc)
+    return dir_hash_and_manifest(dirname, hashfunc=hashfunc, followlinks=followlinks,
+                                 workers=workers, blocksize=blocksize)[0]
 
-    if not hash_func:
-        raise NotImplementedError("{} not implemented.".format(hashfunc))
 
-    hashvalues = []
+def dir_hash_and_manifest(dirname, hashfunc="sha256", followlinks=False, workers=None,
+                          blocksize=None):
+    """Get directory hash and the hashes of all the files inside it.
 
-    for root, dirs, files in os.walk(dirname, topdown=True, followlinks=followlinks):
-        hashvalues.extend(
-            [file_hash(os.path.join(root, f), hasher=hash_func) for f in sorted(files)]
-        )
+    Parameters
+    ----------
+    dirname : str
+        Path to a directory.
+    hashfunc : str, optional
+        Hash function to use.
+    followlinks : bool, optional
+        See :any:`os.walk`.
+    workers : int, None, optional
+        See :any:`hash_files`.
+    blocksize : int, None, optional
+        See :any:`file_hash`.
 
-    return _reduce_hash(hashvalues, hash_func)
+    Returns
+    -------
+    tuple
+        The directory hash (the same one returned by :any:`dir_hash`) and a dictionary (the
+        manifest) with the paths of the files relative to ``dirname`` as keys and their hashes
+        as values.
 
+    Raises
+    ------
+    NotImplementedError
+        If an invalid hash function is passed.
+    """
+    hash_func = _get_hasher(hashfunc)
+
+    def iter_paths():
+        for root, dirs, files in os.walk(dirname, topdown=True, followlinks=followlinks):
+            for f in sorted(files):
+                yield os.path.join(root, f)
+
+    manifest = {
+        os.path.relpath(path, dirname): hashvalue
+        for path, hashvalue in hash_files(iter_paths(), hashfunc=hashfunc, workers=workers,
+                                          blocksize=blocksize)
+    }
+
+    return _reduce_hash(manifest.values(), hash_func), manifest
+
+
+def hash_files(paths, hashfunc="sha256", workers=None, blocksize=None, on_error=None):
+    """Hash files in parallel.
 
-def file_hash(filepath, hashfunc="sha256", hasher=None):
+    Files are hashed in a pool of threads. ``hashlib`` releases the GIL while hashing, so the
+    hashing of several files is spread across CPU cores.
+
+    Parameters
+    ----------
+    paths : iterable
+        Paths to files. Consumed lazily.
+    hashfunc : str, optional
+        Hash function to use.
+    workers : int, None, optional
+        Amount of threads. Defaults to the amount of CPU cores. If 1, files are hashed in the
+        calling thread.
+    blocksize : int, None, optional
+        See :any:`file_hash`.
+    on_error : method, None, optional
+        Function called with a path and an exception when a file can't be read. If specified,
+        the hash of the file is yielded as None. By default, the exception is raised.
+
+    Yields
+    ------
+    tuple
+        The path to a file and its hash, in the same order in which they were passed.
+
+    Raises
+    ------
+    NotImplementedError
+        If an invalid hash function is passed.
+    """
+    hash_func = _get_hasher(hashfunc)
+    workers = workers or os.cpu_count() or 1
+
+    def hash_file(path):
+        try:
+            return file_hash(path, hasher=hash_func, blocksize=blocksize)
+        except OSError as err:
+            if on_error is None:
+                raise
+
+            on_error(path, err)
+
+            return None
+
+    if workers == 1:
+        for path in paths:
+            yield path, hash_file(path)
+
+        return
+
+    # Only a few files per worker are submitted at any given time, so huge amounts of paths can
+    # be hashed without holding all of them in memory.
+    max_pending = workers * 4
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path in paths:
+            pending.append((path, executor.submit(hash_file, path)))
+
+            if len(pending) >= max_pending:
+                path, future = pending.popleft()
+                yield path, future.result()
+
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+
+def file_hash(filepath, hashfunc="sha256", hasher=None, blocksize=None, use_cache=True):
     """Get file hash.
 
+    If a hash cache was set (see :any:`set_cache`), it is consulted first and the file is only
+    read if it changed since its hash was cached.
+
+    Small files are read into a buffer that is reused by each thread. Big files are hashed
+    directly from a memory map, avoiding copying their content.
+
     Parameters
     ----------
     filepath : str
@@ -68,6 +463,10 @@ def file_hash(filepath, hashfunc="sha256", hasher=None):
         The name of a hash function.
     hasher : None, optional
         A hash function.
+    blocksize : int, None, optional
+        Size of the blocks in which files are read. Defaults to 1 MiB.
+    use_cache : bool, optional
+        Whether to consult the hash cache.
 
     Returns
     -------
@@ -79,14 +478,71 @@ def file_hash(filepath, hashfunc="sha256", hasher=None):
     NotImplementedError
         If an invalid hash function is passed.
     """
-    h = hasher() if hasher is not None else HASH_FUNCS.get(hashfunc)()
+    new_hasher = hasher if hasher is not None else _get_hasher(hashfunc)
+    cache = __cache if use_cache else None
 
-    if not h:
-        raise NotImplementedError("{} not implemented.".format(hashfunc))
+    if cache is None:
+        return _hash_file_content(filepath, new_hasher, blocksize or __blocksize)
+
+    algo = getattr(new_hasher(), "name", None) or resolve_hashfunc(hashfunc)
+    st = os.stat(filepath)
+    hashvalue = cache.get(st, algo)
+
+    if hashvalue is None:
+        hashvalue = _hash_file_content(filepath, new_hasher, blocksize or __blocksize)
+        st_after = os.stat(filepath)
+
+        # Don't cache the hash of a file that was modified while it was being read.
+        if (st.st_ino, st.st_size, st.st_mtime_ns) == \
+                (st_after.st_ino, st_after.st_size, st_after.st_mtime_ns):
+            cache.set(st, algo, hashvalue)
+
+    return hashvalue
+
+
+def _hash_file_content(filepath, new_hasher, blocksize):
+    """Hash the content of a file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to a file.
+    new_hasher : object
+        A hash function.
+    blocksize : int
+        See :any:`file_hash`.
+
+    Returns
+    -------
+    str
+        A file hash.
+    """
+    h = new_hasher()
 
     with open(filepath, "rb", buffering=0) as f:
-        for b in iter(lambda: f.read(__blocksize), b""):
-            h.update(b)
+        size = os.fstat(f.fileno()).st_size
+
+        if size >= __mmap_threshold:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mm, "madvise"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+
+                    with memoryview(mm) as view:
+                        for offset in range(0, len(view), blocksize):
+                            h.update(view[offset:offset + blocksize])
+
+                return h.hexdigest()
+            except (OSError, ValueError):
+                # Not all files can be memory mapped (e.g., files in some virtual file
+                # systems). Fall back to reading them.
+                f.seek(0)
+                h = new_hasher()
+
+        buf = _get_buffer(blocksize)
+
+        for n in iter(lambda: f.readinto(buf), 0):
+            h.update(buf[:n])
 
     return h.hexdigest()
 
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""Utilities to ignore files/folders based on a list of file name patterns.
+"""
+import os
+import re
+
+
+class IgnoreMatcher():
+    """Match file and folder names against a list of ignore patterns.
+
+    All patterns are compiled only once into a few combined regular expressions, so a name is
+    checked against all patterns with a single regular expression match instead of with one
+    :any:`fnmatch.fnmatch` call per pattern (which is what :any:`shutil.ignore_patterns` does).
+
+    The supported syntax is a subset of the one used by ``.gitignore`` files:
+
+    - A pattern without slashes (e.g., ``*.pyc`` or ``.git``) is matched against the name of \
+    files and folders at any depth. This is exactly the behavior of :any:`shutil.ignore_patterns`.
+    - A pattern with a slash at the beginning or in the middle (e.g., ``/build`` or \
+    ``docs/_build``) is anchored. It is matched against the path relative to the root folder \
+    that is being processed.
+    - A pattern ending with a slash (e.g., ``cache/``) only matches folders.
+    - ``*``, ``?`` and ``[...]`` do not match slashes. ``**/`` matches zero or more folders \
+    and a trailing ``/**`` matches everything inside a folder.
+
+    Negated patterns (``!pattern``) are not supported.
+
+    Attributes
+    ----------
+    patterns : list
+        The list of patterns as passed at initialization.
+    """
+
+    def __init__(self, patterns=None):
+        """Initialize.
+
+        Parameters
+        ----------
+        patterns : list, optional
+            A list of file name patterns.
+        """
+        self.patterns = list(patterns or [])
+        self._parsed_patterns = []
+
+        name_regexes = []
+        name_dir_regexes = []
+        path_regexes = []
+        path_dir_regexes = []
+
+        for pattern in self.patterns:
+            dir_only = pattern.endswith("/")
+            stripped = pattern.rstrip("/")
+            anchored = "/" in stripped
+            stripped = stripped.lstrip("/")
+
+            if not stripped:
+                continue
+
+            self._parsed_patterns.append((stripped, anchored, dir_only))
+            regex = translate(stripped)
+
+            if anchored:
+                (path_dir_regexes if dir_only else path_regexes).append(regex)
+            else:
+                (name_dir_regexes if dir_only else name_regexes).append(regex)
+
+        self._name_re = _compile_regexes(name_regexes)
+        self._name_dir_re = _compile_regexes(name_dir_regexes)
+        self._path_re = _compile_regexes(path_regexes)
+        self._path_dir_re = _compile_regexes(path_dir_regexes)
+
+        self.has_path_patterns = bool(path_regexes or path_dir_regexes)
+        self.has_dir_only_patterns = bool(name_dir_regexes or path_dir_regexes)
+
+    def __bool__(self):
+        """There is at least one pattern to match.
+
+        Returns
+        -------
+        bool
+            Whether there are patterns to match.
+        """
+        return bool(self._parsed_patterns)
+
+    def __call__(self, directory, names):
+        """Make an instance usable as the ``ignore`` argument of :any:`shutil.copytree`.
+
+        Parameters
+        ----------
+        directory : str
+            The folder that contains ``names``.
+        names : list
+            The names of the folder content.
+
+        Returns
+        -------
+        set
+            The names that should be ignored.
+        """
+        return self.ignored_names(directory, names)
+
+    def match(self, name, rel_dir=None, is_dir=False):
+        """Check if a file or folder should be ignored.
+
+        Parameters
+        ----------
+        name : str
+            The file or folder name.
+        rel_dir : str, None, optional
+            The path of the folder containing ``name`` relative to the root folder being
+            processed (an empty string for the root folder itself). If None, anchored patterns
+            are not checked.
+        is_dir : bool, optional
+            Whether ``name`` is a folder.
+
+        Returns
+        -------
+        bool
+            Whether the file or folder should be ignored.
+        """
+        if self._name_re is not None and self._name_re.fullmatch(name):
+            return True
+
+        if is_dir and self._name_dir_re is not None and self._name_dir_re.fullmatch(name):
+            return True
+
+        if rel_dir is not None and self.has_path_patterns:
+            rel_path = rel_dir + "/" + name if rel_dir else name
+
+            if self._path_re is not None and self._path_re.fullmatch(rel_path):
+                return True
+
+            if is_dir and self._path_dir_re is not None and self._path_dir_re.fullmatch(rel_path):
+                return True
+
+        return False
+
+    def ignored_names(self, directory, names, rel_dir=None):
+        """Get the names that should be ignored from a list of names.
+
+        Parameters
+        ----------
+        directory : str
+            The folder that contains ``names``. It is only used to check which names are
+            folders when there are patterns that only match folders.
+        names : list
+            The names of the folder content.
+        rel_dir : str, None, optional
+            See :any:`IgnoreMatcher.match`.
+
+        Returns
+        -------
+        set
+            The names that should be ignored.
+        """
+        if not self._parsed_patterns:
+            return set()
+
+        check_dirs = self.has_dir_only_patterns
+
+        return {name for name in names
+                if self.match(name, rel_dir=rel_dir,
+                              is_dir=check_dirs and os.path.isdir(os.path.join(directory, name)))}
+
+    def rsync_exclude_args(self, root_name=""):
+        """Translate the patterns into ``rsync`` ``--exclude`` arguments.
+
+        Parameters
+        ----------
+        root_name : str, optional
+            The name of the folder that is being transferred. When ``rsync`` is called without
+            a trailing slash in the source folder (e.g., ``rsync /path/to/folder dest``), anchored
+            patterns are relative to the folder containing the source folder. So, anchored
+            patterns need to be prefixed with the source folder name to be relative to the source
+            folder itself, just like when they are used by this class.
+
+        Returns
+        -------
+        list
+            The list of ``--exclude`` arguments. The arguments aren't shell quoted.
+        """
+        args = []
+
+        for pattern, anchored, dir_only in self._parsed_patterns:
+            if anchored:
+                pattern = "/" + "/".join(p for p in (root_name, pattern) if p)
+
+            args.append("--exclude=%s%s" % (pattern, "/" if dir_only else ""))
+
+        return args
+
+    def tar_exclude_args(self, root_dirs=()):
+        """Translate the patterns into ``tar`` ``--exclude`` arguments.
+
+        Used when ``tar`` recurses into folders by itself instead of reading an already filtered
+        list of files. ``tar`` can't tell files from folders when excluding, so patterns that
+        only match folders will also exclude files with the same name. ``**`` is approximated
+        with wildcards that match slashes.
+
+        Parameters
+        ----------
+        root_dirs : list, optional
+            The folders that are passed to ``tar``. Anchored patterns are relative to each one
+            of them.
+
+        Returns
+        -------
+        list
+            The list of ``--exclude`` arguments (and the ``tar`` options that control how they
+            are matched). The arguments aren't shell quoted.
+        """
+        if not self._parsed_patterns:
+            return []
+
+        name_args = []
+        path_args = []
+
+        for pattern, anchored, dir_only in self._parsed_patterns:
+            if "**" in pattern:
+                variants = sorted({pattern.replace("**/", ""), pattern.replace("**", "*")})
+                match_slash = "--wildcards-match-slash"
+            else:
+                variants = [pattern]
+                match_slash = "--no-wildcards-match-slash"
+
+            if anchored:
+                path_args.extend([match_slash] + ["--exclude=%s" % os.path.join(root_dir, v)
+                                                  for root_dir in root_dirs for v in variants])
+            else:
+                name_args.extend([match_slash] + ["--exclude=%s" % v for v in variants])
+
+        args = ["--no-anchored"] + name_args
+
+        if path_args:
+            args += ["--anchored"] + path_args + ["--no-anchored"]
+
+        # Restore tar's defaults for any exclusion added after these arguments.
+        return args + ["--wildcards-match-slash"]
+
+
+def get_matcher(ignored_patterns):
+    """Get an ignore matcher.
+
+    Parameters
+    ----------
+    ignored_patterns : list, IgnoreMatcher, None
+        A list of file name patterns or an already created :any:`IgnoreMatcher`.
+
+    Returns
+    -------
+    IgnoreMatcher
+        An ignore matcher.
+    """
+    if isinstance(ignored_patterns, IgnoreMatcher):
+        return ignored_patterns
+
+    return IgnoreMatcher(ignored_patterns)
+
+
+def translate(pattern):
+    """Translate a pattern into a regular expression.
+
+    Parameters
+    ----------
+    pattern : str
+        A file name pattern. See :any:`IgnoreMatcher`.
+
+    Returns
+    -------
+    str
+        A regular expression.
+    """
+    i, n = 0, len(pattern)
+    res = []
+
+    while i < n:
+        c = pattern[i]
+
+        if c == "*":
+            if pattern.startswith("**", i):
+                i += 2
+
+                if i < n and pattern[i] == "/":
+                    res.append("(?:.*/)?")
+                    i += 1
+                else:
+                    res.append(".*")
+
+                continue
+
+            res.append("[^/]*")
+        elif c == "?":
+            res.append("[^/]")
+        elif c == "[":
+            j = i + 1
+
+            if j < n and pattern[j] in "!^":
+                j += 1
+
+            if j < n and pattern[j] == "]":
+                j += 1
+
+            while j < n and pattern[j] != "]":
+                j += 1
+
+            if j >= n:
+                res.append("\\[")
+            else:
+                stuff = pattern[i + 1:j].replace("\\", "\\\\")
+
+                if stuff[0] == "!":
+                    stuff = "^" + stuff[1:]
+                elif stuff[0] == "^":
+                    stuff = "\\" + stuff
+
+                res.append("[%s]" % stuff)
+                i = j
+        else:
+            res.append(re.escape(c))
+
+        i += 1
+
+    return "".join(res)
+
+
+def _compile_regexes(regexes):
+    """Compile a list of regular expressions into a single one.
+
+    Parameters
+    ----------
+    regexes : list
+        A list of regular expressions.
+
+    Returns
+    -------
+    re.Pattern, None
+        The compiled regular expression or None if ``regexes`` is empty.
+    """
+    if not regexes:
+        return None
+
+    return re.compile("|".join("(?:%s)" % r for r in regexes), re.DOTALL)
+
+
+if __name__ == "__main__":
+    pass
@@ -2,6 +2,7 @@
 """Utilities to validate data from JSON schemas.
 """
 import json
+import os
 
 from collections.abc import Callable
 from copy import deepcopy
@@ -25,6 +26,10 @@ _extra_types = {
     "custom_tuple": tuple
 }
 
+# Validators created from schema files. Keyed by the path, modification time and size of the
+# schema file and the names of the extra types.
+_validators_cache = {}
+
 
 class SchemaValidationError(ExceptionWhitoutTraceBack):
     """SchemaValidationError
@@ -41,11 +46,88 @@ class SchemaValidationError(ExceptionWhitoutTraceBack):
         super().__init__(msg)
 
 
+def _load_schema(schema_path):
+    """Load a schema from a file.
+
+    Parameters
+    ----------
+    schema_path : str
+        Path to a JSON or YAML file.
+
+    Returns
+    -------
+    dict
+        The schema.
+    """
+    if schema_path.endswith(".yaml") or schema_path.endswith(".yml"):
+        with open(schema_path, "r") as yaml_file:
+            return yaml_utils.load(yaml_file)
+    elif schema_path.endswith(".json"):
+        with open(schema_path, "r") as json_file:
+            return json.load(json_file)
+
+    return schema_path
+
+
+def get_validator(schema, extra_types={}):
+    """Get a validator for a JSON schema.
+
+    The validators of the schemas stored in files are created only once per process (or until
+    the schema file changes).
+
+    Parameters
+    ----------
+    schema : dict, str
+        See :any:`validate`.
+    extra_types : dict, optional
+        See :any:`validate`.
+
+    Returns
+    -------
+    object
+        A ``jsonschema`` validator.
+
+    Raises
+    ------
+    MissingDependencyModule
+        Module ``jsonschema`` not installed.
+    """
+    if not JSONSCHEMA_INSTALLED:
+        raise MissingDependencyModule("Missing 'jsonschema' module.")
+
+    key = None
+
+    if isinstance(schema, str):
+        try:
+            st = os.stat(schema)
+            key = (os.path.abspath(schema), st.st_mtime_ns, st.st_size,
+                   tuple(sorted(extra_types)))
+            validator = _validators_cache.get(key)
+
+            if validator is not None:
+                return validator
+
+            schema = _load_schema(schema)
+        except IOError as err:
+            print(err)
+            raise SystemExit(1)
+
+    validator = schema_validator(schema,
+                                 types={**extra_types, **_extra_types},
+                                 format_checker=format_checker)
+
+    if key is not None:
+        _validators_cache[key] = validator
+
+    return validator
+
+
 def validate(instance, schema,
              raise_error=True,
              error_message_extra_info="",
              error_header="Data didn't pass validation!",
              extra_types={},
+             copy_instance=True,
              logger=None):
     """Validate data using a JSON schema.
 
@@ -63,6 +145,9 @@ def validate(instance, schema,
         Text to be displayed as "CLI header".
     extra_types : dict, optional
         Extra type checks.
+    copy_instance : bool, optional
+        Whether to validate a copy of instance instead of the original. Not needed when the
+        data isn't used anywhere else yet (e.g., freshly loaded from a file).
     logger : LogSystem
         The logger.
 
@@ -79,31 +164,17 @@ def validate(instance, schema,
     SchemaValidationError
         See :any:`SchemaValidationError`.
     """
-    if not JSONSCHEMA_INSTALLED:
-        raise MissingDependencyModule("Missing 'jsonschema' module.")
+    v = get_validator(schema, extra_types)
 
     # Just in case, use a copy of instance to validate, not the original.
-    try:
-        instance_copy = deepcopy(instance)
-    except Exception as err:
-        instance_copy = instance
-        logger.warning(err)
+    instance_copy = instance
 
-    if isinstance(schema, str):
+    if copy_instance:
         try:
-            if schema.endswith(".yaml") or schema.endswith(".yml"):
-                with open(schema, "r") as yaml_file:
-                    schema = yaml_utils.load(yaml_file)
-            elif schema.endswith(".json"):
-                with open(schema, "r") as json_file:
-                    schema = json.load(json_file)
-        except IOError as err:
-            print(err)
-            raise SystemExit(1)
+            instance_copy = deepcopy(instance)
+        except Exception as err:
+            logger.warning(err)
 
-    v = schema_validator(schema,
-                         types={**extra_types, **_extra_types},
-                         format_checker=format_checker)
     errors = sorted(v.iter_errors(instance_copy), key=lambda e: e.path)
 
     if errors:
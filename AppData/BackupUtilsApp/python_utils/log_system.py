@@ -1,8 +1,15 @@
 # -*- coding: utf-8 -*-
 """A very simple logging system.
 """
+import atexit
 import logging
 import os
+import queue
+import threading
+import time
+
+from logging.handlers import MemoryHandler
+from logging.handlers import QueueListener
 
 from .ansi_colors import Ansi
 from .misc_utils import get_date_time
@@ -32,6 +39,104 @@ _log_levels = {
 }
 
 
+# Minimum amount of seconds between the rate limited messages displayed in the terminal.
+_rate_limit_interval = 1.0
+
+
+def _get_level_data(log_level):
+    """Get the data needed to log a message with a log level.
+
+    Parameters
+    ----------
+    log_level : str
+        A key of ``_log_levels`` or the name of an :any:`Ansi` color.
+
+    Returns
+    -------
+    tuple
+        The ``logging`` level and the :any:`Ansi` function used to color the message in the
+        terminal (None if there is no such function).
+    """
+    level_data = _log_levels.get(log_level, {})
+    levelno = logging.INFO
+
+    if level_data.get("logging_support"):
+        levelno = getattr(logging, log_level)
+
+    return levelno, getattr(Ansi, level_data.get("color", log_level), None)
+
+
+class _BatchedFileHandler(MemoryHandler):
+    """Memory handler that writes all the buffered records to its target with a single write.
+
+    :any:`logging.handlers.MemoryHandler` passes the buffered records to its target one by one,
+    and a :any:`logging.FileHandler` writes and flushes its stream for each record.
+    """
+
+    def flush(self):
+        """Write all buffered records.
+        """
+        with self.lock:
+            if not self.buffer or self.target is None:
+                return
+
+            stream = getattr(self.target, "stream", None)
+
+            if stream is None:
+                super().flush()
+                return
+
+            with self.target.lock:
+                stream.write("".join(self.target.format(record) + self.target.terminator
+                                     for record in self.buffer))
+                stream.flush()
+
+            self.buffer.clear()
+
+
+class _BatchingQueueListener(QueueListener):
+    """Queue listener that receives ``(level, message)`` tuples instead of log records.
+
+    Creating the log record is left to the listener thread, so queueing a message is just a
+    ``put`` into a queue. The buffered records are written whenever the queue is empty, so
+    messages are written in batches while they are produced faster than they can be written,
+    and without delay otherwise.
+    """
+
+    def __init__(self, message_queue, handler):
+        """Initialization.
+
+        Parameters
+        ----------
+        message_queue : queue.Queue
+            The queue from which to read the messages.
+        handler : _BatchedFileHandler
+            The handler that writes the messages.
+        """
+        super().__init__(message_queue, handler)
+        self._batched_handler = handler
+
+    def dequeue(self, block):
+        """See :any:`logging.handlers.QueueListener.dequeue`.
+        """
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            self._batched_handler.flush()
+
+            return self.queue.get(block)
+
+    def prepare(self, item):
+        """See :any:`logging.handlers.QueueListener.prepare`.
+        """
+        if item is self._sentinel:
+            return item
+
+        levelno, msg = item
+
+        return logging.LogRecord("root", levelno, "", 0, msg, None, None)
+
+
 class LogSystem():
     """LogSystem class.
 
@@ -41,7 +146,7 @@ class LogSystem():
         Display message in terminal.
     """
 
-    def __init__(self, filename="log.log", verbose=False):
+    def __init__(self, filename="log.log", verbose=False, queued=False):
         """Initialization.
 
         Parameters
@@ -50,6 +155,11 @@ class LogSystem():
             Log file name or path to a file.
         verbose : bool, optional
             Display message in terminal.
+        queued : bool, optional
+            Write messages to the log file from a separate thread, in batches. The calling
+            thread only puts the messages into a queue. Messages are still displayed in the
+            terminal immediately (so they aren't mixed with the output of executed commands).
+            The pending messages are written at exit or when :any:`LogSystem.close` is called.
 
         Raises
         ------
@@ -69,9 +179,47 @@ class LogSystem():
         self.verbose = verbose
         self._log_file = filename
         self._user_home = os.path.expanduser("~")
+        self._levels = {}
+        self._last_rate_limited_time = 0.0
+        self._suppressed_count = 0
+        self._queue = None
+        self._listener = None
         logging.basicConfig(filename=filename, level=logging.DEBUG)
+
+        if queued:
+            self._start_queue()
+
         self._extend()
 
+    def _start_queue(self):
+        """Start the thread that writes the queued messages to the log file.
+        """
+        file_handler = next((h for h in logging.root.handlers
+                             if isinstance(h, logging.FileHandler)), None)
+
+        if file_handler is None:
+            return
+
+        self._queue = queue.Queue()
+        self._listener = _BatchingQueueListener(
+            self._queue, _BatchedFileHandler(capacity=1024, flushLevel=logging.CRITICAL + 1,
+                                             target=file_handler))
+        self._listener.start()
+        atexit.register(self.close)
+
+    def close(self):
+        """Write all the queued messages and stop the thread that writes them.
+
+        Only needed when the ``queued`` argument was used. Messages logged after calling this
+        method are written directly to the log file.
+        """
+        listener, self._listener = self._listener, None
+
+        if listener is not None:
+            listener.stop()
+            listener.handlers[0].close()
+            self._queue = None
+
     def _extend(self):
         """Extend class' functions.
         """
@@ -91,7 +239,7 @@ class LogSystem():
         method
             A function that will be dynamically attached to ``self``.
         """
-        def f(msg, term=True, date=True, to_file=True):
+        def f(msg, term=True, date=True, to_file=True, timestamp=None, rate_limited=False):
             """Log message.
 
             Parameters
@@ -104,8 +252,13 @@ class LogSystem():
                 See :any:`LogSystem._update_log` > ``date``.
             to_file : bool, optional
                 Whether to log message to log file.
+            timestamp : str, None, optional
+                See :any:`LogSystem._update_log` > ``timestamp``.
+            rate_limited : bool, optional
+                See :any:`LogSystem._update_log` > ``rate_limited``.
             """
-            self._update_log(msg, log_level=log_level, term=term, date=date, to_file=to_file)
+            self._update_log(msg, log_level=log_level, term=term, date=date, to_file=to_file,
+                             timestamp=timestamp, rate_limited=rate_limited)
 
         return f
 
@@ -129,7 +282,8 @@ class LogSystem():
         """
         self._update_log("**[DRY_RUN]** %s" % str(msg), log_level="LIGHT_MAGENTA", date=False)
 
-    def _update_log(self, msg, log_level="ERROR", term=True, date=True, to_file=True):
+    def _update_log(self, msg, log_level="ERROR", term=True, date=True, to_file=True,
+                    timestamp=None, rate_limited=False):
         """Do the actual logging.
 
         Parameters
@@ -146,23 +300,57 @@ class LogSystem():
             message.
         to_file : bool, optional
             Whether to log message to log file.
+        timestamp : str, None, optional
+            The date to log as returned by :any:`misc_utils.get_date_time`. If not specified, the
+            current date is used.
+        rate_limited : bool, optional
+            Display at most one rate limited message per second in the terminal, with the amount
+            of messages that weren't displayed since the previous one. Used for messages logged
+            once per file (e.g., copied files). All messages are still logged to the log file.
         """
-        now = "%s: " % micro_to_milli(get_date_time())
+        level_data = self._levels.get(log_level)
+
+        if level_data is None:
+            level_data = self._levels[log_level] = _get_level_data(log_level)
+
+        levelno, ansi_func = level_data
         m = str(msg)
 
+        if date:
+            now = "%s: " % micro_to_milli(timestamp or get_date_time())
+
         if to_file:
-            getattr(logging, "info" if (log_level not in _log_levels or not _log_levels[log_level].get(
-                "logging_support")) else log_level.lower())(now + m if date else m)
+            if self._queue is not None:
+                self._queue.put_nowait((levelno, now + m if date else m))
+            else:
+                logging.root.log(levelno, now + m if date else m)
+
+        if not self.verbose or not term:
+            return
 
-        if self.verbose and term:
-            pm = ("**%s**" % now) + m if date else m
+        if rate_limited:
+            current_time = time.monotonic()
 
-            try:
-                ansi_color = _log_levels[log_level].get("color") \
-                    if log_level in _log_levels else log_level
-                print(getattr(Ansi, ansi_color, "DEFAULT")(self._obfuscate_user_home(pm)))
-            except Exception:
-                print(pm)
+            if current_time - self._last_rate_limited_time < _rate_limit_interval:
+                self._suppressed_count += 1
+                return
+
+            self._last_rate_limited_time = current_time
+
+            if self._suppressed_count:
+                m += " (and %d more)" % self._suppressed_count
+                self._suppressed_count = 0
+        elif self._suppressed_count:
+            print("(%d more messages not displayed. See the log file.)" %
+                  self._suppressed_count)
+            self._suppressed_count = 0
+
+        pm = self._obfuscate_user_home(("**%s**" % now) + m if date else m)
+
+        try:
+            print(ansi_func(pm) if ansi_func is not None else pm)
+        except Exception:
+            print(pm)
 
     def _obfuscate_user_home(self, msg):
         """Obfuscate User's home path.
@@ -180,6 +368,100 @@ class LogSystem():
         return msg.replace(self._user_home, "~")
 
 
+class BufferedLogger():
+    """Buffer messages and log them all at once with a :any:`LogSystem` instance.
+
+    Used when several tasks are executed in parallel, so the messages of each task can be logged
+    together instead of being interleaved with the messages of other tasks. All the methods used
+    to log messages have the same signature as the ones of :any:`LogSystem`. Any other attribute
+    is read from the wrapped :any:`LogSystem` instance.
+    """
+    _flush_lock = threading.Lock()
+
+    def __init__(self, logger):
+        """Initialization.
+
+        Parameters
+        ----------
+        logger : LogSystem
+            The logger used to log the buffered messages.
+        """
+        self._logger = logger
+        self._records = []
+
+        for level in _log_levels:
+            setattr(self, level.lower(), self._make_buffer_function(level.lower()))
+
+    def __getattr__(self, name):
+        """Get attributes from the wrapped logger.
+
+        Parameters
+        ----------
+        name : str
+            Attribute name.
+
+        Returns
+        -------
+        object
+            The attribute of the wrapped logger.
+        """
+        return getattr(self._logger, name)
+
+    def _make_buffer_function(self, func_name):
+        """Make buffer function.
+
+        Parameters
+        ----------
+        func_name : str
+            The name of the :any:`LogSystem` function that will log the buffered message.
+
+        Returns
+        -------
+        method
+            A function that will be dynamically attached to ``self``.
+        """
+        def f(msg, **kwargs):
+            """Buffer message.
+
+            Parameters
+            ----------
+            msg : str
+                See :any:`LogSystem._update_log` > ``msg``.
+            **kwargs
+                See :any:`LogSystem._make_log_function`.
+            """
+            if kwargs.get("date", True) and not kwargs.get("timestamp"):
+                # Keep the date in which the message was generated, not the one in which it is
+                # actually logged.
+                kwargs["timestamp"] = get_date_time()
+
+            self._records.append((func_name, msg, kwargs))
+
+        return f
+
+    def log_dry_run(self, msg):
+        """See :any:`LogSystem.log_dry_run`.
+
+        Parameters
+        ----------
+        msg : str
+            See :any:`LogSystem._update_log` > ``msg``.
+        """
+        self._records.append(("log_dry_run", msg, {}))
+
+    def flush(self):
+        """Log all buffered messages.
+
+        The messages of all instances are logged while holding a lock shared by all instances,
+        so the messages flushed by one instance are never mixed with the ones of another.
+        """
+        with BufferedLogger._flush_lock:
+            records, self._records = self._records, []
+
+            for func_name, msg, kwargs in records:
+                getattr(self._logger, func_name)(msg, **kwargs)
+
+
 def generate_log_path(storage_dir="tmp/logs", prefix="", subfix="", delimiter="_"):
     """Generate log file name.
 
@@ -85,6 +85,28 @@ def get_time_diff(s, e):
     return "%d hr/s, %d min/s, %d sec/s, %d msec/s" % (h, m, s, ms)
 
 
+def format_bytes(num_bytes):
+    """Format an amount of bytes into a human readable string.
+
+    Parameters
+    ----------
+    num_bytes : int, float
+        Amount of bytes.
+
+    Returns
+    -------
+    str
+        The formatted amount of bytes (e.g., ``1.50 MiB``).
+    """
+    for unit in ["B", "KiB", "MiB", "GiB", "TiB"]:
+        if abs(num_bytes) < 1024.0 or unit == "TiB":
+            break
+
+        num_bytes /= 1024.0
+
+    return "%.2f %s" % (num_bytes, unit)
+
+
 def merge_dict(first, second, logger=None, extend_lists=True, append_to_lists=True):
     """Merges **second** dictionary into **first** dictionary and return merged result.
 
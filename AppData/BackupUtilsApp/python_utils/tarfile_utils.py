@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""Utilities to create tar archives without depending on external programs.
+"""
+import bz2
+import lzma
+import os
+import queue
+import tarfile
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+    ZSTANDARD_INSTALLED = True
+except ImportError:
+    ZSTANDARD_INSTALLED = False
+
+
+# Extension used to name the archives of each compression.
+COMPRESSIONS_EXT = {
+    "none": "",
+    "xz": ".xz",
+    "gzip": ".gz",
+    "bzip2": ".bz2",
+    "zstd": ".zst"
+}
+
+# Size of the blocks of data passed between the stages of the pipeline.
+_block_size = 1024 * 1024
+_queue_end = None
+
+
+class _QueueWriter():
+    """File-like object that passes the data written to it to a queue in blocks.
+
+    Used as the file object of a ``tarfile`` opened in stream mode, so the archive data can be
+    consumed by another thread while ``tarfile`` reads the next files.
+
+    Attributes
+    ----------
+    blocked_time : float
+        Time (in seconds) spent waiting for the queue to have free space.
+    """
+
+    def __init__(self, data_queue, abort_event):
+        """Initialize.
+
+        Parameters
+        ----------
+        data_queue : queue.Queue
+            The queue in which to put the data.
+        abort_event : threading.Event
+            Event set when a consumer failed. Writing raises an exception once it's set.
+        """
+        self._queue = data_queue
+        self._abort_event = abort_event
+        self.blocked_time = 0.0
+
+    def write(self, data):
+        """Put data into the queue.
+
+        Parameters
+        ----------
+        data : bytes
+            The data.
+
+        Raises
+        ------
+        OSError
+            If a consumer failed.
+        """
+        if self._abort_event.is_set():
+            raise OSError("Archive pipeline aborted.")
+
+        start = time.perf_counter()
+        self._queue.put(bytes(data))
+        self.blocked_time += time.perf_counter() - start
+
+    def close(self):
+        """Signal the end of the data.
+        """
+        self._queue.put(_queue_end)
+
+
+class _PaddedFileReader():
+    """File-like object that reads exactly the size stored in the header of a member.
+
+    Once the header of a member is in the archive, the member must have the size stated in it,
+    or every member after it is lost. If the file shrinks or can't be read while it's being
+    archived, the rest of its data is replaced with zeros (as GNU tar does) and the error is
+    stored, so the file can be reported.
+
+    Attributes
+    ----------
+    error : OSError, None
+        The error that happened while reading the file. None if the whole file was read.
+    """
+
+    def __init__(self, file_obj, size):
+        """Initialize.
+
+        Parameters
+        ----------
+        file_obj : object
+            The file object to read from.
+        size : int
+            The size of the member.
+        """
+        self._file_obj = file_obj
+        self._remaining = size
+        self.error = None
+
+    def read(self, size):
+        """Read data from the file.
+
+        Parameters
+        ----------
+        size : int
+            Amount of bytes to read.
+
+        Returns
+        -------
+        bytes
+            Exactly ``size`` bytes (or the remaining size of the member if it's smaller).
+        """
+        size = min(size, self._remaining)
+        data = b""
+
+        if self.error is None:
+            try:
+                data = self._file_obj.read(size)
+            except OSError as err:
+                self.error = err
+
+            if len(data) < size and self.error is None:
+                self.error = OSError("File shrank while it was being archived. The missing "
+                                     "data was replaced with zeros.")
+
+        self._remaining -= size
+
+        return data + bytes(size - len(data))
+
+
+def get_compressor(compression="none", level=6):
+    """Get a streaming compressor.
+
+    Parameters
+    ----------
+    compression : str, optional
+        One of the keys of ``COMPRESSIONS_EXT``.
+    level : int, optional
+        Compression level.
+
+    Returns
+    -------
+    object, None
+        An object with ``compress`` and ``flush`` methods or None if ``compression`` is "none".
+
+    Raises
+    ------
+    RuntimeError
+        If the zstandard module isn't installed and zstd compression is requested.
+    """
+    if compression == "xz":
+        return lzma.LZMACompressor(preset=level)
+    elif compression == "gzip":
+        # 16 + MAX_WBITS makes zlib produce the gzip format.
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif compression == "bzip2":
+        return bz2.BZ2Compressor(max(level, 1))
+    elif compression == "zstd":
+        if not ZSTANDARD_INSTALLED:
+            raise RuntimeError("The zstandard module is needed to create zstd archives.")
+
+        return zstandard.ZstdCompressor(level=level).compressobj()
+
+    return None
+
+
+def write_tar_stream(paths, archive_path, compression="none", level=6, queue_size=16,
+                     arcname_func=None, on_error=None):
+    """Create a tar archive in a pipeline of three stages running in parallel.
+
+    - Read: ``tarfile`` (in stream mode) reads the files and produces the archive data. It \
+    runs in the calling thread and consumes ``paths`` lazily.
+    - Compress: The archive data is compressed in a separate thread.
+    - Write: The compressed data is written to disk in a separate thread.
+
+    The stages are connected by bounded queues, so reading files overlaps with compressing and
+    writing, and memory usage is limited to ``queue_size`` blocks per queue.
+
+    Parameters
+    ----------
+    paths : iterable
+        Paths to the files to add to the archive. Folders are added without their content.
+    archive_path : str
+        Path to the archive to create.
+    compression : str, optional
+        See :any:`get_compressor`.
+    level : int, optional
+        See :any:`get_compressor`.
+    queue_size : int, optional
+        Maximum amount of blocks waiting in each queue.
+    arcname_func : method, optional
+        Function that receives a path and returns its name inside the archive. By default, the
+        path without leading slashes (just like ``tar`` does).
+    on_error : method, optional
+        Function called with a path and an exception when a file can't be added to the
+        archive or can't be read completely (see <class :any:`_PaddedFileReader`>). By default,
+        the exception is raised.
+
+    Returns
+    -------
+    dict
+        Statistics of the pipeline. The amount of files added (``files``), the size of the
+        archive before (``tar_bytes``) and after compression (``archive_bytes``), the time spent
+        working by each stage (``read_time``, ``compress_time`` and ``write_time``) and the
+        total elapsed time (``elapsed_time``), all in seconds.
+    """
+    compressor = get_compressor(compression, level)
+    arcname_func = arcname_func or (lambda path: path.lstrip(os.sep))
+    abort_event = threading.Event()
+    raw_queue = queue.Queue(maxsize=queue_size)
+    compressed_queue = queue.Queue(maxsize=queue_size)
+    stats = {
+        "files": 0,
+        "tar_bytes": 0,
+        "archive_bytes": 0,
+        "read_time": 0.0,
+        "compress_time": 0.0,
+        "write_time": 0.0,
+        "elapsed_time": 0.0
+    }
+    errors = []
+
+    def run_stage(name, in_queue, func, out_queue):
+        # Once a stage fails, it keeps draining its input queue so the previous stage never
+        # blocks forever.
+        failed = False
+
+        while True:
+            data = in_queue.get()
+
+            if data is _queue_end:
+                break
+
+            if failed:
+                continue
+
+            try:
+                start = time.perf_counter()
+                result = func(data)
+                stats[name] += time.perf_counter() - start
+
+                if out_queue is not None and result:
+                    out_queue.put(result)
+            except BaseException as err:
+                failed = True
+                errors.append(err)
+                abort_event.set()
+
+        if out_queue is not None:
+            if compressor is not None and not failed:
+                try:
+                    start = time.perf_counter()
+                    out_queue.put(compressor.flush())
+                    stats[name] += time.perf_counter() - start
+                except BaseException as err:
+                    errors.append(err)
+                    abort_event.set()
+
+            out_queue.put(_queue_end)
+
+    def compress(data):
+        stats["tar_bytes"] += len(data)
+
+        return compressor.compress(data) if compressor is not None else data
+
+    start_time = time.perf_counter()
+
+    with open(archive_path, "wb") as archive_file:
+        def write(data):
+            archive_file.write(data)
+            stats["archive_bytes"] += len(data)
+
+        compress_thread = threading.Thread(target=run_stage,
+                                           args=("compress_time", raw_queue, compress,
+                                                 compressed_queue),
+                                           daemon=True)
+        write_thread = threading.Thread(target=run_stage,
+                                        args=("write_time", compressed_queue, write, None),
+                                        daemon=True)
+        compress_thread.start()
+        write_thread.start()
+
+        writer = _QueueWriter(raw_queue, abort_event)
+
+        try:
+            with tarfile.open(fileobj=writer, mode="w|", bufsize=_block_size,
+                              format=tarfile.PAX_FORMAT) as tar:
+                for path in paths:
+                    # Only the errors that happen before the header of a member is written can
+                    # skip the file. Errors writing the archive abort it.
+                    file_obj = None
+
+                    try:
+                        tarinfo = tar.gettarinfo(path, arcname=arcname_func(path))
+
+                        if tarinfo is None:  # Sockets can't be archived.
+                            continue
+
+                        if tarinfo.isreg():
+                            file_obj = open(path, "rb")
+                    except OSError as err:
+                        if on_error is None:
+                            raise
+
+                        on_error(path, err)
+                        continue
+
+                    if file_obj is None:
+                        tar.addfile(tarinfo)
+                    else:
+                        with file_obj:
+                            reader = _PaddedFileReader(file_obj, tarinfo.size)
+                            tar.addfile(tarinfo, reader)
+
+                        if reader.error is not None:
+                            if on_error is None:
+                                raise reader.error
+
+                            on_error(path, reader.error)
+
+                    stats["files"] += 1
+
+            read_end_time = time.perf_counter()
+        except OSError:
+            # Writing to the pipeline fails once another stage failed. That stage's error is
+            # the one raised.
+            if not abort_event.is_set():
+                raise
+        finally:
+            writer.close()
+            compress_thread.join()
+            write_thread.join()
+
+    if errors:
+        raise errors[0]
+
+    stats["elapsed_time"] = time.perf_counter() - start_time
+    # The time not spent waiting for the compression stage is the time spent reading.
+    stats["read_time"] = max(read_end_time - start_time - writer.blocked_time, 0.0)
+
+    return stats
+
+
+if __name__ == "__main__":
+    pass
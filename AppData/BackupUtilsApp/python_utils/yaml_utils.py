@@ -14,11 +14,36 @@ Note
 I created the ordered load/dump methods because the default sorting capabilities suck (the "a" and "A"
 characters are in the EXACT SAME PLACE ALPHABETICALLY). So, I sort my data my way before dumping
 it to a YAML document.
+
+Note
+----
+The LibYAML based loader and dumper (``CSafeLoader`` and ``CSafeDumper``) of the PyYAML package
+installed in the system are used if available. They are several times faster than the pure
+Python implementation of the vendored ``yaml`` package, which is used otherwise. The system's
+package is used as a whole because its LibYAML bindings produce nodes and events that the
+vendored package doesn't recognize.
+
+Attributes
+----------
+LIBYAML_AVAILABLE : bool
+    Whether the LibYAML bindings of the system's PyYAML package are used.
 """
 from collections import OrderedDict
 
 from . import yaml
 
+try:
+    import yaml as _yaml
+
+    from yaml import CSafeDumper as _SafeDumper
+    from yaml import CSafeLoader as _SafeLoader
+    LIBYAML_AVAILABLE = True
+except ImportError:
+    _SafeDumper = yaml.SafeDumper
+    _SafeLoader = yaml.SafeLoader
+    _yaml = yaml
+    LIBYAML_AVAILABLE = False
+
 
 def load(stream, **kwargs):
     """Parse the first YAML document in a stream and produce the corresponding Python object.
@@ -36,7 +61,7 @@ def load(stream, **kwargs):
     object
         A Python object.
     """
-    return yaml.load(stream, Loader=yaml.SafeLoader, **kwargs)
+    return _yaml.load(stream, Loader=_SafeLoader, **kwargs)
 
 
 def dump(data, stream=None, **kwargs):
@@ -56,10 +81,10 @@ def dump(data, stream=None, **kwargs):
     str, byte, None
         The serialized data if ``stream`` is ``None``.
     """
-    return yaml.dump(data, stream, Dumper=yaml.SafeDumper, **kwargs)
+    return _yaml.dump(data, stream, Dumper=_SafeDumper, **kwargs)
 
 
-class OrderedLoader(yaml.SafeLoader):
+class OrderedLoader(_SafeLoader):
     """Ordered YAML loader.
     """
     pass
@@ -85,12 +110,12 @@ def _construct_mapping(loader, node):
 
 
 OrderedLoader.add_constructor(
-    yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
+    _yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
     _construct_mapping
 )
 
 
-class OrderedDumper(yaml.SafeDumper):
+class OrderedDumper(_SafeDumper):
     """Ordered YAML dumper.
     """
     pass
@@ -112,7 +137,7 @@ def _dict_representer(dumper, data):
         Description
     """
     return dumper.represent_mapping(
-        yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
+        _yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
         data.items()
     )
 
@@ -136,7 +161,7 @@ def ordered_load(stream):
     object
         A Python object.
     """
-    return yaml.load(stream, Loader=OrderedLoader)
+    return _yaml.load(stream, Loader=OrderedLoader)
 
 
 def ordered_dump(data, stream=None, **kwargs):
@@ -156,7 +181,7 @@ def ordered_dump(data, stream=None, **kwargs):
     str, byte, None
         The serialized data if ``stream`` is ``None``.
     """
-    return yaml.dump(data, stream=stream, Dumper=OrderedDumper, **kwargs)
+    return _yaml.dump(data, stream=stream, Dumper=OrderedDumper, **kwargs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""Retention of the backups created by tasks.
+
+Backups are identified by their names, which are composed of the ``destination_prefix`` of a
+task followed by a timestamp generated with ``misc_utils.get_date_time("filename")`` (e.g.,
+``MyHome-2024-01-31_23.59.59.999-full.tar.xz``). All the files and folders with the same prefix
+and timestamp (e.g., an archive and its manifest) are considered to be the same backup.
+"""
+import os
+import re
+
+from datetime import datetime
+from shutil import rmtree
+
+_timestamp_pattern = r"(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2}\.\d{2}\.\d{3})"
+_timestamp_format = "%Y-%m-%d_%H.%M.%S.%f"
+# Suffix of the folders of backups that are still being created (or that were interrupted).
+_partial_suffix = ".partial"
+
+# Suffixes added to the names of the archives of the snapshot based tar modes and the level
+# they correspond to. See tasks._tar_level_suffixes.
+_level_suffixes = {
+    "-full": "full",
+    "-incr": "incremental",
+    "-diff": "differential"
+}
+
+
+class RetentionPolicy():
+    """Grandfather-father-son retention policy.
+
+    A backup is kept if it's one of the last ``keep_last`` backups, or if it's the last backup
+    of one of the last ``keep_daily`` days, ``keep_weekly`` weeks or ``keep_monthly`` months
+    that have backups. Backups of the incremental and differential tar modes also keep the
+    backups they depend on.
+
+    Attributes
+    ----------
+    counts : dict
+        The amount of backups to keep for each rule.
+    """
+
+    # Functions that get the period to which a backup belongs for each rule.
+    _periods = {
+        "keep_daily": lambda date: date.date(),
+        "keep_weekly": lambda date: date.isocalendar()[:2],
+        "keep_monthly": lambda date: (date.year, date.month)
+    }
+
+    def __init__(self, keep_last=0, keep_daily=0, keep_weekly=0, keep_monthly=0):
+        """Initialize.
+
+        Parameters
+        ----------
+        keep_last : int, optional
+            Amount of most recent backups to keep.
+        keep_daily : int, optional
+            Amount of days for which to keep their last backup.
+        keep_weekly : int, optional
+            Amount of weeks for which to keep their last backup.
+        keep_monthly : int, optional
+            Amount of months for which to keep their last backup.
+        """
+        self.counts = {
+            "keep_last": keep_last,
+            "keep_daily": keep_daily,
+            "keep_weekly": keep_weekly,
+            "keep_monthly": keep_monthly
+        }
+
+    def __bool__(self):
+        """There is at least one rule. A policy without rules never removes anything.
+
+        Returns
+        -------
+        bool
+            Whether the policy has rules.
+        """
+        return any(self.counts.values())
+
+    def select(self, backups, protected=()):
+        """Select the backups to keep.
+
+        Parameters
+        ----------
+        backups : list
+            Backups as returned by :any:`list_backups`.
+        protected : iterable, optional
+            Timestamps of backups that are kept no matter the rules. The backups they depend on
+            are kept too.
+
+        Returns
+        -------
+        set
+            The timestamps of the backups to keep.
+        """
+        if not self:
+            return {backup["timestamp"] for backup in backups}
+
+        newest_first = sorted(backups, key=lambda backup: backup["timestamp"], reverse=True)
+        keep = {backup["timestamp"] for backup in newest_first[:self.counts["keep_last"]]}
+        keep.update(protected)
+
+        for rule, get_period in self._periods.items():
+            periods = set()
+
+            for backup in newest_first:
+                if len(periods) >= self.counts[rule]:
+                    break
+
+                period = get_period(backup["date"])
+
+                if period not in periods:
+                    periods.add(period)
+                    keep.add(backup["timestamp"])
+
+        dependencies = _get_dependencies(backups)
+
+        for timestamp in list(keep):
+            keep.update(dependencies.get(timestamp, ()))
+
+        return keep
+
+
+def _get_dependencies(backups):
+    """Get the backups on which each backup depends.
+
+    An incremental archive depends on the last full archive before it and on all the
+    incremental archives between them. A differential archive only depends on the last full
+    archive before it.
+
+    Parameters
+    ----------
+    backups : list
+        Backups as returned by :any:`list_backups`.
+
+    Returns
+    -------
+    dict
+        The timestamps of the backups as keys and lists with the timestamps of the backups
+        they depend on as values.
+    """
+    dependencies = {}
+    chain = []
+
+    for backup in sorted(backups, key=lambda backup: backup["timestamp"]):
+        if backup["level"] == "full":
+            chain = [backup["timestamp"]]
+        elif backup["level"] == "incremental":
+            dependencies[backup["timestamp"]] = list(chain)
+            chain.append(backup["timestamp"])
+        else:
+            dependencies[backup["timestamp"]] = chain[:1]
+
+    return dependencies
+
+
+def list_backups(folder, prefix=""):
+    """List the backups stored in a folder.
+
+    The folder is read with a single :any:`os.scandir` call. Folders with the ``.partial``
+    suffix are ignored.
+
+    Parameters
+    ----------
+    folder : str
+        Path to the folder.
+    prefix : str, optional
+        The ``destination_prefix`` of the task that created the backups.
+
+    Returns
+    -------
+    list
+        Backups sorted from the oldest to the newest. Dictionaries with the timestamp
+        (``timestamp``) and date (``date``) of the backup, its level (``level``, ``full``
+        unless it's an incremental or differential archive) and the paths to all its files
+        and folders (``paths``).
+    """
+    name_re = re.compile(re.escape(prefix) + _timestamp_pattern + r"(.*)", re.DOTALL)
+    backups = {}
+
+    try:
+        entries = list(os.scandir(folder))
+    except FileNotFoundError:
+        return []
+
+    for entry in entries:
+        match = name_re.fullmatch(entry.name)
+
+        if match is None or entry.name.endswith(_partial_suffix):
+            continue
+
+        timestamp, rest = match.groups()
+        backup = backups.get(timestamp)
+
+        if backup is None:
+            try:
+                date = datetime.strptime(timestamp, _timestamp_format)
+            except ValueError:
+                continue
+
+            backup = backups[timestamp] = {
+                "timestamp": timestamp,
+                "date": date,
+                "level": "full",
+                "paths": []
+            }
+
+        backup["paths"].append(entry.path)
+
+        for suffix, level in _level_suffixes.items():
+            if rest.startswith(suffix):
+                backup["level"] = level
+                break
+
+    return [backups[timestamp] for timestamp in sorted(backups)]
+
+
+def apply_policy(folder, policy, prefix="", protected=(), dry_run=False, logger=None):
+    """Remove the backups not selected by a retention policy.
+
+    Parameters
+    ----------
+    folder : str
+        Path to the folder that contains the backups.
+    policy : RetentionPolicy
+        The retention policy.
+    prefix : str, optional
+        See :any:`list_backups`.
+    protected : iterable, optional
+        Paths to backups that must never be removed (e.g., the archives of the current chain
+        of an incremental task).
+    dry_run : bool, optional
+        Do not remove anything. Only log the backups that would be removed.
+    logger : object, optional
+        See <class :any:`LogSystem`>. Only used in dry run mode.
+
+    Returns
+    -------
+    tuple
+        The amount of backups kept, the paths of the removed files and folders and a list of
+        tuples with the paths that couldn't be removed and the reason.
+    """
+    backups = list_backups(folder, prefix)
+    protected = {os.path.abspath(path) for path in protected}
+    keep = policy.select(backups, protected=[
+        backup["timestamp"] for backup in backups
+        if any(os.path.abspath(path) in protected for path in backup["paths"])
+    ])
+    to_remove = []
+
+    for backup in backups:
+        if backup["timestamp"] not in keep:
+            to_remove.extend(backup["paths"])
+
+    kept = sum(1 for backup in backups if backup["timestamp"] in keep)
+
+    if dry_run:
+        if logger is not None and to_remove:
+            logger.log_dry_run("**Backups that will be removed:**\n%s" % "\n".join(to_remove))
+
+        return kept, to_remove, []
+
+    removed = []
+    errors = []
+
+    for path in to_remove:
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                rmtree(path)
+            else:
+                os.remove(path)
+
+            removed.append(path)
+        except OSError as err:
+            errors.append((path, err))
+
+    return kept, removed, errors
+
+
+if __name__ == "__main__":
+    pass
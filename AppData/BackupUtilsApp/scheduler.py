@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Scheduler to run backup tasks in parallel.
+"""
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+from .python_utils import file_utils
+
+
+class TasksScheduler():
+    """Run backup tasks in a pool of workers.
+
+    Tasks are executed in parallel unless one of the following conditions is met, in which case
+    they are executed one after the other in the order they were defined:
+
+    - Tasks whose destinations are stored in the same device. Writing to the same device in \
+    parallel would only make the device seek more.
+    - A task that declares the ``depends_on`` key (a list of task names) doesn't start until \
+    all the tasks it depends on have finished successfully. If one of them fails, the task is \
+    skipped.
+    - A task that declares the ``exclusive`` key is executed alone, after all the tasks defined \
+    before it have finished and before any of the tasks defined after it start.
+
+    Attributes
+    ----------
+    logger : object
+        See <class :any:`LogSystem`>.
+    """
+
+    def __init__(self, tasks, runner, jobs=2, logger=None):
+        """Initialize.
+
+        Parameters
+        ----------
+        tasks : list
+            A list of tuples with a task and its settings.
+        runner : method
+            The function that runs a task. It is called with a task and its settings as
+            arguments and returns the amount of errors found while running it. If it returns a
+            value other than zero or raises an exception (including ``SystemExit``), the task is
+            considered failed.
+        jobs : int, optional
+            Maximum amount of tasks to run at the same time.
+        logger : object
+            See <class :any:`LogSystem`>.
+        """
+        self._tasks = tasks
+        self._runner = runner
+        self._jobs = max(int(jobs), 1)
+        self.logger = logger
+        self._dependencies, self._waits = self._get_dependencies()
+
+    def _get_dependencies(self):
+        """Get the dependencies of each task.
+
+        Returns
+        -------
+        tuple
+            Two lists with a set of task indexes for each task. A task can't start until all the
+            tasks in its set from the first list have finished successfully (``depends_on``) and
+            all the tasks in its set from the second list have finished, successfully or not
+            (same device and ``exclusive``).
+        """
+        dependencies = [set() for t in self._tasks]
+        waits = [set() for t in self._tasks]
+        last_task_in_device = {}
+        exclusive_indexes = []
+        indexes_by_name = {}
+
+        for index, (task, settings) in enumerate(self._tasks):
+            indexes_by_name.setdefault(task.get("name"), []).append(index)
+
+        for index, (task, settings) in enumerate(self._tasks):
+            device_id = file_utils.get_device_id(task.get("destination", ""))
+
+            if device_id is not None:
+                if device_id in last_task_in_device:
+                    waits[index].add(last_task_in_device[device_id])
+
+                last_task_in_device[device_id] = index
+
+            for name in task.get("depends_on", []):
+                if name not in indexes_by_name:
+                    self.logger.warning("**Task <%s> depends on a non-existent task:** %s" %
+                                        (task.get("name"), name))
+                    continue
+
+                dependencies[index].update(i for i in indexes_by_name[name] if i != index)
+
+            if task.get("exclusive", False):
+                waits[index].update(range(index))
+                exclusive_indexes.append(index)
+
+            # Every task has to wait for the exclusive tasks defined before it.
+            waits[index].update(i for i in exclusive_indexes if i < index)
+
+        return dependencies, waits
+
+    def run(self):
+        """Run all tasks.
+
+        Returns
+        -------
+        list
+            The indexes of the tasks that failed or were skipped.
+        """
+        pending = set(range(len(self._tasks)))
+        succeeded = set()
+        failed = set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            try:
+                while pending or running:
+                    # Skipping a task can unblock other tasks, so keep scheduling until nothing
+                    # else changes.
+                    skipped = True
+
+                    while skipped:
+                        skipped = False
+
+                        for index in sorted(pending):
+                            if self._dependencies[index] & failed:
+                                pending.discard(index)
+                                failed.add(index)
+                                skipped = True
+                                self.logger.warning(
+                                    "**Task skipped because a task it depends on failed:** %s" %
+                                    self._tasks[index][0].get("name"))
+                            elif len(running) < self._jobs and \
+                                    self._dependencies[index] <= succeeded and \
+                                    self._waits[index] <= (succeeded | failed):
+                                pending.discard(index)
+                                running[executor.submit(self._runner,
+                                                        *self._tasks[index])] = index
+
+                    if not running:
+                        if pending:
+                            # Circular dependencies. Nothing can run anymore.
+                            for index in sorted(pending):
+                                self.logger.error("**Task with unresolvable dependencies:** %s" %
+                                                  self._tasks[index][0].get("name"))
+
+                            failed.update(pending)
+                            pending.clear()
+
+                        continue
+
+                    done, not_done = wait(running, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        index = running.pop(future)
+
+                        try:
+                            errors_count = future.result()
+                        except BaseException:
+                            failed.add(index)
+                        else:
+                            if errors_count:
+                                failed.add(index)
+                            else:
+                                succeeded.add(index)
+            except KeyboardInterrupt:
+                for future in running:
+                    future.cancel()
+
+                raise
+
+        return sorted(failed)
+
+
+if __name__ == "__main__":
+    pass
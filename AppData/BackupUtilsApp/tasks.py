@@ -2,21 +2,38 @@
 """Backup tasks.
 """
 import os
-import tempfile
 import importlib
+import json
+import re
+import stat
+import time
 
+from collections import OrderedDict
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+from fnmatch import fnmatch
 from shlex import quote as shell_quote
 from subprocess import CalledProcessError
+from subprocess import PIPE
 from subprocess import STDOUT
+from tarfile import TarError
 
 from . import app_utils
+from . import chunk_store
+from . import metrics
+from . import profiling
+from . import retention
+from . import verification
+from .file_index import FileStateIndex
 from .python_utils import cmd_utils
 from .python_utils import exceptions
 from .python_utils import file_utils
+from .python_utils import ignore_utils
+from .python_utils import log_system
 from .python_utils import misc_utils
 from .python_utils import shell_utils
+from .python_utils import tarfile_utils
 
 _xz_map = {
     "ext": ".xz",
@@ -33,27 +50,119 @@ _bzip2_map = {
     "env": "BZIP2"
 }
 
+_zstd_map = {
+    "ext": ".zst",
+    "env": "ZSTD_CLEVEL",
+    # zstd expects a level number, not a command line argument.
+    "unsigned_level": True
+}
+
+# Compressors used through tar's --use-compress-program. "parallel" is the multi-threaded
+# program and "threads_arg" the argument used to set its amount of threads. "serial" is the
+# program used when the parallel one isn't installed or when only one thread is requested.
+_tar_compressors = {
+    "xz": {
+        "ext": ".xz",
+        "parallel": "xz",
+        "threads_arg": "-T%d",
+        "serial": "xz"
+    },
+    "zstd": {
+        "ext": ".zst",
+        "parallel": "zstd",
+        "threads_arg": "-T%d",
+        "serial": "zstd"
+    },
+    "gzip": {
+        "ext": ".gz",
+        "parallel": "pigz",
+        "threads_arg": "--processes %d",
+        "serial": "gzip"
+    },
+    "bzip2": {
+        "ext": ".bz2",
+        "parallel": "pbzip2",
+        "threads_arg": "-p%d",
+        "serial": "bzip2"
+    }
+}
+
+# Suffixes added to the names of the archives created by the snapshot based tar modes.
+_tar_level_suffixes = {
+    "full": "-full",
+    "incremental": "-incr",
+    "differential": "-diff"
+}
+
+# Suffix of the snapshots created by rsync_local tasks while they are being created.
+_rsync_partial_suffix = ".partial"
+
+_rsync_transferred_size_re = re.compile(r"^Total transferred file size: ([\d,]+) bytes",
+                                        re.MULTILINE)
+
 _tar_comp_map = {
     "--xz": _xz_map,
     "-J": _xz_map,
     "--gzip": _gzip_map,
     "-z": _gzip_map,
     "--bzip2": _bzip2_map,
-    "-j": _bzip2_map
+    "-j": _bzip2_map,
+    "--zstd": _zstd_map
 }
 
 
+def _decode_output(output):
+    """Decode the output of a command.
+
+    Parameters
+    ----------
+    output : bytes, str, None
+        The output of a command.
+
+    Returns
+    -------
+    str
+        The decoded output.
+    """
+    if isinstance(output, bytes):
+        return output.decode("utf-8", errors="replace")
+
+    return str(output)
+
+
+def _lstat_item(path):
+    """``lstat`` a path without raising errors.
+
+    Parameters
+    ----------
+    path : str
+        A path.
+
+    Returns
+    -------
+    tuple
+        The result of ``lstat`` (or None) and the error raised by it (or None).
+    """
+    try:
+        return os.lstat(path), None
+    except OSError as err:
+        return None, err
+
+
 class BaseTask():
     """Base task class.
 
     Attributes
     ----------
+    items_status : dict
+        The result of the validation of the ``items`` of the task. See
+        :any:`BaseTask._validate_task`.
     logger : object
         See <class :any:`LogSystem`>.
     """
     _cmd = None
 
-    def __init__(self, task={}, settings={}, dry_run=False, logger=None):
+    def __init__(self, task={}, settings={}, dry_run=False, logger=None, capture_output=False):
         """Initialize.
 
         Parameters
@@ -66,17 +175,30 @@ class BaseTask():
             Do not perform file system changes.
         logger : object
             See <class :any:`LogSystem`>.
+        capture_output : bool, optional
+            Capture the output of the executed commands and log it after they finish instead of
+            letting them print directly to the terminal. Used when tasks run in parallel.
         """
         self._task = task
         self._settings = settings
         self._dry_run = dry_run
         self.logger = logger
+        self._capture_output = capture_output
 
         self._errors = []
         self._errors_count = 0
         self._warnings_count = 0
-
-        self._validate_task()
+        # Compiled only once per task and shared by everything that needs to ignore files.
+        self._ignore_matcher = ignore_utils.IgnoreMatcher(
+            self._settings.get("ignored_patterns", []))
+        self._file_index = None
+        self._file_index_fed = False
+        self._manifest_builder = None
+        self._metrics = metrics.TaskMetrics(enabled=self._settings.get("metrics_log", False))
+        self.items_status = None
+
+        with profiling.phase("Task validation"):
+            self._validate_task()
 
     def report_called_process_errors(self):
         """Report called process errors.
@@ -87,12 +209,79 @@ class BaseTask():
             for err in self._errors:
                 self._errors_count += 1
                 self.logger.error("**Command:** %s" % str(err.cmd))
-                self.logger.error("**STDERR:**\n%s" % str(err.stderr))
-                self.logger.error("**STDOUT:**\n%s" % str(err.stdout))
+                self.logger.error("**STDERR:**\n%s" % _decode_output(err.stderr))
+                self.logger.error("**STDOUT:**\n%s" % _decode_output(err.stdout))
+
+    def _run_cmd(self, cmd, input_items=None, logger=None, capture_output=None, **kwargs):
+        """Run a command.
+
+        Parameters
+        ----------
+        cmd : list|str
+            See :any:`subprocess.run`.
+        input_items : iterable, None, optional
+            See :any:`cmd_utils.run_cmd_with_input`. If None, the command is executed with
+            :any:`cmd_utils.run_cmd`.
+        logger : object, None, optional
+            The logger used to log the captured output. Defaults to the task logger.
+        capture_output : bool, None, optional
+            See :any:`BaseTask` > capture_output. Defaults to the task option.
+        **kwargs
+            See :any:`subprocess.run`.
+
+        Returns
+        -------
+        subprocess.CompletedProcess
+            A ``subprocess.CompletedProcess`` instance.
+
+        Raises
+        ------
+        CalledProcessError
+            If the command exits with a non-zero status.
+        """
+        logger = logger or self.logger
+        capture_output = self._capture_output if capture_output is None else capture_output
+        stdout = PIPE if capture_output else None
+
+        with self._metrics.timer("subprocess_time"), profiling.phase("Subprocess run"):
+            if input_items is None:
+                result = cmd_utils.run_cmd(cmd, stdout=stdout, stderr=STDOUT, check=True,
+                                           **kwargs)
+            else:
+                result = cmd_utils.run_cmd_with_input(cmd, input_items, stdout=stdout,
+                                                      stderr=STDOUT, check=True, **kwargs)
+
+        if result.stdout:
+            logger.info(_decode_output(result.stdout).rstrip(), date=False)
+
+        return result
+
+    def report_walk_errors(self, walk_errors):
+        """Report the folders that couldn't be read while walking the file system.
+
+        Parameters
+        ----------
+        walk_errors : list
+            A list of tuples with a path and the reason why it couldn't be read.
+        """
+        if walk_errors:
+            self._warnings_count += len(walk_errors)
+            self.logger.warning("**Folders that couldn't be read:**\n%s" %
+                                "\n".join("%s: %s" % err for err in walk_errors))
 
     def _validate_task(self):
         """Validate task.
 
+        Each item is ``lstat``-ed only once. The items stored in network file systems (see
+        :any:`file_utils.NETWORK_FILE_SYSTEMS`) are ``lstat``-ed in parallel. The result is
+        stored in :any:`BaseTask` > items_status, a dictionary with the following keys:
+
+        - **valid**: An ordered dictionary with the valid items as keys and the results of
+          ``lstat`` as values. The ``items`` of the task are replaced by its keys.
+        - **missing**: Items that don't exist.
+        - **symlinks**: Items that are symbolic links.
+        - **unreadable**: Tuples with items that couldn't be ``lstat``-ed and the reason.
+
         Raises
         ------
         exceptions.MissingCommand
@@ -103,29 +292,84 @@ class BaseTask():
         if self._cmd is not None and not cmd_utils.which(self._cmd):
             raise exceptions.MissingCommand(self._cmd)
 
-        valid_items = []
-        ignored_items = []
-
-        for item in set(self._task.get("items")):
-            item_path = file_utils.expand_path(item)
-
-            if os.path.exists(item_path) and not os.path.islink(item_path):
-                valid_items.append(item_path)
+        items = sorted({file_utils.expand_path(item) for item in self._task.get("items")})
+        mount_points = file_utils.get_mount_points()
+        network_items = [item for item in items if file_utils.get_file_system_type(
+            os.path.abspath(item), mount_points) in file_utils.NETWORK_FILE_SYSTEMS]
+        items_stats = {}
+
+        if network_items:
+            with ThreadPoolExecutor(max_workers=min(32, len(network_items))) as executor:
+                items_stats.update(zip(network_items, executor.map(_lstat_item, network_items)))
+
+        self.items_status = {
+            "valid": OrderedDict(),
+            "missing": [],
+            "symlinks": [],
+            "unreadable": []
+        }
+
+        for item in items:
+            st, err = items_stats[item] if item in items_stats else _lstat_item(item)
+
+            if st is None:
+                if isinstance(err, FileNotFoundError):
+                    self.items_status["missing"].append(item)
+                else:
+                    self.items_status["unreadable"].append((item, err))
+            elif stat.S_ISLNK(st.st_mode):
+                self.items_status["symlinks"].append(item)
             else:
-                self._warnings_count += 1
-                ignored_items.append(item_path)
+                self.items_status["valid"][item] = st
 
-        if not valid_items:
+        if not self.items_status["valid"]:
             self.logger.error("**Empty items list! Can't proceed! Leaving...**")
             raise SystemExit(1)
         else:
-            self._task["items"] = sorted(valid_items)
+            self._task["items"] = list(self.items_status["valid"])
+
+        invalid_count = sum(len(self.items_status[key])
+                            for key in ("missing", "symlinks", "unreadable"))
 
         # If there are ignored items, log them all at once.
-        if ignored_items:
+        if invalid_count:
+            self._warnings_count += invalid_count
             self.logger.warning("**Invalid items found**")
-            self.logger.warning("**They weren't added to the backup list:**\n%s" %
-                                "\n".join(ignored_items))
+            self.logger.warning("**They weren't added to the backup list:**")
+
+            if self.items_status["missing"]:
+                self.logger.warning("**Missing:**\n%s" % "\n".join(self.items_status["missing"]),
+                                    date=False)
+
+            if self.items_status["symlinks"]:
+                self.logger.warning("**Symbolic links:**\n%s" %
+                                    "\n".join(self.items_status["symlinks"]), date=False)
+
+            if self.items_status["unreadable"]:
+                self.logger.warning("**Unreadable:**\n%s" % "\n".join(
+                    "%s: %s" % item for item in self.items_status["unreadable"]), date=False)
+
+    def _is_real_dir_item(self, item):
+        """Check if one of the validated items of the task is a folder.
+
+        Parameters
+        ----------
+        item : str
+            An item of the task.
+
+        Returns
+        -------
+        bool
+            Whether the item is a folder (and not a symbolic link to a folder). The result of
+            the validation of the task is used, so no system calls are performed for the items
+            that passed validation.
+        """
+        st = self.items_status["valid"].get(item) if self.items_status else None
+
+        if st is None:
+            return file_utils.is_real_dir(item)
+
+        return stat.S_ISDIR(st.st_mode)
 
     def start(self):
         """Main method to start the backup process.
@@ -135,13 +379,413 @@ class BaseTask():
         tuple
             The errors and warnings count to be logged.
         """
-        self._run_hook("pre")
-        kwargs = self.run()
-        self._run_hook("post", **kwargs if kwargs else {})
+        hash_cache = app_utils.enable_hash_cache(
+            self._settings.get("hash_cache_max_entries", 1000000)
+        ) if self._settings.get("hash_cache", False) else None
+
+        with profiling.phase("Hooks"):
+            self._run_hook("pre")
+
+        kwargs = self.run() or {}
+        profiling.add_time("File list build", *self._metrics.get_walk_time())
+
+        if self._task.get("verify", False):
+            kwargs.update(self._verify(kwargs))
+
+        if self._task.get("retention"):
+            kwargs.update(self._apply_retention(kwargs))
+
+        kwargs.update(self._update_file_index())
+
+        if hash_cache is not None:
+            hash_cache.flush()
+
+        with profiling.phase("Hooks"):
+            self._run_hook("post", **kwargs)
+
         self.report_called_process_errors()
+        self._write_metrics()
 
         return (self._errors_count, self._warnings_count)
 
+    def _write_metrics(self):
+        """Append the metrics of the run to the metrics log of the task.
+
+        Only if the ``metrics_log`` setting is enabled. The metrics log is stored in
+        ``UserData/metrics/<task storage name>.jsonl``. See :any:`metrics.TaskMetrics`.
+        """
+        if not self._metrics.enabled:
+            return
+
+        metrics_path = app_utils.get_user_data_path(
+            "metrics", app_utils.get_task_storage_name(self._task) + ".jsonl")
+
+        try:
+            self._metrics.write(metrics_path, self._metrics.get_records(
+                self._task, self._errors_count, self._warnings_count, dry_run=self._dry_run))
+        except OSError as err:
+            self._warnings_count += 1
+            self.logger.warning("**Metrics couldn't be written:** %s" % err)
+
+    def _get_files_list(self):
+        """Get the list of the files to back up.
+
+        Returns
+        -------
+        app_utils.FilteredFilesList
+            The files list. Its walk statistics are added to the metrics of the run.
+        """
+        return self._metrics.track_files_list(
+            app_utils.FilteredFilesList(self._task.get("items"), self._ignore_matcher,
+                                        self.items_status["valid"]))
+
+    def _verify(self, run_data):
+        """Verify the data written by the task.
+
+        Parameters
+        ----------
+        run_data : dict
+            The data returned by :any:`BaseTask.run`.
+
+        Returns
+        -------
+        dict
+            Dictionary with data that will be passed to a ``post_hook``. Whether the
+            verification succeeded (``verified``) and the paths to the written manifests
+            (``manifest_paths``).
+        """
+        if self._dry_run:
+            self.logger.log_dry_run("**The backup will be verified.**")
+            return {}
+
+        if self._errors or self._errors_count:
+            self._warnings_count += 1
+            self.logger.warning("**Verification skipped due to errors.**")
+            return {}
+
+        self.logger.info(shell_utils.get_cli_separator("-"), date=False)
+        self.logger.info("**Verifying backup...**")
+        start_time = misc_utils.get_date_time()
+        errors_count = self._errors_count
+        manifest_paths = self.verify(run_data)
+
+        if manifest_paths is None:
+            return {}
+
+        finished_time = misc_utils.get_date_time()
+        self.logger.info("**Verification time:** %s" %
+                         misc_utils.get_time_diff(start_time, finished_time), date=False)
+
+        return {
+            "verified": self._errors_count == errors_count,
+            "manifest_paths": manifest_paths
+        }
+
+    def verify(self, run_data):
+        """Verify the data written by the task.
+
+        Parameters
+        ----------
+        run_data : dict
+            The data returned by :any:`BaseTask.run`.
+
+        Returns
+        -------
+        list, None
+            The paths to the written manifests. None if the task type doesn't support
+            verification.
+        """
+        self._warnings_count += 1
+        self.logger.warning("**Verification isn't supported by this task type.**")
+
+        return None
+
+    def _get_retention_target(self, run_data):
+        """Get where the timestamped backups of the task are stored.
+
+        Parameters
+        ----------
+        run_data : dict
+            The data returned by :any:`BaseTask.run`.
+
+        Returns
+        -------
+        tuple, None
+            The folder that contains the backups, the prefix of their names and the paths of
+            the backups that must never be removed. None if the task type doesn't create
+            timestamped backups.
+        """
+        return None
+
+    def _apply_retention(self, run_data):
+        """Remove the backups not selected by the retention policy of the task.
+
+        Parameters
+        ----------
+        run_data : dict
+            The data returned by :any:`BaseTask.run`.
+
+        Returns
+        -------
+        dict
+            Dictionary with data that will be passed to a ``post_hook``. The paths of the
+            removed files and folders (``removed_backups``).
+        """
+        target = self._get_retention_target(run_data)
+
+        if target is None:
+            self._warnings_count += 1
+            self.logger.warning("**Retention isn't supported by this task type.**")
+            return {}
+
+        if self._errors or self._errors_count:
+            self._warnings_count += 1
+            self.logger.warning("**Retention skipped due to errors.**")
+            return {}
+
+        folder, prefix, protected = target
+        policy = retention.RetentionPolicy(**self._task.get("retention"))
+        self.logger.info(shell_utils.get_cli_separator("-"), date=False)
+        self.logger.info("**Applying retention policy...**")
+        kept, removed, errors = retention.apply_policy(folder, policy, prefix=prefix,
+                                                       protected=protected,
+                                                       dry_run=self._dry_run, logger=self.logger)
+
+        if self._dry_run:
+            return {}
+
+        self.logger.info("**Backups kept:** %d" % kept, date=False)
+
+        if removed:
+            self.logger.info("**Removed:**\n%s" % "\n".join(removed), date=False)
+
+        if errors:
+            self._warnings_count += len(errors)
+            self.logger.warning("**Couldn't be removed:**\n%s" %
+                                "\n".join("%s: %s" % err for err in errors))
+
+        return {"removed_backups": removed}
+
+    def _track_manifest(self, paths):
+        """Pass paths through a manifest builder.
+
+        Used by tasks that create archives, so the manifest used to verify them is built
+        while the files are enumerated.
+
+        Parameters
+        ----------
+        paths : iterable
+            Paths to files.
+
+        Returns
+        -------
+        iterable
+            The same paths. They are also hashed if the ``verify`` option is enabled.
+        """
+        if not self._task.get("verify", False):
+            return paths
+
+        self._manifest_builder = verification.ManifestBuilder(
+            hashfunc=self._task.get("verify_hashfunc", verification.MANIFEST_HASHFUNC))
+
+        return self._manifest_builder.track(paths)
+
+    def _report_verification(self, result, manifest_path):
+        """Report the result of a verification and write its manifest.
+
+        Parameters
+        ----------
+        result : dict
+            See :any:`verification.verify_archive`.
+        manifest_path : str
+            Path to the manifest file.
+        """
+        self.logger.info("**Files verified:** %d" % result["checked"], date=False)
+
+        if result["mismatches"]:
+            self._errors_count += len(result["mismatches"])
+            self.logger.error("**Files that failed verification:**\n%s" %
+                              "\n".join("%s: %s" % m for m in result["mismatches"]))
+
+        verification.write_manifest(result["hashes"], manifest_path)
+        self.logger.info("**Manifest:** %s" % manifest_path, date=False)
+
+    def _get_mirror_path(self, source_item, root_destination=None):
+        """Get the path of a mirrored folder inside the destination.
+
+        Parameters
+        ----------
+        source_item : str
+            The path to the source folder.
+        root_destination : str, None, optional
+            The folder in which the source folders are mirrored. Defaults to the task
+            destination.
+
+        Returns
+        -------
+        str
+            The path to the mirrored folder.
+        """
+        seps = os.sep + os.altsep if os.altsep else os.sep
+
+        return os.path.join(
+            root_destination or self._task.get("destination", ""),
+            # Trick to join two absolute paths.
+            os.path.splitdrive(source_item)[1].lstrip(seps)
+        )
+
+    def _verify_mirrors(self, root_destination=None):
+        """Verify mirrored folders.
+
+        The manifest of each folder is written next to its mirror
+        (``<mirrored folder>.sha256``).
+
+        Parameters
+        ----------
+        root_destination : str, None, optional
+            See :any:`BaseTask._get_mirror_path`.
+
+        Returns
+        -------
+        list
+            The paths to the written manifests.
+        """
+        manifest_paths = []
+        hashfunc = self._task.get("verify_hashfunc", verification.MANIFEST_HASHFUNC)
+
+        for source_item in self._task.get("items"):
+            if not self._is_real_dir_item(source_item):
+                continue
+
+            mirror_path = self._get_mirror_path(source_item, root_destination)
+            processed_list = app_utils.FilteredFilesList([source_item], self._ignore_matcher)
+            self.logger.info("**Verifying:** %s" % mirror_path, date=False)
+            result = verification.verify_mirror(source_item, mirror_path,
+                                                processed_list.iter_files(),
+                                                hashfunc=hashfunc)
+            manifest_path = mirror_path + verification.get_manifest_ext(hashfunc)
+            self._report_verification(result, manifest_path)
+            manifest_paths.append(manifest_path)
+
+        return manifest_paths
+
+    def _verify_archive(self, run_data):
+        """Verify an archive.
+
+        If the manifest was built while the files were enumerated, the archive is compared
+        against it. Otherwise, it's compared against the source files. The manifest is
+        written next to the archive (``<archive>.sha256``).
+
+        Parameters
+        ----------
+        run_data : dict
+            The data returned by :any:`BaseTask.run`. It has to contain the ``archive_path``.
+
+        Returns
+        -------
+        list
+            The path to the written manifest.
+        """
+        archive_path = run_data["archive_path"]
+        entries = self._manifest_builder.entries if self._manifest_builder else None
+        hashfunc = self._task.get("verify_hashfunc", verification.MANIFEST_HASHFUNC)
+
+        try:
+            result = verification.verify_archive(archive_path, entries=entries,
+                                                 hashfunc=hashfunc)
+        except (OSError, EOFError, TarError) as err:
+            self._errors_count += 1
+            self.logger.error("**Archive couldn't be read:** %s\n%s" % (archive_path, err))
+            return []
+
+        manifest_path = archive_path + verification.get_manifest_ext(hashfunc)
+        self._report_verification(result, manifest_path)
+
+        return [manifest_path]
+
+    def _get_file_index(self):
+        """Get the file state index of this task.
+
+        Returns
+        -------
+        FileStateIndex, None
+            The index or None if the ``track_changes`` option isn't enabled.
+        """
+        if self._file_index is None and self._task.get("track_changes", False):
+            self._file_index = FileStateIndex(app_utils.get_user_data_path(
+                "indexes", app_utils.get_task_storage_name(self._task) + ".sqlite3"))
+
+        return self._file_index
+
+    def _track_changes(self, paths):
+        """Pass paths through the file state index.
+
+        Used by tasks that already walk the source tree, so the index is updated in the same walk.
+
+        Parameters
+        ----------
+        paths : iterable
+            Paths to files.
+
+        Returns
+        -------
+        iterable
+            The same paths. They are also recorded in the index if the ``track_changes`` option
+            is enabled.
+        """
+        file_index = self._get_file_index()
+
+        if file_index is None:
+            return paths
+
+        self._file_index_fed = True
+
+        return file_index.track(paths)
+
+    def _update_file_index(self):
+        """Update the file state index and report the changes since the last run.
+
+        If the task itself didn't pass its files through :any:`BaseTask._track_changes`, the
+        source tree is walked here. The new state is only stored if the task finished without
+        errors and it isn't a dry run.
+
+        Returns
+        -------
+        dict
+            Dictionary with data that will be passed to a ``post_hook``. Empty if the
+            ``track_changes`` option isn't enabled.
+        """
+        file_index = self._get_file_index()
+
+        if file_index is None:
+            return {}
+
+        try:
+            if not self._file_index_fed:
+                processed_list = app_utils.FilteredFilesList(self._task.get("items"),
+                                                             self._ignore_matcher,
+                                                             self.items_status["valid"])
+
+                for path in file_index.track(processed_list.iter_files()):
+                    pass
+
+            if self._dry_run or self._errors or self._errors_count:
+                counts = file_index.rollback()
+
+                if not self._dry_run:
+                    self._warnings_count += 1
+                    self.logger.warning("**Files state index not updated due to errors.**")
+            else:
+                counts = file_index.commit()
+        finally:
+            file_index.close()
+
+        self.logger.info("**Changes since last run:** %d new, %d modified, %d deleted, "
+                         "%d unchanged" % (counts["new"], counts["modified"],
+                                           counts["deleted"], counts["unchanged"]))
+
+        return {"file_changes": dict(counts)}
+
     def _run_hook(self, hook_type, **kwargs):
         """Run hook.
 
@@ -227,62 +871,372 @@ class RsyncLocalTask(BaseTask):
 
     def run(self):
         """See <class :any:`BaseTask.run`>.
+
+        Returns
+        -------
+        dict
+            Dictionary with data that will be passed to a ``post_hook``. In snapshot mode, the
+            path to the created snapshot (``snapshot_path``) and the removed snapshots
+            (``removed_snapshots``).
         """
         root_destination = self._task.get("destination", "")
         seps = os.sep + os.altsep if os.altsep else os.sep
         cmd = [self._cmd] + self._task.get("rsync_args", [])
-        exclude_patterns = ["--exclude=%s" % shell_quote(ptrn) for ptrn in
-                            self._settings.get("ignored_patterns", [])]
-        cmd += exclude_patterns
+        parallel = int(self._task.get("rsync_parallel", 1))
+        snapshot_mode = self._task.get("rsync_mode", "mirror") == "snapshot"
+        previous_snapshot = None
+
+        if not self._dry_run:
+            if parallel > 1 and "--stats" not in cmd:
+                # Needed to compute the throughput summary.
+                cmd.append("--stats")
+
+            if "--stats" in cmd:
+                # The transferred size is parsed from the statistics, so it can't be
+                # formatted with units (-h/--human-readable).
+                cmd.append("--no-human-readable")
+
+        if snapshot_mode:
+            snapshot_path = os.path.join(root_destination, "%s%s" % (
+                self._task.get("destination_prefix", ""),
+                misc_utils.micro_to_milli(misc_utils.get_date_time("filename"))))
+            previous_snapshot = self._get_last_rsync_snapshot()
+            # Snapshots are created with a temporary name and only renamed after all items were
+            # mirrored successfully. So, an interrupted run never becomes the base of the next one.
+            mirror_root = snapshot_path + _rsync_partial_suffix
+        else:
+            mirror_root = root_destination
 
         if self._dry_run:
             self.logger.log_dry_run(
                 "**Destination folder will be created:**\n%s" %
-                root_destination)
+                mirror_root)
         else:
-            os.makedirs(root_destination, exist_ok=True)
+            if snapshot_mode:
+                self._remove_partial_rsync_snapshots()
+
+            os.makedirs(mirror_root, exist_ok=True)
+
+        items_cmds = []
 
         for source_item in self._task.get("items"):
-            if file_utils.is_real_dir(source_item):
-                self.logger.info(shell_utils.get_cli_separator("-"), date=False)
-                item_destination = os.path.join(
-                    root_destination,
-                    # Trick to join two absolute paths.
-                    # Source: https://stackoverflow.com/a/50846104/4147432 <3
-                    os.path.splitdrive(os.path.dirname(source_item))[1].lstrip(seps)
-                )
-
-                final_cmd = " ".join(cmd + [shell_quote(source_item),
-                                            shell_quote(item_destination)])
-
-                self.logger.info("**Mirroring:** %s" % source_item, date=False)
-
-                if self._dry_run:
-                    self.logger.log_dry_run("**Command that will be executed:**\n%s" % final_cmd)
-                else:
-                    try:
-                        start_time = misc_utils.get_date_time()
-
-                        # Forced to use shell=True. Otherwise, --exclude rsync arguments
-                        # wouldn't freaking work due to shell expansions nonsense.
-                        # I tried using the --from-files, but its logic is too "convoluted".
-                        cmd_utils.run_cmd(final_cmd,
-                                          stdout=None,
-                                          stderr=STDOUT,
-                                          shell=True,
-                                          check=True)
-
-                        finished_time = misc_utils.get_date_time()
-                        elapsed_time = misc_utils.get_time_diff(start_time, finished_time)
-                        self.logger.info("**Elapsed time:** %s" % elapsed_time, date=False)
-                    except CalledProcessError as err:
-                        self._errors.append(err)
-                        continue
+            if self._is_real_dir_item(source_item):
+                # Trick to join two absolute paths.
+                # Source: https://stackoverflow.com/a/50846104/4147432 <3
+                rel_parent = os.path.splitdrive(os.path.dirname(source_item))[1].lstrip(seps)
+                item_destination = os.path.join(mirror_root, rel_parent)
+                exclude_args = [shell_quote(arg) for arg in
+                                self._ignore_matcher.rsync_exclude_args(
+                                    os.path.basename(source_item))]
+                link_dest_args = []
+
+                if previous_snapshot is not None:
+                    # Unchanged files are hard-linked to the ones in the previous snapshot.
+                    link_dest_args.append(shell_quote("--link-dest=%s" % os.path.abspath(
+                        os.path.join(previous_snapshot, rel_parent))))
+
+                final_cmd = " ".join(cmd + link_dest_args + exclude_args +
+                                     [shell_quote(source_item), shell_quote(item_destination)])
+                items_cmds.append((source_item, final_cmd))
             else:
                 self._warnings_count += 1
                 self.logger.warning("**Omitted path. Not a directory:**")
                 self.logger.warning(source_item)
 
+        errors_count = len(self._errors)
+
+        if parallel > 1 and not self._dry_run:
+            self._mirror_items_in_parallel(items_cmds, parallel)
+        else:
+            for source_item, final_cmd in items_cmds:
+                self._mirror_item(source_item, final_cmd, self.logger)
+
+        if not snapshot_mode:
+            return {}
+
+        return self._finish_rsync_snapshot(mirror_root, snapshot_path,
+                                           len(self._errors) == errors_count)
+
+    def _get_rsync_snapshot_pattern(self):
+        """Get the pattern that matches the names of the snapshots created by this task.
+
+        Returns
+        -------
+        str
+            A file name pattern.
+        """
+        # Same length as the names generated with misc_utils.get_date_time("filename").
+        return "%s????-??-??_??.??.??.???" % self._task.get("destination_prefix", "")
+
+    def _get_last_rsync_snapshot(self):
+        """Get the last complete snapshot created by this task.
+
+        Returns
+        -------
+        str, None
+            The path to the snapshot or None if there are no snapshots yet.
+        """
+        root_destination = self._task.get("destination", "")
+        pattern = self._get_rsync_snapshot_pattern()
+
+        try:
+            snapshots = sorted(entry.path for entry in os.scandir(root_destination)
+                               if fnmatch(entry.name, pattern) and
+                               entry.is_dir(follow_symlinks=False))
+        except FileNotFoundError:
+            return None
+
+        return snapshots[-1] if snapshots else None
+
+    def _remove_partial_rsync_snapshots(self):
+        """Remove snapshots left incomplete by previous runs.
+        """
+        removed = file_utils.remove_surplus_folders(
+            self._task.get("destination", ""),
+            self._get_rsync_snapshot_pattern() + _rsync_partial_suffix,
+            max_folders_to_keep=0)
+
+        if removed:
+            self.logger.info("**Incomplete snapshots removed:**\n%s" % "\n".join(removed),
+                             date=False)
+
+    def _finish_rsync_snapshot(self, mirror_root, snapshot_path, success):
+        """Give its final name to a snapshot and remove the surplus ones.
+
+        Parameters
+        ----------
+        mirror_root : str
+            The path to the folder in which the snapshot was created.
+        snapshot_path : str
+            The final path of the snapshot.
+        success : bool
+            Whether all items were mirrored successfully. Otherwise, the snapshot is left with
+            its temporary name and no snapshot is removed.
+
+        Returns
+        -------
+        dict
+            See :any:`RsyncLocalTask.run`.
+        """
+        keep_snapshots = int(self._task.get("rsync_keep_snapshots", 0))
+
+        if self._dry_run:
+            self.logger.log_dry_run("**Snapshot that will be created:**\n%s" % snapshot_path)
+
+            if keep_snapshots:
+                self.logger.log_dry_run(
+                    "**Snapshots that will be kept:** %d (the new one included)" % keep_snapshots)
+
+            return {"snapshot_path": snapshot_path}
+
+        if not success:
+            self._warnings_count += 1
+            self.logger.warning("**Snapshot left incomplete due to errors:**\n%s" % mirror_root)
+
+            return {}
+
+        os.rename(mirror_root, snapshot_path)
+        self.logger.info(shell_utils.get_cli_separator("-"), date=False)
+        self.logger.info("**Snapshot:** %s" % snapshot_path, date=False)
+        removed = []
+
+        if keep_snapshots:
+            removed = file_utils.remove_surplus_folders(
+                self._task.get("destination", ""), self._get_rsync_snapshot_pattern(),
+                max_folders_to_keep=keep_snapshots)
+
+            if removed:
+                self.logger.info("**Snapshots removed:**\n%s" % "\n".join(removed),
+                                 date=False)
+
+        return {
+            "snapshot_path": snapshot_path,
+            "removed_snapshots": removed
+        }
+
+    def _mirror_item(self, source_item, final_cmd, logger, capture_output=None):
+        """Mirror an item.
+
+        Parameters
+        ----------
+        source_item : str
+            The path to the folder to mirror.
+        final_cmd : str
+            The rsync command.
+        logger : object
+            See <class :any:`LogSystem`>.
+        capture_output : bool, None, optional
+            See :any:`BaseTask._run_cmd`.
+
+        Returns
+        -------
+        int, None
+            The amount of bytes transferred as reported by rsync. None if the command failed,
+            wasn't executed or its output wasn't captured.
+        """
+        logger.info(shell_utils.get_cli_separator("-"), date=False)
+        logger.info("**Mirroring:** %s" % source_item, date=False)
+
+        if self._dry_run:
+            logger.log_dry_run("**Command that will be executed:**\n%s" % final_cmd)
+            return None
+
+        try:
+            start_time = misc_utils.get_date_time()
+
+            # Forced to use shell=True. Otherwise, --exclude rsync arguments
+            # wouldn't freaking work due to shell expansions nonsense.
+            # I tried using the --from-files, but its logic is too "convoluted".
+            cmd_start = time.perf_counter()
+            result = self._run_cmd(final_cmd, logger=logger,
+                                   capture_output=capture_output, shell=True)
+            # The time of the whole run is measured by _run_cmd.
+            self._metrics.add_item(source_item,
+                                   subprocess_time=time.perf_counter() - cmd_start)
+
+            finished_time = misc_utils.get_date_time()
+            elapsed_time = misc_utils.get_time_diff(start_time, finished_time)
+            logger.info("**Elapsed time:** %s" % elapsed_time, date=False)
+        except CalledProcessError as err:
+            self._errors.append(err)
+            return None
+
+        match = _rsync_transferred_size_re.search(_decode_output(result.stdout or b""))
+        transferred = int(match.group(1).replace(",", "")) if match else None
+        self._metrics.add(bytes_written=transferred)
+        self._metrics.add_item(source_item, bytes_written=transferred)
+
+        return transferred
+
+    def verify(self, run_data):
+        """See <class :any:`BaseTask.verify`>.
+
+        Returns
+        -------
+        list
+            See :any:`BaseTask._verify_mirrors`.
+        """
+        return self._verify_mirrors(run_data.get("snapshot_path"))
+
+    def _get_retention_target(self, run_data):
+        """See <class :any:`BaseTask._get_retention_target`>.
+
+        Returns
+        -------
+        tuple, None
+            Only snapshots (see the ``rsync_mode`` option) can be removed.
+        """
+        if self._task.get("rsync_mode", "mirror") != "snapshot":
+            return None
+
+        return (self._task.get("destination", ""), self._task.get("destination_prefix", ""),
+                [run_data["snapshot_path"]] if run_data.get("snapshot_path") else [])
+
+    def _mirror_items_in_parallel(self, items_cmds, parallel):
+        """Mirror several items at the same time.
+
+        The messages of each item are buffered and logged all at once when the item is finished.
+
+        Parameters
+        ----------
+        items_cmds : list
+            A list of tuples with the path to a folder to mirror and its rsync command.
+        parallel : int
+            Maximum amount of rsync processes to run at the same time.
+        """
+        def mirror_item(source_item, final_cmd):
+            logger = log_system.BufferedLogger(self.logger)
+
+            try:
+                return self._mirror_item(source_item, final_cmd, logger, capture_output=True)
+            finally:
+                logger.flush()
+
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            transferred = list(executor.map(lambda args: mirror_item(*args), items_cmds))
+
+        elapsed = time.perf_counter() - start
+        transferred_bytes = sum(t for t in transferred if t)
+
+        self.logger.info(shell_utils.get_cli_separator("-"), date=False)
+        self.logger.info("**Parallel mirroring summary**", date=False)
+        self.logger.info("**Items mirrored:** %d/%d (up to %d at the same time)" %
+                         (sum(1 for t in transferred if t is not None), len(items_cmds), parallel),
+                         date=False)
+        self.logger.info("**Total transferred:** %s" % misc_utils.format_bytes(transferred_bytes),
+                         date=False)
+        self.logger.info("**Wall-clock time:** %.2f sec/s" % elapsed, date=False)
+        self.logger.info("**Throughput:** %s/s" %
+                         misc_utils.format_bytes(transferred_bytes / max(elapsed, 1e-9)),
+                         date=False)
+
+
+class MirrorLocalTask(BaseTask):
+    """Task to perform incremental mirrors without depending on external commands.
+
+    See :any:`file_utils.mirror_tree`.
+    """
+
+    def run(self):
+        """See <class :any:`BaseTask.run`>.
+        """
+        delete = self._task.get("mirror_delete", False)
+
+        for source_item in self._task.get("items"):
+            if not self._is_real_dir_item(source_item):
+                self._warnings_count += 1
+                self.logger.warning("**Omitted path. Not a directory:**")
+                self.logger.warning(source_item)
+                continue
+
+            self.logger.info(shell_utils.get_cli_separator("-"), date=False)
+            self.logger.info("**Mirroring:** %s" % source_item, date=False)
+            item_destination = self._get_mirror_path(source_item)
+            start_time = misc_utils.get_date_time()
+            stats = file_utils.mirror_tree(source_item, item_destination,
+                                           ignored_patterns=self._ignore_matcher,
+                                           delete=delete,
+                                           dry_run=self._dry_run,
+                                           logger=self.logger)
+            finished_time = misc_utils.get_date_time()
+
+            item_metrics = {
+                "files_scanned": stats["copied"] + stats["unchanged"],
+                "files_copied": stats["copied"],
+                "bytes_read": stats["copied_bytes"],
+                "bytes_written": stats["copied_bytes"]
+            }
+            self._metrics.add(**item_metrics)
+            self._metrics.add_item(source_item, **item_metrics)
+            self.logger.info("**Files copied:** %d (%s)" % (
+                stats["copied"], misc_utils.format_bytes(stats["copied_bytes"])), date=False)
+            self.logger.info("**Files unchanged:** %d" % stats["unchanged"], date=False)
+            self.logger.info("**Folders created:** %d" % stats["created_dirs"], date=False)
+
+            if delete:
+                self.logger.info("**Deleted from destination:** %d" % stats["deleted"],
+                                 date=False)
+
+            self.logger.info("**Elapsed time:** %s" %
+                             misc_utils.get_time_diff(start_time, finished_time), date=False)
+
+            if stats["errors"]:
+                self._errors_count += len(stats["errors"])
+                self.logger.error("**Paths that couldn't be mirrored:**\n%s" %
+                                  "\n".join("%s: %s" % err for err in stats["errors"]))
+
+    def verify(self, run_data):
+        """See <class :any:`BaseTask.verify`>.
+
+        Returns
+        -------
+        list
+            See :any:`BaseTask._verify_mirrors`.
+        """
+        return self._verify_mirrors()
+
 
 class TarLocalTask(BaseTask):
     """Task to perform backups using the tar command.
@@ -302,42 +1256,194 @@ class TarLocalTask(BaseTask):
     def __get_compression_data(self):
         """Get compression data.
 
-        Scan ``tar_func_args`` option for tar compression arguments and, if found, return
-        a dictionary with the extension that will be used to name the compressed archive
-        and the environment variable used to define the compression level.
+        If the ``tar_compressor`` option is set, return the data of the compressor program (see
+        :any:`TarLocalTask.__get_compressor_data`). Otherwise, scan ``tar_func_args`` option for
+        tar compression arguments and, if found, return a dictionary with the extension that
+        will be used to name the compressed archive and the environment variable used to define
+        the compression level.
 
         Returns
         -------
         dict|False
             Compression data.
         """
+        if self._task.get("tar_compressor"):
+            return self.__get_compressor_data(self._task.get("tar_compressor"))
+
         for arg in self._task.get("tar_func_args", []):
             if arg in _tar_comp_map:
                 return {
                     "ext": _tar_comp_map[arg]["ext"],
-                    "env": _tar_comp_map[arg]["env"]
+                    "env": _tar_comp_map[arg]["env"],
+                    "unsigned_level": _tar_comp_map[arg].get("unsigned_level", False)
                 }
 
         return False
 
+    def __get_compressor_data(self, compressor):
+        """Get the data of a compressor program used through ``--use-compress-program``.
+
+        The multi-threaded version of the compressor is used if it is installed. Otherwise,
+        the serial one is used.
+
+        Parameters
+        ----------
+        compressor : str
+            A key in ``_tar_compressors``.
+
+        Returns
+        -------
+        dict
+            The extension used to name the compressed archive and the ``tar`` argument that
+            sets the compressor program.
+        """
+        compressor_data = _tar_compressors[compressor]
+        threads = self._task.get("tar_threads", 0) or os.cpu_count() or 1
+        level = "-%d" % abs(int(self._task.get("tar_compression_level", "-7")))
+
+        if threads > 1 and cmd_utils.which(compressor_data["parallel"]):
+            program = [compressor_data["parallel"], compressor_data["threads_arg"] % threads]
+        else:
+            if threads > 1:
+                self._warnings_count += 1
+                self.logger.warning("**Parallel compressor not found, using <%s> instead:** %s" %
+                                    (compressor_data["serial"], compressor_data["parallel"]))
+
+            program = [compressor_data["serial"]]
+
+        return {
+            "ext": compressor_data["ext"],
+            "program": " ".join(program + [level])
+        }
+
+    def _get_snapshots_data(self, tar_mode):
+        """Get the data needed to create an archive in one of the snapshot based modes.
+
+        The snapshot files used by ``tar --listed-incremental`` and the state of the archives
+        chain are stored in a folder per task inside ``UserData/snapshots``. Its content is:
+
+        - ``level0.snar``: The snapshot file created with the last full archive.
+        - ``current.snar``: The snapshot file updated by each incremental archive.
+        - ``state.json``: The mode, the amount of runs since the last full archive and the \
+        chain of archives needed to restore the last archive.
+
+        Parameters
+        ----------
+        tar_mode : str
+            ``incremental`` or ``differential``.
+
+        Returns
+        -------
+        dict
+            The paths to the snapshot files, the state and the level of the next archive
+            (``full``, ``incremental`` or ``differential``).
+        """
+        snapshots_dir = app_utils.get_user_data_path(
+            "snapshots", app_utils.get_task_storage_name(self._task))
+        data = {
+            "dir": snapshots_dir,
+            "state_file": os.path.join(snapshots_dir, "state.json"),
+            "level0": os.path.join(snapshots_dir, "level0.snar"),
+            "current": os.path.join(snapshots_dir, "current.snar"),
+            "work": os.path.join(snapshots_dir, "work.snar"),
+            "state": {}
+        }
+
+        try:
+            with open(data["state_file"], "r", encoding="UTF-8") as state_file:
+                data["state"] = json.load(state_file)
+        except (OSError, ValueError):
+            pass
+
+        state = data["state"]
+        base_snapshot = data["current"] if tar_mode == "incremental" else data["level0"]
+        full_every = self._task.get("tar_full_every", 7)
+
+        if state.get("tar_mode") != tar_mode or not state.get("chain") or \
+                not os.path.isfile(base_snapshot) or \
+                state.get("runs_since_full", 0) >= full_every:
+            data["level"] = "full"
+        else:
+            data["level"] = tar_mode
+
+        return data
+
+    def _save_snapshots_data(self, snapshots_data, tar_mode, archive_path):
+        """Store the snapshot file and the state after an archive was successfully created.
+
+        Parameters
+        ----------
+        snapshots_data : dict
+            See :any:`TarLocalTask._get_snapshots_data`.
+        tar_mode : str
+            ``incremental`` or ``differential``.
+        archive_path : str
+            Path to the created archive.
+
+        Returns
+        -------
+        list
+            The chain of archives needed to restore the created archive, in the order in which
+            they have to be extracted.
+        """
+        state = snapshots_data["state"]
+        level = snapshots_data["level"]
+
+        if level == "full":
+            os.replace(snapshots_data["work"], snapshots_data["level0"])
+
+            if tar_mode == "incremental":
+                file_utils.copy_file_data(snapshots_data["level0"], snapshots_data["current"])
+
+            chain = [archive_path]
+            runs_since_full = 1
+        else:
+            if level == "incremental":
+                os.replace(snapshots_data["work"], snapshots_data["current"])
+                chain = state["chain"] + [archive_path]
+            else:
+                os.remove(snapshots_data["work"])
+                # Only the full archive and the last differential archive are needed.
+                chain = state["chain"][:1] + [archive_path]
+
+            runs_since_full = state.get("runs_since_full", 0) + 1
+
+        with open(snapshots_data["state_file"], "w", encoding="UTF-8") as state_file:
+            json.dump({
+                "tar_mode": tar_mode,
+                "runs_since_full": runs_since_full,
+                "chain": chain
+            }, state_file, indent=4)
+
+        return chain
+
     def run(self):
         """See <class :any:`BaseTask.run`>.
 
         Returns
         -------
         dict
-            Dictionary with data that will be passed to a ``post_hook``.
+            Dictionary with data that will be passed to a ``post_hook``. Besides the path to the
+            created archive (``archive_path``), it contains the ``tar_mode`` and the list of
+            archives needed to restore the created archive (``archive_chain``).
+
+        Note
+        ----
+        In the ``incremental`` and ``differential`` modes, ``tar`` walks the items by itself and
+        only reads the files that changed, which aren't known. So, the ``bytes_read`` metric
+        (and the throughput and compression ratio computed from it) isn't recorded in those
+        modes.
         """
-        processed_list = app_utils.FilteredFilesList(
-            self._task.get("items"), self._settings.get("ignored_patterns", []))
-        full_list_of_files = "\n".join(processed_list.get_full_list_of_files())
+        tar_mode = self._task.get("tar_mode", "full")
+        snapshots_data = self._get_snapshots_data(tar_mode) if tar_mode != "full" else None
         tar_env = cmd_utils.get_environment()
         compression_data = self.__get_compression_data()
         compression_level = self._task.get("tar_compression_level", "-7")
         archive_destination = self._task.get("destination", "")
-        archive_file_name = "%s%s.tar" % \
+        archive_file_name = "%s%s%s.tar" % \
             (self._task.get("destination_prefix", ""),
-             misc_utils.micro_to_milli(misc_utils.get_date_time("filename")))
+             misc_utils.micro_to_milli(misc_utils.get_date_time("filename")),
+             _tar_level_suffixes[snapshots_data["level"]] if snapshots_data else "")
         archive_file_ext = compression_data["ext"] if compression_data else ""
         archive_path = os.path.join(archive_destination,
                                     archive_file_name + archive_file_ext)
@@ -349,41 +1455,390 @@ class TarLocalTask(BaseTask):
         else:
             os.makedirs(archive_destination, exist_ok=True)
 
-        if compression_data:
-            tar_env[compression_data["env"]] = str(compression_level)
+        if compression_data and "program" in compression_data:
+            # The compression arguments are replaced by the compressor program.
+            tar_func_args = [arg for arg in self._task.get("tar_func_args", [])
+                             if arg not in _tar_comp_map]
+            tar_func_args.append("--use-compress-program=%s" % compression_data["program"])
+        else:
+            tar_func_args = self._task.get("tar_func_args", [])
+
+            if compression_data:
+                tar_env[compression_data["env"]] = \
+                    str(abs(int(compression_level))) if compression_data["unsigned_level"] \
+                    else str(compression_level)
+
+        cmd = [
+            self._cmd,
+            "--create",
+        ] + tar_func_args + [
+            "--file",
+            shell_quote(archive_path)
+        ]
+
+        if snapshots_data:
+            self.logger.info("**Archive level:** %s (%s mode)" % (snapshots_data["level"],
+                                                                  tar_mode))
+
+            if self._dry_run:
+                self.__run_dry(self.__get_snapshot_cmd(cmd, snapshots_data))
+
+                return {"archive_path": archive_path, "tar_mode": tar_mode, "archive_chain": []}
 
-        with tempfile.NamedTemporaryFile(prefix="%s-" % self._task.get("type")) as tmp_file:
-            tmp_file.write(str.encode(full_list_of_files))
-            tmp_file.seek(0)
+            self.__run_with_snapshot(self.__get_snapshot_cmd(cmd, snapshots_data),
+                                     snapshots_data, tar_env)
 
-            cmd = [
-                self._cmd,
-                "--create",
-            ] + self._task.get("tar_func_args", []) + [
-                "--file",
-                shell_quote(archive_path),
-                "--files-from=%s" % tmp_file.name
+            if self._errors:
+                archive_chain = []
+            else:
+                archive_chain = self._save_snapshots_data(snapshots_data, tar_mode, archive_path)
+                self.logger.info("**Archives needed to restore:** %d" % len(archive_chain))
+        else:
+            # The list of files is piped directly into tar's standard input while the file
+            # system is being walked. Paths are NUL separated so that any valid file name can be
+            # handled.
+            cmd += [
+                "--null",
+                "--files-from=-"
             ] + self._task.get("tar_opt_args", [])
 
             if self._dry_run:
-                self.logger.log_dry_run("**Command that will be executed:**\n%s" % " ".join(cmd))
+                self.__run_dry(cmd)
             else:
+                processed_list = self._get_files_list()
+
                 try:
-                    cmd_utils.run_cmd(cmd,
-                                      stdout=None,
-                                      stderr=STDOUT,
-                                      check=True,
-                                      env=tar_env)
+                    self._run_cmd(cmd,
+                                  input_items=self._metrics.count_input(self._track_manifest(
+                                      self._track_changes(processed_list.iter_files()))),
+                                  separator=b"\0",
+                                  env=tar_env)
                 except CalledProcessError as err:
                     self._errors.append(err)
 
+                self.report_walk_errors(processed_list.get_errors())
+
+            archive_chain = [archive_path]
+
+        if not self._dry_run and os.path.isfile(archive_path):
+            self._metrics.compressed = bool(compression_data)
+            self._metrics.add(bytes_written=os.path.getsize(archive_path))
+
+        return {
+            "archive_path": archive_path,
+            "tar_mode": tar_mode,
+            "archive_chain": archive_chain
+        }
+
+    def verify(self, run_data):
+        """See <class :any:`BaseTask.verify`>.
+
+        Returns
+        -------
+        list
+            See :any:`BaseTask._verify_archive`.
+        """
+        return self._verify_archive(run_data)
+
+    def _get_retention_target(self, run_data):
+        """See <class :any:`BaseTask._get_retention_target`>.
+
+        Returns
+        -------
+        tuple
+            The archives needed to restore the created archive are never removed.
+        """
+        return (self._task.get("destination", ""), self._task.get("destination_prefix", ""),
+                run_data.get("archive_chain") or [run_data["archive_path"]])
+
+    def __run_dry(self, cmd):
+        """Log the command that would be executed.
+
+        Parameters
+        ----------
+        cmd : list
+            The command.
+        """
+        self.logger.log_dry_run("**Command that will be executed:**\n%s" % " ".join(cmd))
+
+    def __get_snapshot_cmd(self, cmd, snapshots_data):
+        """Get the command used to create an archive with a snapshot file.
+
+        ``tar`` has to recurse into the folders by itself so it can record their content in the
+        snapshot file (that's what allows it to detect deleted files). So, the items are passed
+        as arguments and the ignored patterns are translated into ``--exclude`` arguments.
+
+        Parameters
+        ----------
+        cmd : list
+            The base command.
+        snapshots_data : dict
+            See :any:`TarLocalTask._get_snapshots_data`.
+
+        Returns
+        -------
+        list
+            The command.
+        """
+        items = self._task.get("items", [])
+
+        return cmd + [
+            "--listed-incremental=%s" % snapshots_data["work"]
+        ] + self._ignore_matcher.tar_exclude_args(
+            [item for item in items if self._is_real_dir_item(item)]
+        ) + self._task.get("tar_opt_args", []) + ["--"] + items
+
+    def __run_with_snapshot(self, cmd, snapshots_data, tar_env):
+        """Create an archive using a ``tar --listed-incremental`` snapshot file.
+
+        Parameters
+        ----------
+        cmd : list
+            See :any:`TarLocalTask.__get_snapshot_cmd`.
+        snapshots_data : dict
+            See :any:`TarLocalTask._get_snapshots_data`.
+        tar_env : dict
+            The environment used to run ``tar``.
+        """
+        os.makedirs(snapshots_data["dir"], exist_ok=True)
+
+        # tar modifies the snapshot file it works with. So, it works on a copy that only
+        # replaces the stored snapshot if the archive was successfully created.
+        if snapshots_data["level"] == "full":
+            if os.path.exists(snapshots_data["work"]):
+                os.remove(snapshots_data["work"])
+        else:
+            file_utils.copy_file_data(snapshots_data["current"]
+                                      if snapshots_data["level"] == "incremental"
+                                      else snapshots_data["level0"], snapshots_data["work"])
+
+        try:
+            self._run_cmd(cmd, env=tar_env)
+        except CalledProcessError as err:
+            self._errors.append(err)
+
+            if os.path.exists(snapshots_data["work"]):
+                os.remove(snapshots_data["work"])
+
+
+class TarfileLocalTask(BaseTask):
+    """Task to perform backups creating tar archives with Python's ``tarfile`` module.
+
+    Unlike <class :any:`TarLocalTask`>, it doesn't depend on the ``tar`` program nor on external
+    compressors. See :any:`tarfile_utils.write_tar_stream`.
+    """
+
+    def run(self):
+        """See <class :any:`BaseTask.run`>.
+
+        Returns
+        -------
+        dict
+            Dictionary with data that will be passed to a ``post_hook``.
+        """
+        compression = self._task.get("tar_compressor", "none")
+        compression_level = abs(int(self._task.get("tar_compression_level", "-7")))
+        archive_destination = self._task.get("destination", "")
+        archive_path = os.path.join(archive_destination, "%s%s.tar%s" % (
+            self._task.get("destination_prefix", ""),
+            misc_utils.micro_to_milli(misc_utils.get_date_time("filename")),
+            tarfile_utils.COMPRESSIONS_EXT[compression]))
+
+        if compression == "zstd" and not tarfile_utils.ZSTANDARD_INSTALLED:
+            raise exceptions.MissingDependencyModule("zstandard")
+
+        if self._dry_run:
+            self.logger.log_dry_run("**Destination folder will be created:**\n%s" %
+                                    archive_destination)
+            self.logger.log_dry_run("**Archive that will be created:**\n%s" % archive_path)
+
+            return {"archive_path": archive_path}
+
+        os.makedirs(archive_destination, exist_ok=True)
+        processed_list = self._get_files_list()
+        skipped_files = []
+
+        try:
+            stats = tarfile_utils.write_tar_stream(
+                self._metrics.count_input(
+                    self._track_manifest(self._track_changes(processed_list.iter_files()))),
+                archive_path,
+                compression=compression,
+                level=compression_level,
+                on_error=lambda path, err: skipped_files.append((path, err))
+            )
+        except Exception as err:
+            self._errors_count += 1
+            self.logger.error("**Archive couldn't be created:** %s\n%s" % (archive_path, err))
+
+            return {"archive_path": archive_path}
+
+        self.report_walk_errors(processed_list.get_errors())
+
+        if skipped_files:
+            self._errors_count += len(skipped_files)
+            self.logger.error("**Files that couldn't be archived completely:**\n%s" %
+                              "\n".join("%s: %s" % err for err in skipped_files))
+
+        self._metrics.compressed = compression != "none"
+        self._metrics.add(bytes_written=stats["archive_bytes"], read_time=stats["read_time"],
+                          compress_time=stats["compress_time"], write_time=stats["write_time"])
+        elapsed_time = max(stats["elapsed_time"], 1e-9)
+        self.logger.info("**Files archived:** %d" % stats["files"], date=False)
+        self.logger.info("**Archive size:** %s (%s before compression)" % (
+            misc_utils.format_bytes(stats["archive_bytes"]),
+            misc_utils.format_bytes(stats["tar_bytes"])), date=False)
+
+        for stage in ("read", "compress", "write"):
+            stage_time = stats["%s_time" % stage]
+            self.logger.info("**%s stage:** %.3f sec/s (%s/s)" % (
+                stage.capitalize(), stage_time,
+                misc_utils.format_bytes(stats["tar_bytes"] / max(stage_time, 1e-9))),
+                date=False)
+
+        self.logger.info("**Throughput:** %s/s" % misc_utils.format_bytes(
+            stats["tar_bytes"] / elapsed_time), date=False)
+
         return {"archive_path": archive_path}
 
+    def verify(self, run_data):
+        """See <class :any:`BaseTask.verify`>.
+
+        Returns
+        -------
+        list
+            See :any:`BaseTask._verify_archive`.
+        """
+        return self._verify_archive(run_data)
+
+    def _get_retention_target(self, run_data):
+        """See <class :any:`BaseTask._get_retention_target`>.
+
+        Returns
+        -------
+        tuple
+            The archives needed to restore the created archive are never removed.
+        """
+        return (self._task.get("destination", ""), self._task.get("destination_prefix", ""),
+                run_data.get("archive_chain") or [run_data["archive_path"]])
+
+
+class DedupLocalTask(BaseTask):
+    """Task to perform backups into a deduplicating chunk store.
+
+    The destination is the root folder of the store. Each run creates a snapshot that
+    references deduplicated chunks of the files, so the store only grows by the data that
+    actually changed between runs. See :any:`chunk_store.ChunkStore`.
+    """
+
+    def run(self):
+        """See <class :any:`BaseTask.run`>.
+
+        Returns
+        -------
+        dict
+            Dictionary with data that will be passed to a ``post_hook``.
+        """
+        store_root = self._task.get("destination", "")
+        group = app_utils.get_task_storage_name(self._task)
+        snapshot_name = "%s%s" % (self._task.get("destination_prefix", ""),
+                                  misc_utils.micro_to_milli(misc_utils.get_date_time("filename")))
+
+        if self._dry_run:
+            self.logger.log_dry_run("**Chunk store that will be used:**\n%s" % store_root)
+            self.logger.log_dry_run("**Snapshot that will be created:**\n%s" % snapshot_name)
+
+            return {}
+
+        if not chunk_store.NUMPY_INSTALLED:
+            self.logger.warning("**The numpy module isn't installed.** Files are split into "
+                                "chunks in pure Python, which is more than 10 times slower.")
+
+        store = chunk_store.ChunkStore(store_root,
+                                       compression=self._task.get("dedup_compression", "zlib"))
+        snapshots = store.list_snapshots(group)
+        processed_list = self._get_files_list()
+        skipped_files = []
+
+        try:
+            snapshot_path, stats = store.create_snapshot(
+                self._track_changes(processed_list.iter_files()),
+                group,
+                snapshot_name,
+                metadata={"task": self._task.get("name"), "items": self._task.get("items")},
+                previous=snapshots[-1] if snapshots else None,
+                on_error=lambda path, err: skipped_files.append((path, err))
+            )
+        except Exception as err:
+            self._errors_count += 1
+            self.logger.error("**Snapshot couldn't be created:** %s\n%s" % (snapshot_name, err))
+
+            return {}
+        finally:
+            store.close()
+
+        self.report_walk_errors(processed_list.get_errors())
+
+        if skipped_files:
+            self._errors_count += len(skipped_files)
+            self.logger.error("**Files that couldn't be stored:**\n%s" %
+                              "\n".join("%s: %s" % err for err in skipped_files))
+
+        self._metrics.compressed = True
+        self._metrics.add(bytes_read=stats["total_bytes"] - stats["reused_bytes"],
+                          bytes_written=store.stats["stored_bytes"],
+                          files_unchanged=stats["reused_files"])
+        self.logger.info("**Files stored:** %d (%d unchanged, %s)" % (
+            stats["files"], stats["reused_files"],
+            misc_utils.format_bytes(stats["reused_bytes"])), date=False)
+        self.logger.info("**New chunks:** %d (%s, %s after compression)" % (
+            store.stats["new_chunks"], misc_utils.format_bytes(store.stats["new_bytes"]),
+            misc_utils.format_bytes(store.stats["stored_bytes"])), date=False)
+        self.logger.info("**Deduplicated chunks:** %d (%s)" % (
+            store.stats["dedup_chunks"], misc_utils.format_bytes(store.stats["dedup_bytes"])),
+            date=False)
+        self.logger.info("**Snapshot:** %s (%s total)" % (
+            snapshot_path, misc_utils.format_bytes(stats["total_bytes"])), date=False)
+
+        return {"snapshot_path": snapshot_path}
+
+    def verify(self, run_data):
+        """See <class :any:`BaseTask.verify`>.
+
+        Every chunk referenced by the snapshot is read back and checked. The manifest is
+        written next to the snapshot (``<snapshot>.sha256``).
+
+        Returns
+        -------
+        list
+            The path to the written manifest.
+        """
+        snapshot_path = run_data["snapshot_path"]
+        hashfunc = self._task.get("verify_hashfunc", verification.MANIFEST_HASHFUNC)
+        store = chunk_store.ChunkStore(chunk_store.get_store_root(snapshot_path))
+
+        try:
+            result = store.check_snapshot(snapshot_path, hashfunc=hashfunc)
+        except (OSError, ValueError) as err:
+            self._errors_count += 1
+            self.logger.error("**Snapshot couldn't be read:** %s\n%s" % (snapshot_path, err))
+            return []
+        finally:
+            store.close()
+
+        manifest_path = snapshot_path + verification.get_manifest_ext(hashfunc)
+        self._report_verification(result, manifest_path)
+
+        return [manifest_path]
+
 
 _tasks_map = {
     "base_task": BaseTask,
+    "dedup_local": DedupLocalTask,
+    "mirror_local": MirrorLocalTask,
     "rsync_local": RsyncLocalTask,
-    "tar_local": TarLocalTask
+    "tar_local": TarLocalTask,
+    "tarfile_local": TarfileLocalTask
 }
 
 
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""Verification of the data written by backup tasks.
+
+Manifests are written in the format used by ``sha256sum`` (and the rest of the coreutils
+checksum programs) so, when using a hash function supported by those programs, the files
+extracted from an archive can also be checked with ``sha256sum --check``.
+"""
+import os
+import stat
+import tarfile
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from subprocess import DEVNULL
+from subprocess import PIPE
+from subprocess import Popen
+
+from .python_utils import cmd_utils
+from .python_utils import hash_utils
+
+MANIFEST_HASHFUNC = "sha256"
+
+
+class _GnuTarInfo(tarfile.TarInfo):
+    """``TarInfo`` that ignores the prefix field of the headers in the old GNU format.
+
+    When creating incremental archives, GNU tar stores the access and change times of the files
+    in the space used by the ``ustar`` format to store the prefix of long names. :any:`tarfile`
+    interprets them as part of the names.
+    """
+
+    @classmethod
+    def frombuf(cls, buf, encoding, errors):
+        """See :any:`tarfile.TarInfo.frombuf`.
+        """
+        obj = super().frombuf(buf, encoding, errors)
+
+        if buf[257:265] == tarfile.GNU_MAGIC and obj.type not in tarfile.GNU_TYPES:
+            name = tarfile.nts(buf[0:100], encoding, errors)
+            obj.name = name.rstrip("/") if obj.isdir() else name
+
+        return obj
+
+
+class ManifestBuilder():
+    """Build the manifest of the files added to an archive while they are enumerated.
+
+    Files are hashed in a pool of threads a few files ahead of the consumer of the paths. So,
+    when the paths are piped into an archiver, the files are usually already in the page cache
+    by the time the archiver reads them.
+
+    Attributes
+    ----------
+    entries : dict
+        The archive member names as keys and tuples with the size and hash of the files as
+        values. Only regular files are recorded.
+    """
+
+    def __init__(self, hashfunc=MANIFEST_HASHFUNC, workers=None, arcname_func=None):
+        """Initialize.
+
+        Parameters
+        ----------
+        hashfunc : str, optional
+            The name of the hash function. See :any:`hash_utils.HASH_FUNCS`.
+        workers : int, None, optional
+            Amount of hashing threads. Defaults to the amount of CPU cores.
+        arcname_func : method, optional
+            Function that receives a path and returns its name inside the archive. By default,
+            the path without leading slashes (just like ``tar`` does).
+        """
+        self._hashfunc = hashfunc
+        self._workers = workers or os.cpu_count() or 1
+        self._arcname_func = arcname_func or (lambda path: path.lstrip(os.sep))
+        self.entries = {}
+
+    def track(self, paths):
+        """Hash files and pass their paths through.
+
+        Parameters
+        ----------
+        paths : iterable
+            Paths to files.
+
+        Yields
+        ------
+        str
+            The path to a file.
+        """
+        max_pending = self._workers * 4
+        pending = deque()
+
+        def hash_file(path):
+            try:
+                st = os.lstat(path)
+
+                if not stat.S_ISREG(st.st_mode):
+                    return None
+
+                return st.st_size, hash_utils.file_hash(path, hashfunc=self._hashfunc)
+            except OSError:
+                # The archiver will report it.
+                return None
+
+        def pop_entry():
+            path, future = pending.popleft()
+            entry = future.result()
+
+            if entry is not None:
+                self.entries[self._arcname_func(path)] = entry
+
+            return path
+
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            for path in paths:
+                pending.append((path, executor.submit(hash_file, path)))
+
+                if len(pending) >= max_pending:
+                    yield pop_entry()
+
+            while pending:
+                yield pop_entry()
+
+
+def get_manifest_ext(hashfunc=MANIFEST_HASHFUNC):
+    """Get the extension of the manifest files.
+
+    Parameters
+    ----------
+    hashfunc : str, optional
+        The name of the hash function.
+
+    Returns
+    -------
+    str
+        The extension (e.g., ``.sha256``). It's the name of the hash function actually used (see
+        :any:`hash_utils.resolve_hashfunc`).
+    """
+    return "." + hash_utils.resolve_hashfunc(hashfunc)
+
+
+def _escape_name(name):
+    """Escape a file name the same way ``sha256sum`` does.
+
+    Parameters
+    ----------
+    name : str
+        A file name.
+
+    Returns
+    -------
+    tuple
+        The escaped name and whether it was escaped.
+    """
+    if "\\" not in name and "\n" not in name and "\r" not in name:
+        return name, False
+
+    return name.replace("\\", "\\\\").replace("\n", "\\n").replace("\r", "\\r"), True
+
+
+def _unescape_name(name):
+    """Revert :any:`_escape_name`.
+
+    Parameters
+    ----------
+    name : str
+        An escaped file name.
+
+    Returns
+    -------
+    str
+        The file name.
+    """
+    chars = []
+    i = 0
+
+    while i < len(name):
+        if name[i] == "\\" and i + 1 < len(name):
+            chars.append({"n": "\n", "r": "\r"}.get(name[i + 1], name[i + 1]))
+            i += 2
+        else:
+            chars.append(name[i])
+            i += 1
+
+    return "".join(chars)
+
+
+def write_manifest(hashes, manifest_path):
+    """Write a manifest.
+
+    Parameters
+    ----------
+    hashes : dict
+        File names as keys and their hashes as values.
+    manifest_path : str
+        Path to the manifest file.
+    """
+    with open(manifest_path, "w", encoding="utf-8", errors="surrogateescape") as manifest:
+        for name in sorted(hashes):
+            escaped_name, escaped = _escape_name(name)
+            manifest.write("%s%s  %s\n" % ("\\" if escaped else "", hashes[name], escaped_name))
+
+
+def read_manifest(manifest_path):
+    """Read a manifest.
+
+    Parameters
+    ----------
+    manifest_path : str
+        Path to the manifest file.
+
+    Returns
+    -------
+    dict
+        File names as keys and their hashes as values.
+    """
+    hashes = {}
+
+    with open(manifest_path, "r", encoding="utf-8", errors="surrogateescape") as manifest:
+        for line in manifest:
+            line = line.rstrip("\n")
+
+            if not line:
+                continue
+
+            escaped = line.startswith("\\")
+
+            if escaped:
+                line = line[1:]
+
+            hashvalue, name = line.split("  ", 1)
+            hashes[_unescape_name(name) if escaped else name] = hashvalue
+
+    return hashes
+
+
+@contextmanager
+def open_archive_stream(archive_path):
+    """Open a tar archive for sequential reading.
+
+    Archives compressed with zstd (not supported by :any:`tarfile`) are decompressed with the
+    ``zstd`` program.
+
+    Parameters
+    ----------
+    archive_path : str
+        Path to the archive.
+
+    Yields
+    ------
+    tarfile.TarFile
+        The archive opened in stream mode.
+
+    Raises
+    ------
+    OSError
+        If the archive is compressed with zstd and the ``zstd`` program isn't installed.
+    """
+    if not archive_path.endswith(".zst"):
+        with tarfile.open(archive_path, mode="r|*", tarinfo=_GnuTarInfo) as tar:
+            yield tar
+
+        return
+
+    if not cmd_utils.which("zstd"):
+        raise OSError("The zstd program is needed to read %s" % archive_path)
+
+    proc = Popen(["zstd", "--decompress", "--stdout", archive_path], stdout=PIPE,
+                 stderr=DEVNULL)
+
+    try:
+        with tarfile.open(fileobj=proc.stdout, mode="r|", tarinfo=_GnuTarInfo) as tar:
+            yield tar
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+
+def _hash_file_obj(file_obj, hashfunc):
+    """Hash the content of a file object.
+
+    Parameters
+    ----------
+    file_obj : object
+        A file object opened in binary mode.
+    hashfunc : str
+        The name of the hash function.
+
+    Returns
+    -------
+    tuple
+        The amount of bytes read and the hash.
+    """
+    h = hash_utils.HASH_FUNCS[hash_utils.resolve_hashfunc(hashfunc)]()
+    size = 0
+
+    for block in iter(lambda: file_obj.read(1024 * 1024), b""):
+        h.update(block)
+        size += len(block)
+
+    return size, h.hexdigest()
+
+
+def verify_archive(archive_path, entries=None, source_root=os.sep, hashfunc=MANIFEST_HASHFUNC):
+    """Verify the content of a tar archive.
+
+    The archive is read only once, sequentially. The size and hash of each regular file inside
+    it are compared against the ones recorded in ``entries``. If ``entries`` isn't specified,
+    they are compared against the files in the source (useful when the archive was created by a
+    program that walked the source itself).
+
+    Hard links (the members that store the second and later paths of a file) are checked with
+    the size and hash of the member they link to.
+
+    Parameters
+    ----------
+    archive_path : str
+        Path to the archive.
+    entries : dict, None, optional
+        See :any:`ManifestBuilder` > entries.
+    source_root : str, optional
+        Folder to which the names of the archive members are relative. Only used if
+        ``entries`` isn't specified.
+    hashfunc : str, optional
+        The name of the hash function. It must be the same one used to build ``entries``.
+
+    Returns
+    -------
+    dict
+        The amount of files checked (``checked``), a list of tuples with the names of the files
+        that didn't match and the reason (``mismatches``) and the hashes of all the regular
+        files in the archive (``hashes``).
+    """
+    result = {
+        "checked": 0,
+        "mismatches": [],
+        "hashes": {}
+    }
+    sizes = {}
+
+    with open_archive_stream(archive_path) as tar:
+        for member in tar:
+            if member.isreg():
+                size, hashvalue = _hash_file_obj(tar.extractfile(member), hashfunc)
+                member_size = member.size
+            elif member.islnk():
+                # The member it links to always comes before it in the archive.
+                if member.linkname not in sizes:
+                    result["mismatches"].append((member.name, "Hard link to a missing member: %s" %
+                                                 member.linkname))
+                    continue
+
+                size = member_size = sizes[member.linkname]
+                hashvalue = result["hashes"][member.linkname]
+            else:
+                continue
+
+            sizes[member.name] = size
+            result["hashes"][member.name] = hashvalue
+            result["checked"] += 1
+
+            if entries is not None:
+                expected = entries.get(member.name)
+
+                if expected is None:
+                    continue
+            else:
+                source_path = os.path.join(source_root, member.name)
+
+                try:
+                    expected = (os.lstat(source_path).st_size,
+                                hash_utils.file_hash(source_path, hashfunc=hashfunc))
+                except OSError as err:
+                    result["mismatches"].append((member.name, "Source not readable: %s" % err))
+                    continue
+
+            if size != member_size or size != expected[0]:
+                result["mismatches"].append((member.name, "Size mismatch: %d != %d" %
+                                             (size, expected[0])))
+            elif hashvalue != expected[1]:
+                result["mismatches"].append((member.name, "Hash mismatch"))
+
+    if entries is not None:
+        for name in sorted(set(entries) - set(result["hashes"])):
+            result["mismatches"].append((name, "Missing from archive"))
+
+    return result
+
+
+def verify_mirror(source, destination, paths, workers=None, hashfunc=MANIFEST_HASHFUNC):
+    """Verify that the files of a mirror are identical to the source files.
+
+    Each source file and its destination counterpart are hashed by a pool of threads.
+
+    Parameters
+    ----------
+    source : str
+        Path to the source folder.
+    destination : str
+        Path to the destination folder.
+    paths : iterable
+        Paths to the files inside ``source`` to check (e.g., the ones not ignored).
+    workers : int, None, optional
+        See :any:`hash_utils.hash_files`.
+    hashfunc : str, optional
+        The name of the hash function.
+
+    Returns
+    -------
+    dict
+        The amount of files checked (``checked``), a list of tuples with the paths relative to
+        ``source`` of the files that didn't match and the reason (``mismatches``) and the
+        hashes of all the checked files (``hashes``).
+    """
+    result = {
+        "checked": 0,
+        "mismatches": [],
+        "hashes": {}
+    }
+    errors = {}
+
+    def iter_pairs():
+        for path in paths:
+            try:
+                if not stat.S_ISREG(os.lstat(path).st_mode):
+                    continue
+            except OSError:
+                continue
+
+            yield path
+            yield os.path.join(destination, os.path.relpath(path, source))
+
+    def on_error(path, err):
+        errors[path] = err
+
+    hashes = hash_utils.hash_files(iter_pairs(), hashfunc=hashfunc, workers=workers,
+                                   on_error=on_error)
+
+    # Hashes are yielded in order. So, each source file is immediately followed by its
+    # destination counterpart.
+    for (source_path, source_hash), (destination_path, destination_hash) in zip(hashes, hashes):
+        rel_path = os.path.relpath(source_path, source)
+
+        if source_hash is None:
+            # Can't be verified. The task itself reported it when the file couldn't be copied.
+            continue
+
+        result["checked"] += 1
+        result["hashes"][rel_path] = source_hash
+
+        if destination_hash is None:
+            result["mismatches"].append((rel_path, "Destination not readable: %s" %
+                                         errors.get(destination_path)))
+        elif source_hash != destination_hash:
+            result["mismatches"].append((rel_path, "Hash mismatch"))
+
+    return result
+
+
+if __name__ == "__main__":
+    pass
@@ -4,11 +4,23 @@
 # https://unix.stackexchange.com/a/55622
 
 type "{executable_name}" &> /dev/null &&
+_get_config_files_{current_date}(){
+    # The list of configuration files is read from the cache stored by the application as long as
+    # the cache is newer than the folder containing the configuration files. Otherwise, the
+    # application is run to list the files (and to update the cache).
+    local cache="{full_path_to_app_folder}/UserData/cache/${1}.completions"
+
+    if [[ -f "${cache}" && "${cache}" -nt "{full_path_to_app_folder}/UserData/${1}" ]]; then
+        echo $(< "${cache}")
+    else
+        echo $(cd "{full_path_to_app_folder}"; ./app.py print_${1})
+    fi
+} &&
 _get_tasks_{current_date}(){
-    echo $(cd {full_path_to_app_folder}; ./app.py print_tasks)
+    _get_config_files_{current_date} tasks
 } &&
 _get_globals_{current_date}(){
-    echo $(cd {full_path_to_app_folder}; ./app.py print_settings)
+    _get_config_files_{current_date} settings
 } &&
 _decide_nospace_{current_date}(){
     # Decide if after the completion of a term should a space character should be added or not.
@@ -68,7 +80,7 @@ _backup_utils_cli_{current_date}(){
 
     # Completion of commands and "first level" options.
     if [[ $COMP_CWORD == 1 ]]; then
-        COMPREPLY=( $(compgen -W "backup generate -h --help --manual --version" -- "${cur}") )
+        COMPREPLY=( $(compgen -W "backup benchmark generate restore -h --help --manual --version" -- "${cur}") )
         return 0
     fi
 
@@ -77,12 +89,19 @@ _backup_utils_cli_{current_date}(){
 
     case $cmd in
         "backup")
-            COMPREPLY=( $(compgen -W "-t --task= -g --global= -d --dry-run" -- "${cur}") )
+            COMPREPLY=( $(compgen -W "-t --task= -g --global= -j --jobs= -d --dry-run --profile" -- "${cur}") )
             _decide_nospace_{current_date} ${COMPREPLY[0]}
             ;;
         "generate")
             COMPREPLY=( $(compgen -W "task global system_executable" -- "${cur}") )
             ;;
+        "benchmark")
+            COMPREPLY=( $(compgen -W "walk hash hashfuncs yaml startup --budget= --files= --items= --path= --size= --workers=" -- "${cur}") )
+            _decide_nospace_{current_date} ${COMPREPLY[0]}
+            ;;
+        "restore")
+            COMPREPLY=( $(compgen -f -- "${cur}") )
+            ;;
     esac
 } &&
 complete -F _backup_utils_cli_{current_date} {executable_name}